@@ -0,0 +1,151 @@
+"""
+Bearer authentication overhead per request.
+
+Measures, for a pool of distinct access tokens picked at random per request:
+
+- decode: full `decode_access_token` (PyJWT decode, HMAC, claims, UUID parsing)
+- cache: `VerifiedTokenCache.decode` once every token has been seen
+- endpoint: requests driven straight through the ASGI app (no sockets) against a
+  route that only depends on auth, comparing no auth, the previous sync
+  dependency (threadpool hop + full decode) and `get_bearer_user_id` with the
+  cache disabled and enabled. `--concurrency` requests are in flight at a time.
+
+Usage (from the repo root):
+
+    API_JWT_SECRET=bench GOOGLE_CLIENT_ID=x GOOGLE_CLIENT_SECRET=x STARLET_SECRET_KEY=x \\
+        python -m benchmarks.bench_auth --tokens 1000 --requests 20000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+
+from src.legendary_potato.api.dependencies import get_bearer_user_id
+from src.legendary_potato.core.revocation import TokenRevocations
+from src.legendary_potato.core.tokens import (
+    VerifiedTokenCache,
+    create_access_token,
+    decode_access_token,
+)
+
+
+def _per_call_us(fn, tokens: list[str], n: int) -> float:
+    picks = [random.choice(tokens) for _ in range(n)]
+    start = time.perf_counter()
+    for token in picks:
+        fn(token)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def sync_bearer_user_id(request: Request) -> uuid.UUID:
+    """The dependency before the cache: sync (threadpool) and a full decode."""
+    auth = request.headers.get("authorization") or ""
+    try:
+        return decode_access_token(auth.split(" ", 1)[1]).user_id
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.state.revocations = TokenRevocations()
+
+    @app.get("/none")
+    async def none():
+        return {}
+
+    @app.get("/sync")
+    async def sync(user_id=Depends(sync_bearer_user_id)):
+        return {}
+
+    @app.get("/bearer")
+    async def bearer(user_id=Depends(get_bearer_user_id)):
+        return {}
+
+    return app
+
+
+async def _drive(app: FastAPI, path: str, tokens: list[str], n: int, concurrency: int) -> float:
+    async def call(token: str) -> None:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "client": ("127.0.0.1", 1),
+            "server": ("bench", 80),
+            "app": app,
+        }
+        status = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await app(scope, receive, send)
+        assert status == [200], status
+
+    picks = [random.choice(tokens) for _ in range(n)]
+    start = time.perf_counter()
+    for i in range(0, n, concurrency):
+        await asyncio.gather(*(call(t) for t in picks[i : i + concurrency]))
+    return time.perf_counter() - start
+
+
+async def bench_endpoints(args, tokens: list[str]) -> None:
+    app = _app()
+    cases = [
+        ("no auth", "/none", None),
+        ("sync dependency, full decode", "/sync", None),
+        ("get_bearer_user_id, cache off", "/bearer", 0),
+        ("get_bearer_user_id, cache on", "/bearer", args.cache_size),
+    ]
+    baseline = None
+    for label, path, cache_size in cases:
+        if cache_size is not None:
+            app.state.token_cache = VerifiedTokenCache(max_entries=cache_size)
+        await _drive(app, path, tokens, min(args.requests, 2000), args.concurrency)  # warm up
+        elapsed = await _drive(app, path, tokens, args.requests, args.concurrency)
+        per_req = elapsed / args.requests * 1e6
+        baseline = per_req if baseline is None else baseline
+        print(
+            f"{label:32s} {args.requests / elapsed:9.0f} req/s  {per_req:7.1f} us/req  "
+            f"auth overhead {per_req - baseline:6.1f} us"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct access tokens")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    tokens = [create_access_token(user_id=uuid.uuid4()) for _ in range(args.tokens)]
+    cache = VerifiedTokenCache(max_entries=args.cache_size)
+    for token in tokens:
+        cache.decode(token)
+    n = args.requests
+    print(f"{args.tokens} tokens, cache size {args.cache_size}")
+    print(f"decode_access_token              {_per_call_us(decode_access_token, tokens, n):7.2f} us")
+    print(f"VerifiedTokenCache.decode (hit)  {_per_call_us(cache.decode, tokens, n):7.2f} us")
+    asyncio.run(bench_endpoints(args, tokens))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Storage reduction of snapshot chains on a synthetic revision corpus.
+
+Each page is re-saved many times with small edits (a rotating sidebar, an
+updated paragraph), mimicking a news article that is bookmarked repeatedly.
+
+Usage (from the repo root):
+
+    python -m benchmarks.bench_delta --pages 20 --revisions 30 --keyframe-interval 10
+"""
+
+import argparse
+import random
+import time
+import zlib
+
+from src.legendary_potato.core.delta import apply_delta, make_delta
+
+
+def _paragraph(rng: random.Random, words: list[str], n: int) -> str:
+    return "<p class='body'>" + " ".join(rng.choices(words, k=n)) + "</p>\n"
+
+
+def revisions(rng: random.Random, words: list[str], count: int) -> list[str]:
+    body = [_paragraph(rng, words, rng.randint(30, 90)) for _ in range(rng.randint(40, 400))]
+    sidebar = [f"<li><a href='/story/{i}'>Story {i}</a></li>" for i in range(20)]
+    pages = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            sidebar = sidebar[1:] + [f"<li><a href='/story/{rng.randrange(10**6)}'>New</a></li>"]
+        if rng.random() < 0.3:
+            body[rng.randrange(len(body))] = _paragraph(rng, words, rng.randint(30, 90))
+        pages.append(
+            "<html><head><title>Article</title></head><body>"
+            f"<ul id='sidebar'>{''.join(sidebar)}</ul>"
+            f"<article>{''.join(body)}</article></body></html>"
+        )
+    return pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--revisions", type=int, default=30)
+    parser.add_argument("--keyframe-interval", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = [f"word{i}" for i in range(20_000)]
+    k = args.keyframe_interval
+
+    full = full_compressed = chain = 0
+    encode_s = decode_s = 0.0
+    for _ in range(args.pages):
+        pages = revisions(rng, words, args.revisions)
+        prev = None
+        deltas: list[bytes] = []
+        for version, html in enumerate(pages, start=1):
+            size = len(html.encode("utf-8"))
+            full += size
+            full_compressed += len(zlib.compress(html.encode("utf-8")))
+
+            if prev is None or (version - 1) % k == 0:
+                chain += size
+                deltas = []
+            else:
+                start = time.perf_counter()
+                delta = make_delta(prev, html)
+                encode_s += time.perf_counter() - start
+                if delta is None or len(delta) * 2 > len(html):
+                    chain += size
+                    deltas = []
+                else:
+                    chain += len(delta)
+                    deltas.append(delta)
+            prev = html
+
+        # Worst-case reconstruction: the last version of the final chain.
+        keyframe = pages[len(pages) - 1 - len(deltas)]
+        start = time.perf_counter()
+        rebuilt = keyframe
+        for delta in deltas:
+            rebuilt = apply_delta(rebuilt, delta)
+        decode_s += time.perf_counter() - start
+        assert rebuilt == pages[-1]
+
+    versions = args.pages * args.revisions
+    print(f"{versions} snapshots, keyframe every {k} versions")
+    print(f"full copies:            {full / 1e6:10.2f} MB")
+    print(f"full copies (zlib):     {full_compressed / 1e6:10.2f} MB")
+    print(f"snapshot chain:         {chain / 1e6:10.2f} MB ({1 - chain / full:.1%} smaller)")
+    print(f"delta encode:           {encode_s * 1000 / max(versions - args.pages, 1):10.2f} ms/snapshot")
+    print(f"worst-case rebuild:     {decode_s * 1000 / args.pages:10.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
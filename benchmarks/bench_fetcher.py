@@ -0,0 +1,129 @@
+"""
+Page fetcher throughput against a local stand-in HTTP server.
+
+An asyncio HTTP/1.1 server with keep-alive listens on all loopback addresses;
+each of --hosts hosts is a different address (127.0.0.1, 127.0.0.2, ...). Every
+response waits --latency-ms before sending a --page-kb page. --urls pages spread
+over the hosts are fetched by `concurrency` workers through one `PageFetcher`,
+the way its background queue drives it.
+
+Reports pages/s, fetch latency, the most requests a single host saw at once
+(must not exceed --per-host) and how many TCP connections were opened (keep-alive
+reuse). --no-pool repeats the run with a fresh client per fetch for comparison.
+
+Usage (from the repo root):
+
+    python -m benchmarks.bench_fetcher --urls 2000 --hosts 20 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+from src.legendary_potato.core.fetcher import PageFetcher
+
+
+class StandIn:
+    def __init__(self, *, latency: float, page: bytes):
+        self.latency = latency
+        self.page = page
+        self.connections = 0
+        self.in_flight: Counter[str] = Counter()
+        self.max_in_flight: Counter[str] = Counter()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        host = writer.get_extra_info("sockname")[0]
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                path = request.split(b" ", 2)[1]
+                if path == b"/robots.txt":
+                    body, ctype = b"User-agent: *\nAllow: /\n", b"text/plain"
+                else:
+                    self.in_flight[host] += 1
+                    self.max_in_flight[host] = max(self.max_in_flight[host], self.in_flight[host])
+                    await asyncio.sleep(self.latency)
+                    self.in_flight[host] -= 1
+                    body, ctype = self.page, b"text/html; charset=utf-8"
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: " + ctype
+                    + b"\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run(args, *, pooled: bool) -> None:
+    page = b"<html><body>" + b"<p>lorem ipsum dolor sit amet</p>\n" * (args.page_kb * 30) + b"</body></html>"
+    server = StandIn(latency=args.latency_ms / 1000, page=page)
+    srv = await asyncio.start_server(server.handle, "0.0.0.0", 0)
+    port = srv.sockets[0].getsockname()[1]
+    urls = [f"http://127.0.0.{i % args.hosts + 1}:{port}/page/{i}" for i in range(args.urls)]
+
+    fetcher = PageFetcher(
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        allow_private=True,
+        max_bytes=len(page) + 1,
+    )
+    await fetcher.start()
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+
+    async def worker() -> None:
+        while not queue.empty():
+            url = queue.get_nowait()
+            start = time.perf_counter()
+            if pooled:
+                result = await fetcher.fetch(url)
+            else:
+                async with httpx.AsyncClient(timeout=10) as client:
+                    res = await client.get(url)
+                    result = type("R", (), {"status": "fetched" if res.status_code == 200 else "error"})
+            latencies.append(time.perf_counter() - start)
+            statuses[result.status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    await fetcher.stop()
+    srv.close()
+    await srv.wait_closed()
+
+    q = statistics.quantiles([x * 1000 for x in latencies], n=100)
+    label = "pooled PageFetcher" if pooled else "client per fetch"
+    print(
+        f"{label:20s} {len(urls) / elapsed:7.0f} pages/s  p50 {q[49]:6.1f}ms  p99 {q[98]:6.1f}ms  "
+        f"{dict(statuses)}  connections {server.connections}  "
+        f"max per host {max(server.max_in_flight.values())}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--page-kb", type=int, default=30)
+    parser.add_argument("--no-pool", action="store_true", help="also run with a client per fetch")
+    args = parser.parse_args()
+    asyncio.run(run(args, pooled=True))
+    if args.no_pool:
+        asyncio.run(run(args, pooled=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Fingerprinting throughput and near-duplicate query latency.
+
+- throughput: SimHash pages/sec over synthetic article-sized pages
+- query: LSH band lookups over N synthetic fingerprints, mirroring the
+  `bookmark_fingerprint_bands` index (sorted band values per band)
+
+Usage (from the repo root; numpy required for the index part):
+
+    python -m benchmarks.bench_fingerprint --pages 500 --fingerprints 1000000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from src.legendary_potato.core.fingerprint import LSH_BANDS, MAX_DISTANCE, simhash, simhash_bands
+
+
+class BandIndex:
+    """In-memory stand-in for the (user_id, band, value) B-tree."""
+
+    def __init__(self, fingerprints: np.ndarray):
+        self.fingerprints = fingerprints
+        self.order = []
+        self.sorted_values = []
+        for b in range(LSH_BANDS):
+            values = (fingerprints >> np.uint64(16 * b)) & np.uint64(0xFFFF)
+            order = np.argsort(values, kind="stable")
+            self.order.append(order)
+            self.sorted_values.append(values[order])
+
+    def query(self, value: int, max_distance: int = MAX_DISTANCE) -> list[int]:
+        candidates = set()
+        for b, band in enumerate(simhash_bands(value)):
+            band = np.uint64(band)  # a Python int would promote the array to float64
+            lo = np.searchsorted(self.sorted_values[b], band, side="left")
+            hi = np.searchsorted(self.sorted_values[b], band, side="right")
+            candidates.update(self.order[b][lo:hi].tolist())
+        return [
+            i for i in candidates if (int(self.fingerprints[i]) ^ value).bit_count() <= max_distance
+        ]
+
+
+def bench_throughput(pages: int, rng: random.Random) -> None:
+    vocab = [f"word{i}" for i in range(20_000)]
+    docs = [
+        "<html><head><script>var a = 1;</script></head><body><article>"
+        + " ".join(rng.choices(vocab, k=rng.randint(500, 5000)))
+        + "</article></body></html>"
+        for _ in range(pages)
+    ]
+    total = sum(len(d) for d in docs)
+    start = time.perf_counter()
+    for d in docs:
+        simhash(d)
+    elapsed = time.perf_counter() - start
+    print(
+        f"fingerprinting: {pages / elapsed:,.0f} pages/sec "
+        f"({total / 1e6 / elapsed:.1f} MB/s, avg page {total / pages / 1e3:.0f} KB)"
+    )
+
+
+def bench_query(n: int, queries: int, rng: random.Random) -> None:
+    np_rng = np.random.default_rng(rng.randrange(2**32))
+    fingerprints = np_rng.integers(0, 2**63, size=n, dtype=np.uint64) * np.uint64(2)
+    fingerprints ^= np_rng.integers(0, 2, size=n, dtype=np.uint64)
+
+    start = time.perf_counter()
+    index = BandIndex(fingerprints)
+    print(f"index build: {time.perf_counter() - start:.2f}s for {n:,} fingerprints")
+
+    latencies = []
+    found = 0
+    for _ in range(queries):
+        planted = int(fingerprints[rng.randrange(n)])
+        probe = planted
+        for bit in rng.sample(range(64), rng.randint(0, MAX_DISTANCE)):
+            probe ^= 1 << bit
+        start = time.perf_counter()
+        matches = index.query(probe)
+        latencies.append(time.perf_counter() - start)
+        found += any(int(fingerprints[i]) == planted for i in matches)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f"query: p50 {p50:.0f}us, p99 {p99:.0f}us, recall {found / queries:.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--fingerprints", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bench_throughput(args.pages, rng)
+    bench_query(args.fingerprints, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Bytes saved and CPU spent by the HTML slimming stage, per page.
+
+Usage (from the repo root):
+
+    python -m benchmarks.bench_html_slim --fetch    # download benchmarks/corpus/urls.txt
+    python -m benchmarks.bench_html_slim            # run over benchmarks/corpus/*.html
+"""
+
+import argparse
+import hashlib
+import time
+from pathlib import Path
+
+import httpx
+
+from src.legendary_potato.core.html_slim import SlimPolicy, slim_html
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+
+def fetch_corpus(corpus_dir: Path) -> None:
+    urls = [
+        line.strip()
+        for line in (corpus_dir / "urls.txt").read_text(encoding="utf-8").splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+    headers = {"User-Agent": "Mozilla/5.0 (legendary_potato slim benchmark)"}
+    with httpx.Client(follow_redirects=True, timeout=20, headers=headers) as client:
+        for url in urls:
+            name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + ".html"
+            try:
+                resp = client.get(url)
+                resp.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"skip {url}: {e}")
+                continue
+            (corpus_dir / name).write_text(resp.text, encoding="utf-8")
+            print(f"saved {url} -> {name} ({len(resp.content)} bytes)")
+
+
+def run(corpus_dir: Path, policy: SlimPolicy, repeat: int) -> None:
+    pages = sorted(corpus_dir.glob("*.html"))
+    if not pages:
+        raise SystemExit(f"No pages in {corpus_dir}; run with --fetch first.")
+
+    total_in = total_out = 0
+    total_cpu = 0.0
+    print(f"{'page':<24} {'original':>10} {'slimmed':>10} {'saved':>7} {'cpu ms':>8}")
+    for path in pages:
+        html = path.read_text(encoding="utf-8", errors="replace")
+        start = time.process_time()
+        for _ in range(repeat):
+            result = slim_html(html, policy)
+        cpu_ms = (time.process_time() - start) * 1000 / repeat
+
+        saved = 1 - result.slimmed_bytes / max(result.original_bytes, 1)
+        print(
+            f"{path.name:<24} {result.original_bytes:>10} {result.slimmed_bytes:>10} "
+            f"{saved:>6.1%} {cpu_ms:>8.2f}"
+        )
+        total_in += result.original_bytes
+        total_out += result.slimmed_bytes
+        total_cpu += cpu_ms
+
+    print(
+        f"\n{len(pages)} pages: {total_in} -> {total_out} bytes "
+        f"({1 - total_out / max(total_in, 1):.1%} saved), "
+        f"{total_cpu / len(pages):.2f} ms CPU/page, "
+        f"{total_in / 1e6 / (total_cpu / 1000 or 1e-9):.1f} MB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR)
+    parser.add_argument("--fetch", action="store_true", help="download urls.txt first")
+    parser.add_argument("--strip", default="scripts,styles,svg_sprites,data_uris")
+    parser.add_argument("--data-uri-min-bytes", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_corpus(args.corpus)
+    policy = SlimPolicy.from_names(
+        [s.strip() for s in args.strip.split(",") if s.strip()],
+        data_uri_min_bytes=args.data_uri_min_bytes,
+    )
+    run(args.corpus, policy, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -103,15 +103,45 @@ async function extractCurrentPage() {
   return result;
 }
 
+async function sha256Hex(bytes) {
+  const digest = await crypto.subtle.digest("SHA-256", bytes);
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
 async function savePage() {
   const baseUrl = await getBaseUrl();
   const page = await extractCurrentPage();
+  // One key per save: the retry after a token refresh (or a flaky network)
+  // returns the first save instead of storing the page twice.
+  const idempotencyKey = crypto.randomUUID();
+  const headers = {
+    "Content-Type": "application/json",
+    "Idempotency-Key": idempotencyKey,
+  };
+
+  // Ask first whether the server already has this exact page; only upload on a miss.
+  const htmlBytes = new TextEncoder().encode(page.html);
+  const check = await fetchWithAuth(`${baseUrl}/bookmarks/precheck`, {
+    method: "POST",
+    headers,
+    body: JSON.stringify({
+      url: page.url,
+      title: page.title,
+      html_sha256: await sha256Hex(htmlBytes),
+      html_size: htmlBytes.length,
+    }),
+  });
+  if (check.ok) {
+    const json = await check.json();
+    if (json.status === "saved") {
+      setStatus(`Saved (page already stored).\nBookmark id: ${json.id}\nURL: ${page.url}`);
+      return;
+    }
+  }
 
   const resp = await fetchWithAuth(`${baseUrl}/bookmarks`, {
     method: "POST",
-    headers: {
-      "Content-Type": "application/json",
-    },
+    headers,
     body: JSON.stringify(page),
   });
 
@@ -0,0 +1,6 @@
+-- 002_bookmark_html_sizes.sql
+-- Record the captured and stored (slimmed) HTML size of each bookmark.
+
+ALTER TABLE bookmarks
+  ADD COLUMN IF NOT EXISTS html_original_bytes integer NULL,
+  ADD COLUMN IF NOT EXISTS html_bytes integer NULL;
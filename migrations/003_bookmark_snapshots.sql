@@ -0,0 +1,12 @@
+-- 003_bookmark_snapshots.sql
+-- Snapshot chains: repeated saves of the same user+URL are numbered versions,
+-- and non-keyframe versions store a delta against `delta_base_id` instead of
+-- the full document.
+
+ALTER TABLE bookmarks
+  ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1,
+  ADD COLUMN IF NOT EXISTS delta_base_id uuid NULL,
+  ADD COLUMN IF NOT EXISTS html_delta bytea NULL;
+
+CREATE INDEX IF NOT EXISTS idx_bookmarks_user_url_version
+  ON bookmarks(user_id, url, version DESC);
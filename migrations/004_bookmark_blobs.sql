@@ -0,0 +1,6 @@
+-- 004_bookmark_blobs.sql
+-- Key of the externally stored document (e.g. `fs:<sha256>`); when set,
+-- `bookmarks.html` is NULL.
+
+ALTER TABLE bookmarks
+  ADD COLUMN IF NOT EXISTS html_blob text NULL;
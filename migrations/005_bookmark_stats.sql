@@ -0,0 +1,137 @@
+-- 005_bookmark_stats.sql
+-- Per-user bookmark aggregates maintained by triggers, so GET /bookmarks/stats
+-- never scans `bookmarks`. `bookmark_stats_reconcile(user_id)` rebuilds one
+-- user's aggregates from scratch to repair drift.
+
+CREATE TABLE IF NOT EXISTS bookmark_stats (
+  user_id uuid PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+  total_count bigint NOT NULL DEFAULT 0,
+  total_bytes bigint NOT NULL DEFAULT 0,
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS bookmark_domain_stats (
+  user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  domain text NOT NULL,
+  count bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, domain)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bookmark_domain_stats_user_count
+  ON bookmark_domain_stats(user_id, count DESC);
+
+CREATE TABLE IF NOT EXISTS bookmark_daily_stats (
+  user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  day date NOT NULL,
+  count bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day)
+);
+
+CREATE OR REPLACE FUNCTION bookmark_domain(url text) RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT coalesce(
+    lower(substring(url from '^[A-Za-z][A-Za-z0-9+.-]*://(?:[^@/?#]*@)?([^:/?#]+)')),
+    ''
+  )
+$$;
+
+-- Bytes a row occupies: the delta for chained snapshots, else the document.
+CREATE OR REPLACE FUNCTION bookmark_stored_bytes(html_bytes integer, html_delta bytea) RETURNS bigint
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT coalesce(octet_length(html_delta), html_bytes, 0)::bigint
+$$;
+
+-- Serializes trigger updates and reconciliation for one user.
+CREATE OR REPLACE FUNCTION bookmark_stats_lock(p_user uuid) RETURNS void
+LANGUAGE sql AS $$
+  SELECT pg_advisory_xact_lock(hashtextextended('bookmark_stats:' || p_user::text, 0))
+$$;
+
+CREATE OR REPLACE FUNCTION bookmark_stats_apply(
+  p_user uuid, p_url text, p_created_at timestamptz, p_bytes bigint, p_sign integer
+) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_domain text := bookmark_domain(p_url);
+  v_day date := (p_created_at AT TIME ZONE 'UTC')::date;
+BEGIN
+  PERFORM bookmark_stats_lock(p_user);
+
+  INSERT INTO bookmark_stats AS s (user_id, total_count, total_bytes)
+  VALUES (p_user, p_sign, p_sign * p_bytes)
+  ON CONFLICT (user_id) DO UPDATE
+    SET total_count = s.total_count + EXCLUDED.total_count,
+        total_bytes = s.total_bytes + EXCLUDED.total_bytes,
+        updated_at = now();
+
+  INSERT INTO bookmark_domain_stats AS s (user_id, domain, count)
+  VALUES (p_user, v_domain, p_sign)
+  ON CONFLICT (user_id, domain) DO UPDATE SET count = s.count + EXCLUDED.count;
+
+  INSERT INTO bookmark_daily_stats AS s (user_id, day, count)
+  VALUES (p_user, v_day, p_sign)
+  ON CONFLICT (user_id, day) DO UPDATE SET count = s.count + EXCLUDED.count;
+
+  IF p_sign < 0 THEN
+    DELETE FROM bookmark_domain_stats
+    WHERE user_id = p_user AND domain = v_domain AND count <= 0;
+    DELETE FROM bookmark_daily_stats
+    WHERE user_id = p_user AND day = v_day AND count <= 0;
+  END IF;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION bookmark_stats_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    PERFORM bookmark_stats_apply(
+      OLD.user_id, OLD.url, OLD.created_at,
+      bookmark_stored_bytes(OLD.html_bytes, OLD.html_delta), -1
+    );
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM bookmark_stats_apply(
+      NEW.user_id, NEW.url, NEW.created_at,
+      bookmark_stored_bytes(NEW.html_bytes, NEW.html_delta), 1
+    );
+  END IF;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS bookmarks_stats ON bookmarks;
+CREATE TRIGGER bookmarks_stats
+  AFTER INSERT OR DELETE OR UPDATE OF user_id, url, created_at, html_bytes, html_delta
+  ON bookmarks
+  FOR EACH ROW EXECUTE FUNCTION bookmark_stats_trigger();
+
+CREATE OR REPLACE FUNCTION bookmark_stats_reconcile(p_user uuid) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM bookmark_stats_lock(p_user);
+
+  DELETE FROM bookmark_stats WHERE user_id = p_user;
+  DELETE FROM bookmark_domain_stats WHERE user_id = p_user;
+  DELETE FROM bookmark_daily_stats WHERE user_id = p_user;
+
+  INSERT INTO bookmark_stats (user_id, total_count, total_bytes)
+  SELECT p_user, count(*), coalesce(sum(bookmark_stored_bytes(html_bytes, html_delta)), 0)
+  FROM bookmarks
+  WHERE user_id = p_user;
+
+  INSERT INTO bookmark_domain_stats (user_id, domain, count)
+  SELECT p_user, bookmark_domain(url), count(*)
+  FROM bookmarks
+  WHERE user_id = p_user
+  GROUP BY 2;
+
+  INSERT INTO bookmark_daily_stats (user_id, day, count)
+  SELECT p_user, (created_at AT TIME ZONE 'UTC')::date, count(*)
+  FROM bookmarks
+  WHERE user_id = p_user
+  GROUP BY 2;
+END
+$$;
+
+SELECT bookmark_stats_reconcile(id) FROM users;
@@ -0,0 +1,43 @@
+-- 006_bookmark_fingerprints.sql
+-- SimHash fingerprints for near-duplicate detection. Each fingerprint is split
+-- into 4 x 16-bit LSH bands; pages within 3 bits share at least one band, so
+-- a lookup is 4 index probes instead of a scan of the user's library.
+
+ALTER TABLE bookmarks
+  ADD COLUMN IF NOT EXISTS simhash bigint NULL;
+
+CREATE TABLE IF NOT EXISTS bookmark_fingerprint_bands (
+  user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  band smallint NOT NULL,
+  value integer NOT NULL,
+  bookmark_id uuid NOT NULL,
+  simhash bigint NOT NULL,
+  PRIMARY KEY (user_id, band, value, bookmark_id)
+);
+
+CREATE OR REPLACE FUNCTION bookmark_fingerprint_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.simhash IS NOT NULL THEN
+    DELETE FROM bookmark_fingerprint_bands
+    WHERE user_id = OLD.user_id
+      AND (band, value) IN (
+        SELECT b, ((OLD.simhash >> (16 * b)) & 65535)::integer
+        FROM generate_series(0, 3) AS b
+      )
+      AND bookmark_id = OLD.id;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.simhash IS NOT NULL THEN
+    INSERT INTO bookmark_fingerprint_bands (user_id, band, value, bookmark_id, simhash)
+    SELECT NEW.user_id, b, ((NEW.simhash >> (16 * b)) & 65535)::integer, NEW.id, NEW.simhash
+    FROM generate_series(0, 3) AS b;
+  END IF;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS bookmarks_fingerprint ON bookmarks;
+CREATE TRIGGER bookmarks_fingerprint
+  AFTER INSERT OR DELETE OR UPDATE OF user_id, simhash
+  ON bookmarks
+  FOR EACH ROW EXECUTE FUNCTION bookmark_fingerprint_trigger();
@@ -0,0 +1,96 @@
+-- 007_partition_bookmarks.sql
+-- Convert `bookmarks` to monthly range partitions on created_at.
+--
+-- The copy runs inside the migration transaction and holds an exclusive lock
+-- on the old table; for very large tables run it in a maintenance window.
+-- There is deliberately no DEFAULT partition: it would stop the planner from
+-- using an ordered Append, which is what lets `list_bookmarks` stop after the
+-- newest partitions. `ensure_bookmark_partitions` (run at startup and daily)
+-- keeps partitions created ahead of time.
+
+ALTER TABLE bookmarks RENAME TO bookmarks_unpartitioned;
+ALTER TABLE bookmarks_unpartitioned RENAME CONSTRAINT bookmarks_pkey TO bookmarks_unpartitioned_pkey;
+ALTER INDEX idx_bookmarks_user_created_at RENAME TO idx_bookmarks_unpartitioned_user_created_at;
+ALTER INDEX idx_bookmarks_user_url_version RENAME TO idx_bookmarks_unpartitioned_user_url_version;
+DROP TRIGGER IF EXISTS bookmarks_stats ON bookmarks_unpartitioned;
+DROP TRIGGER IF EXISTS bookmarks_fingerprint ON bookmarks_unpartitioned;
+
+CREATE TABLE bookmarks (
+  id uuid NOT NULL,
+  user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  url text NOT NULL,
+  title text NULL,
+  html text NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  html_original_bytes integer NULL,
+  html_bytes integer NULL,
+  version integer NOT NULL DEFAULT 1,
+  delta_base_id uuid NULL,
+  html_delta bytea NULL,
+  html_blob text NULL,
+  simhash bigint NULL,
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX idx_bookmarks_user_created_at
+  ON bookmarks(user_id, created_at DESC);
+
+CREATE INDEX idx_bookmarks_user_url_version
+  ON bookmarks(user_id, url, version DESC);
+
+-- Creates missing monthly partitions (UTC months) from the month containing
+-- p_from through p_months_ahead months after the current one. Returns the
+-- number of partitions created.
+CREATE OR REPLACE FUNCTION ensure_bookmark_partitions(p_from timestamptz, p_months_ahead integer)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_month date := date_trunc('month', p_from AT TIME ZONE 'UTC')::date;
+  v_last date := (date_trunc('month', now() AT TIME ZONE 'UTC')
+                  + make_interval(months => p_months_ahead))::date;
+  v_name text;
+  v_created integer := 0;
+BEGIN
+  WHILE v_month <= v_last LOOP
+    v_name := 'bookmarks_' || to_char(v_month, 'YYYY_MM');
+    IF to_regclass(v_name) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE %I PARTITION OF bookmarks FOR VALUES FROM (%L) TO (%L)',
+        v_name,
+        v_month::timestamp AT TIME ZONE 'UTC',
+        (v_month + interval '1 month') AT TIME ZONE 'UTC'
+      );
+      v_created := v_created + 1;
+    END IF;
+    v_month := (v_month + interval '1 month')::date;
+  END LOOP;
+  RETURN v_created;
+END
+$$;
+
+SELECT ensure_bookmark_partitions(
+  coalesce((SELECT min(created_at) FROM bookmarks_unpartitioned), now()),
+  3
+);
+
+INSERT INTO bookmarks
+  (id, user_id, url, title, html, created_at, html_original_bytes, html_bytes,
+   version, delta_base_id, html_delta, html_blob, simhash)
+SELECT
+  id, user_id, url, title, html, created_at, html_original_bytes, html_bytes,
+  version, delta_base_id, html_delta, html_blob, simhash
+FROM bookmarks_unpartitioned;
+
+DROP TABLE bookmarks_unpartitioned;
+
+-- Aggregates and fingerprint bands were built from the copied rows already;
+-- attach the triggers after the copy so they are not counted twice.
+CREATE TRIGGER bookmarks_stats
+  AFTER INSERT OR DELETE OR UPDATE OF user_id, url, created_at, html_bytes, html_delta
+  ON bookmarks
+  FOR EACH ROW EXECUTE FUNCTION bookmark_stats_trigger();
+
+CREATE TRIGGER bookmarks_fingerprint
+  AFTER INSERT OR DELETE OR UPDATE OF user_id, simhash
+  ON bookmarks
+  FOR EACH ROW EXECUTE FUNCTION bookmark_fingerprint_trigger();
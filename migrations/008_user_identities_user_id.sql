@@ -0,0 +1,6 @@
+-- 008_user_identities_user_id.sql
+-- `get_identities` looks identities up by owner; the only index so far was the
+-- (provider, provider_subject) unique constraint.
+
+CREATE INDEX IF NOT EXISTS idx_user_identities_user_id
+  ON user_identities(user_id);
@@ -0,0 +1,85 @@
+-- 009_bookmark_changes.sql
+-- Per-user change sequence behind `GET /bookmarks/changes?since=`.
+--
+-- Every insert or update of a bookmark takes the next value of
+-- `users.bookmark_change_seq` into `bookmarks.change_seq`. Every delete records
+-- a tombstone with its own sequence value. Taking the next value row-locks the
+-- user until commit, so one user's sequence values commit in order. A client
+-- that has seen N therefore never misses a later commit with a value <= N.
+
+ALTER TABLE users
+  ADD COLUMN IF NOT EXISTS bookmark_change_seq bigint NOT NULL DEFAULT 0;
+
+ALTER TABLE bookmarks
+  ADD COLUMN IF NOT EXISTS change_seq bigint NULL;
+
+CREATE TABLE IF NOT EXISTS bookmark_tombstones (
+  user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  change_seq bigint NOT NULL,
+  bookmark_id uuid NOT NULL,
+  deleted_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, change_seq)
+);
+
+-- Backfill existing rows in creation order.
+UPDATE bookmarks b
+SET change_seq = s.seq
+FROM (
+  SELECT id, created_at,
+         row_number() OVER (PARTITION BY user_id ORDER BY created_at, id) AS seq
+  FROM bookmarks
+) s
+WHERE b.id = s.id AND b.created_at = s.created_at;
+
+UPDATE users u
+SET bookmark_change_seq = s.seq
+FROM (SELECT user_id, max(change_seq) AS seq FROM bookmarks GROUP BY user_id) s
+WHERE u.id = s.user_id;
+
+ALTER TABLE bookmarks ALTER COLUMN change_seq SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_bookmarks_user_change_seq
+  ON bookmarks(user_id, change_seq);
+
+-- NULL when the user row is gone (cascading delete of the whole account).
+CREATE OR REPLACE FUNCTION bookmark_next_change_seq(p_user uuid) RETURNS bigint
+LANGUAGE sql AS $$
+  UPDATE users
+  SET bookmark_change_seq = bookmark_change_seq + 1
+  WHERE id = p_user
+  RETURNING bookmark_change_seq;
+$$;
+
+CREATE OR REPLACE FUNCTION bookmark_change_seq_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  -- Unknown user: leave it to the foreign key to reject the row.
+  NEW.change_seq := coalesce(bookmark_next_change_seq(NEW.user_id), 0);
+  RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION bookmark_tombstone_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_seq bigint := bookmark_next_change_seq(OLD.user_id);
+BEGIN
+  IF v_seq IS NOT NULL THEN
+    INSERT INTO bookmark_tombstones (user_id, change_seq, bookmark_id)
+    VALUES (OLD.user_id, v_seq, OLD.id);
+  END IF;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS bookmarks_change_seq ON bookmarks;
+CREATE TRIGGER bookmarks_change_seq
+  BEFORE INSERT OR UPDATE
+  ON bookmarks
+  FOR EACH ROW EXECUTE FUNCTION bookmark_change_seq_trigger();
+
+DROP TRIGGER IF EXISTS bookmarks_tombstone ON bookmarks;
+CREATE TRIGGER bookmarks_tombstone
+  AFTER DELETE
+  ON bookmarks
+  FOR EACH ROW EXECUTE FUNCTION bookmark_tombstone_trigger();
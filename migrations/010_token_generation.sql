@@ -0,0 +1,14 @@
+-- 010_token_generation.sql
+-- Access-token revocation without a lookup per request.
+--
+-- Access tokens carry the user's `token_generation` in a `gen` claim.
+-- `/auth/revoke` increments the generation and sends a NOTIFY on
+-- `token_revocations`. Each app process keeps a map of users whose generation
+-- is above 0 and rejects tokens with an older `gen`.
+
+ALTER TABLE users
+  ADD COLUMN IF NOT EXISTS token_generation integer NOT NULL DEFAULT 0;
+
+-- Loaded by every process at startup; only users that have ever revoked.
+CREATE INDEX IF NOT EXISTS idx_users_token_generation
+  ON users(id, token_generation) WHERE token_generation > 0;
@@ -0,0 +1,20 @@
+-- 011_page_fetches.sql
+-- Server-side fetches of pages for bookmarks saved without HTML.
+--
+-- One row per URL: the outcome of the last fetch and, when it stored a page,
+-- the validators (ETag / Last-Modified) and the bookmark that holds the copy.
+-- A later fetch of the same URL sends the validators and, on 304, reuses that
+-- copy. URLs can exceed the btree entry limit, so the key is their md5.
+
+CREATE TABLE IF NOT EXISTS page_fetches (
+  url text NOT NULL,
+  status text NOT NULL,
+  http_status integer NULL,
+  etag text NULL,
+  last_modified text NULL,
+  bookmark_id uuid NULL,
+  fetched_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_page_fetches_url_md5
+  ON page_fetches(md5(url));
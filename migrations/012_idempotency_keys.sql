@@ -0,0 +1,19 @@
+-- 012_idempotency_keys.sql
+-- `Idempotency-Key` on POST /bookmarks.
+--
+-- A key is written in the same transaction as the bookmark it created, so a
+-- replay finds either both or neither. A concurrent duplicate blocks on the
+-- primary key until the first save commits. `bookmarks` is partitioned with
+-- (id, created_at) as its key, so `bookmark_id` is not a foreign key.
+-- Keys older than IDEMPOTENCY_KEY_TTL_SECONDS are ignored and purged.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  key text NOT NULL,
+  bookmark_id uuid NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at
+  ON idempotency_keys(created_at);
@@ -0,0 +1,19 @@
+-- 013_bookmark_html_hashes.sql
+-- Upload avoidance: `POST /bookmarks/precheck` asks whether the user already
+-- stored a page, identified by the sha256 and byte size of the HTML as the
+-- client captured it, before any of it is sent.
+--
+-- One row per user and hash: the most recent bookmark saved with that page.
+-- Kept in its own table rather than as an index on `bookmarks`, which would
+-- have to probe every monthly partition; here a precheck is one primary-key
+-- lookup. Rows are not removed when a bookmark is deleted; a precheck that
+-- finds a deleted bookmark is answered as a miss.
+
+CREATE TABLE IF NOT EXISTS bookmark_html_hashes (
+  user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  html_sha256 bytea NOT NULL,
+  html_size integer NOT NULL,
+  bookmark_id uuid NOT NULL,
+  created_at timestamptz NOT NULL,
+  PRIMARY KEY (user_id, html_sha256)
+);
@@ -0,0 +1,8 @@
+-- 014_maintenance_runs.sql
+-- When each cluster-wide maintenance job last finished, so app processes that
+-- all schedule the same job run it once per interval between them.
+
+CREATE TABLE IF NOT EXISTS maintenance_runs (
+  name text PRIMARY KEY,
+  finished_at timestamptz NOT NULL
+);
@@ -0,0 +1,39 @@
+-- 015_bookmark_ids.sql
+-- The creation time of every bookmark, by id.
+--
+-- Requests name a bookmark by id alone, but `bookmarks` is partitioned on
+-- created_at, so an id-only lookup probes the primary key of every monthly
+-- partition. Looking created_at up here first (one primary-key probe) lets
+-- the bookmarks scan prune to the one partition that holds the row.
+
+CREATE TABLE IF NOT EXISTS bookmark_ids (
+  id uuid PRIMARY KEY,
+  created_at timestamptz NOT NULL
+);
+
+INSERT INTO bookmark_ids (id, created_at)
+SELECT id, created_at FROM bookmarks
+ON CONFLICT (id) DO NOTHING;
+
+-- A created_at change that moves the row to another partition fires DELETE
+-- and INSERT instead of UPDATE; both orders leave the new created_at.
+CREATE OR REPLACE FUNCTION bookmark_ids_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    DELETE FROM bookmark_ids WHERE id = OLD.id AND created_at = OLD.created_at;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO bookmark_ids (id, created_at)
+    VALUES (NEW.id, NEW.created_at)
+    ON CONFLICT (id) DO UPDATE SET created_at = EXCLUDED.created_at;
+  END IF;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS bookmarks_ids ON bookmarks;
+CREATE TRIGGER bookmarks_ids
+  AFTER INSERT OR DELETE OR UPDATE OF id, created_at
+  ON bookmarks
+  FOR EACH ROW EXECUTE FUNCTION bookmark_ids_trigger();
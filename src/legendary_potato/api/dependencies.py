@@ -2,9 +2,16 @@ import uuid
 
 from fastapi import HTTPException, Request
 
+from ..core.config import app_config
 from ..core.db import Db
+from ..core.events import EventHub
+from ..core.fetcher import PageFetcher
+from ..core.idempotency import InFlightRequests
+from ..core.metrics import Metrics
+from ..core.profiling import PROFILE_HEADER, Profiler
 from ..core.rate_limit import RateLimiter
-from ..core.tokens import verify_access_token
+from ..core.revocation import TokenRevocations
+from ..core.tokens import VerifiedTokenCache
 
 
 def get_db(request: Request) -> Db:
@@ -14,6 +21,18 @@ def get_db(request: Request) -> Db:
     return db
 
 
+def get_event_hub(request: Request) -> EventHub:
+    hub = getattr(request.app.state, "events", None)
+    if hub is None:
+        raise HTTPException(status_code=500, detail="Event stream is not configured")
+    return hub
+
+
+def get_page_fetcher(request: Request) -> PageFetcher | None:
+    """None when server-side fetching is disabled."""
+    return getattr(request.app.state, "fetcher", None)
+
+
 def get_rate_limiter(request: Request) -> RateLimiter:
     rl = getattr(request.app.state, "rate_limiter", None)
     if rl is None:
@@ -22,6 +41,48 @@ def get_rate_limiter(request: Request) -> RateLimiter:
     return rl
 
 
+def get_in_flight_requests(request: Request) -> InFlightRequests:
+    in_flight = getattr(request.app.state, "in_flight", None)
+    if in_flight is None:
+        in_flight = InFlightRequests()
+        request.app.state.in_flight = in_flight
+    return in_flight
+
+
+def get_metrics(request: Request) -> Metrics:
+    metrics = getattr(request.app.state, "metrics", None)
+    if metrics is None:
+        metrics = Metrics()
+        request.app.state.metrics = metrics
+    return metrics
+
+
+def get_admin_profiler(request: Request) -> Profiler:
+    """The profiler, for callers holding its admin token; 404 while profiling is off."""
+    profiler = getattr(request.app.state, "profiler", None)
+    if profiler is None or not profiler.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiler.is_admin(request.headers.get(PROFILE_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    return profiler
+
+
+def get_token_revocations(request: Request) -> TokenRevocations:
+    revocations = getattr(request.app.state, "revocations", None)
+    if revocations is None:
+        revocations = TokenRevocations()
+        request.app.state.revocations = revocations
+    return revocations
+
+
+def get_token_cache(request: Request) -> VerifiedTokenCache:
+    cache = getattr(request.app.state, "token_cache", None)
+    if cache is None:
+        cache = VerifiedTokenCache(max_entries=app_config.access_token_cache_size)
+        request.app.state.token_cache = cache
+    return cache
+
+
 def get_session_user_id(request: Request) -> uuid.UUID:
     user_id = request.session.get("user_id")
     if not user_id:
@@ -29,7 +90,9 @@ def get_session_user_id(request: Request) -> uuid.UUID:
     return uuid.UUID(str(user_id))
 
 
-def get_bearer_user_id(request: Request) -> uuid.UUID:
+async def get_bearer_user_id(request: Request) -> uuid.UUID:
+    # async so it runs on the event loop: the cache is not thread-safe, and a
+    # cache hit is far cheaper than the threadpool hop a sync dependency costs.
     auth = request.headers.get("authorization") or request.headers.get("Authorization")
     if not auth:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
@@ -39,10 +102,15 @@ def get_bearer_user_id(request: Request) -> uuid.UUID:
         raise HTTPException(status_code=401, detail="Invalid Authorization header")
 
     try:
-        return verify_access_token(parts[1])
+        claims = get_token_cache(request).decode(parts[1])
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    # In-memory generation map; no database round trip per request.
+    if get_token_revocations(request).is_revoked(claims.user_id, claims.generation):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return claims.user_id
+
 
 def get_current_user(request: Request) -> dict:
     """
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from starlette.responses import RedirectResponse, JSONResponse
 
-from ...api.dependencies import get_db, get_rate_limiter
+from ...api.dependencies import get_db, get_rate_limiter, get_token_revocations
 from ...core.config import app_config
 from ...core.security import oauth
 from ...core.tokens import create_access_token
@@ -85,8 +85,9 @@ async def auth_google_callback(request: Request):
 
         return_to = request.session.pop("return_to", None)
         if return_to and user_id is not None:
-            access_token = create_access_token(user_id=user_id)
-            refresh_token = await db.issue_refresh_token(user_id=user_id)
+            refresh_token, generation = await db.issue_refresh_token(user_id=user_id)
+            get_token_revocations(request).apply(user_id, generation)
+            access_token = create_access_token(user_id=user_id, generation=generation)
             # Use fragment so the token doesn't hit server logs.
             redirect = (
                 f"{return_to}#access_token={access_token}"
@@ -1,8 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
-from ..dependencies import get_bearer_user_id, get_db, get_rate_limiter, get_session_user_id
+from ..dependencies import (
+    get_bearer_user_id,
+    get_db,
+    get_rate_limiter,
+    get_session_user_id,
+    get_token_revocations,
+)
 from ...core.db import Db
+from ...core.revocation import TokenRevocations
 
 from ...core.tokens import create_access_token
 
@@ -21,9 +28,12 @@ async def auth_status(request: Request):
 async def auth_token(
     user_id=Depends(get_session_user_id),
     db: Db = Depends(get_db),
+    revocations: TokenRevocations = Depends(get_token_revocations),
 ):
-    token = create_access_token(user_id=user_id)
-    refresh_token = await db.issue_refresh_token(user_id=user_id)
+    refresh_token, generation = await db.issue_refresh_token(user_id=user_id)
+    # The database's generation is authoritative; catch up if a NOTIFY was missed.
+    revocations.apply(user_id, generation)
+    token = create_access_token(user_id=user_id, generation=generation)
     return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
@@ -47,16 +57,20 @@ async def refresh(
     payload: RefreshRequest,
     db: Db = Depends(get_db),
     rl=Depends(get_rate_limiter),
+    revocations: TokenRevocations = Depends(get_token_revocations),
 ):
     if not rl.allow(key=f"auth:refresh:{payload.refresh_token[:12]}", limit=30, window_seconds=60):
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
     try:
-        user_id, new_refresh = await db.rotate_refresh_token(refresh_token=payload.refresh_token)
+        user_id, new_refresh, generation = await db.rotate_refresh_token(
+            refresh_token=payload.refresh_token
+        )
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    access = create_access_token(user_id=user_id)
+    revocations.apply(user_id, generation)
+    access = create_access_token(user_id=user_id, generation=generation)
     return {"access_token": access, "refresh_token": new_refresh, "token_type": "bearer"}
 
 
@@ -64,7 +78,18 @@ async def refresh(
 async def revoke(
     user_id=Depends(get_bearer_user_id),
     db: Db = Depends(get_db),
+    revocations: TokenRevocations = Depends(get_token_revocations),
 ):
-    count = await db.revoke_refresh_tokens_for_user(user_id=user_id)
+    """
+    Revokes the caller's refresh tokens and all access tokens issued so far,
+    including the one used for this request, in every app process.
+    """
+    try:
+        count, generation = await db.revoke_tokens_for_user(user_id=user_id)
+    except ValueError:
+        # A valid token for a user that no longer exists.
+        raise HTTPException(status_code=401, detail="Unknown user")
+    # Don't wait for our own NOTIFY to come back.
+    revocations.apply(user_id, generation)
     return {"revoked": count}
 
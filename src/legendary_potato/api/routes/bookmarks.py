@@ -1,15 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, Field
+import json
+import uuid
+from collections.abc import AsyncIterator
 
-from ..dependencies import get_bearer_user_id, get_db, get_rate_limiter
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from ..dependencies import (
+    get_bearer_user_id,
+    get_db,
+    get_event_hub,
+    get_in_flight_requests,
+    get_metrics,
+    get_page_fetcher,
+    get_rate_limiter,
+)
 from ...core.config import app_config
 from ...core.db import Db
+from ...core.events import EventHub, Subscription
+from ...core.export import (
+    EXPORT_FORMATS,
+    available_compressions,
+    default_compression,
+    export_filename,
+    export_media_type,
+    export_stream,
+)
+from ...core.fetcher import FetchJob, PageFetcher
+from ...core.fingerprint import MAX_DISTANCE
+from ...core.html_slim import SlimPolicy
+from ...core.idempotency import IDEMPOTENCY_HEADER, InFlightRequests, valid_idempotency_key
+from ...core.metrics import Metrics
+from ...core.ingest import prepare_html
 
 __all__ = ["router"]
 
 
 router = APIRouter()
 
+slim_policy = SlimPolicy.from_names(
+    app_config.html_slim_strip,
+    data_uri_min_bytes=app_config.html_slim_data_uri_min_bytes,
+)
+
+# Stored pages are third-party HTML served from our origin: never let them run.
+_SNAPSHOT_HEADERS = {
+    "Content-Security-Policy": "sandbox",
+    "X-Content-Type-Options": "nosniff",
+}
+_SNAPSHOT_MEDIA_TYPE = "text/html; charset=utf-8"
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 
 class BookmarkCreate(BaseModel):
     url: str = Field(min_length=1)
@@ -17,27 +62,184 @@ class BookmarkCreate(BaseModel):
     html: str | None = None
 
 
-@router.post("/bookmarks")
+class BookmarkPrecheck(BaseModel):
+    url: str = Field(min_length=1)
+    title: str | None = None
+    html_sha256: str = Field(pattern=r"^[0-9a-f]{64}$")  # of the UTF-8 page, hex
+    html_size: int = Field(ge=0)  # UTF-8 bytes
+
+
+async def _read_bookmark(request: Request, metrics: Metrics) -> BookmarkCreate:
+    body = await request.body()
+    metrics.inc("bookmark_upload_bytes_total", len(body))
+    try:
+        return BookmarkCreate.model_validate_json(body)
+    except ValidationError as e:
+        errors = [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        raise RequestValidationError(errors, body=body)
+
+
+async def _save_bookmark(
+    request: Request,
+    *,
+    user_id: uuid.UUID,
+    db: Db,
+    fetcher: PageFetcher | None,
+    metrics: Metrics,
+    idempotency_key: str | None = None,
+) -> tuple[uuid.UUID, bool]:
+    """Returns (id, created) from `Db.create_bookmark`."""
+    payload = await _read_bookmark(request, metrics)
+    prepared = None
+    if payload.html is not None:
+        if len(payload.html.encode("utf-8")) > int(app_config.max_html_bytes):
+            raise HTTPException(
+                status_code=413,
+                detail=f"HTML too large (max {app_config.max_html_bytes} bytes)",
+            )
+        # Slimming and fingerprinting scan up to ~1.5MB; keep them off the event loop.
+        prepared = await run_in_threadpool(
+            prepare_html,
+            payload.html,
+            policy=slim_policy,
+            fingerprint=app_config.fingerprint_enabled,
+        )
+
+    bookmark_id, created = await db.create_bookmark(
+        user_id=user_id,
+        url=payload.url,
+        title=payload.title,
+        html=prepared.html if prepared else None,
+        html_original_bytes=prepared.original_bytes if prepared else None,
+        html_bytes=prepared.html_bytes if prepared else None,
+        simhash=prepared.simhash if prepared else None,
+        html_sha256=prepared.original_sha256 if prepared else None,
+        idempotency_key=idempotency_key,
+    )
+    if created and prepared is None and fetcher is not None:
+        # URL-only save (bulk import, mobile share): fetch the page in the background.
+        fetcher.enqueue(FetchJob(user_id=user_id, bookmark_id=bookmark_id, url=payload.url))
+    return bookmark_id, created
+
+
+@router.post(
+    "/bookmarks",
+    # The body is read by the route itself (see below); document it by hand.
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": BookmarkCreate.model_json_schema()}},
+        }
+    },
+)
 async def create_bookmark(
-    payload: BookmarkCreate,
+    request: Request,
     user_id=Depends(get_bearer_user_id),
     db: Db = Depends(get_db),
     rl=Depends(get_rate_limiter),
+    fetcher: PageFetcher | None = Depends(get_page_fetcher),
+    in_flight: InFlightRequests = Depends(get_in_flight_requests),
+    metrics: Metrics = Depends(get_metrics),
 ):
+    """
+    Saves `{"url", "title", "html"}`.
+
+    With an `Idempotency-Key` header, a retry of a save that already happened
+    returns the same id (with `Idempotent-Replayed: true`) before the body is
+    read, and concurrent retries wait for the first one instead of inserting.
+    """
     if not rl.allow(key=f"bookmark:create:{user_id}", limit=60, window_seconds=60):
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
-    if payload.html is not None:
-        if len(payload.html.encode("utf-8")) > int(app_config.max_html_bytes):
-            raise HTTPException(
-                status_code=413,
-                detail=f"HTML too large (max {app_config.max_html_bytes} bytes)",
-            )
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        bookmark_id, _ = await _save_bookmark(
+            request, user_id=user_id, db=db, fetcher=fetcher, metrics=metrics
+        )
+        return {"id": str(bookmark_id)}
+    if not valid_idempotency_key(key):
+        raise HTTPException(status_code=400, detail=f"Invalid {IDEMPOTENCY_HEADER} header")
 
-    bookmark_id = await db.create_bookmark(
-        user_id=user_id, url=payload.url, title=payload.title, html=payload.html
+    saved = False
+
+    async def save() -> uuid.UUID:
+        nonlocal saved
+        existing = await db.get_idempotent_bookmark(user_id=user_id, key=key)
+        if existing is not None:
+            return existing
+        # A save that lost the key to another process gets the winner's id
+        # back and is answered as a replay.
+        bookmark_id, saved = await _save_bookmark(
+            request,
+            user_id=user_id,
+            db=db,
+            fetcher=fetcher,
+            metrics=metrics,
+            idempotency_key=key,
+        )
+        return bookmark_id
+
+    bookmark_id = await in_flight.run(user_id=user_id, key=key, call=save)
+    if saved:
+        return {"id": str(bookmark_id)}
+    size = request.headers.get("content-length", "")
+    if size.isdigit():
+        metrics.inc("bookmark_upload_bytes_saved_total", int(size), reason="idempotent_replay")
+    return JSONResponse({"id": str(bookmark_id)}, headers={"Idempotent-Replayed": "true"})
+
+
+@router.post("/bookmarks/precheck")
+async def precheck_bookmark(
+    payload: BookmarkPrecheck,
+    request: Request,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+    rl=Depends(get_rate_limiter),
+    metrics: Metrics = Depends(get_metrics),
+):
+    """
+    First half of a two-phase save: `{"url", "title", "html_sha256", "html_size"}`.
+
+    When this user already stored that exact page, the bookmark is saved from
+    the stored copy: `{"status": "saved", "id"}`. Otherwise `{"status": "upload"}`,
+    and the client sends the page with `POST /bookmarks` as usual.
+    `Idempotency-Key` is honored as on `POST /bookmarks`; a miss does not use it up.
+    A hit counts against the same rate limit as `POST /bookmarks`; a miss does not,
+    as the upload that follows does.
+    """
+    if not rl.allow(key=f"bookmark:precheck:{user_id}", limit=60, window_seconds=60):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    create_limit = f"bookmark:create:{user_id}"
+    if not rl.allow(key=create_limit, limit=60, window_seconds=60):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is not None:
+        if not valid_idempotency_key(key):
+            raise HTTPException(status_code=400, detail=f"Invalid {IDEMPOTENCY_HEADER} header")
+        existing = await db.get_idempotent_bookmark(user_id=user_id, key=key)
+        if existing is not None:
+            return {"status": "saved", "id": str(existing)}
+
+    saved = await db.create_bookmark_from_hash(
+        user_id=user_id,
+        url=payload.url,
+        title=payload.title,
+        html_sha256=bytes.fromhex(payload.html_sha256),
+        html_size=payload.html_size,
+        idempotency_key=key,
     )
-    return {"id": str(bookmark_id)}
+    if saved is None:
+        rl.refund(key=create_limit)
+        metrics.inc("bookmark_precheck_total", result="miss")
+        return {"status": "upload"}
+    bookmark_id, created = saved
+    if not created:
+        # Lost the key to a concurrent retry: a replay, as above.
+        return {"status": "saved", "id": str(bookmark_id)}
+    metrics.inc("bookmark_precheck_total", result="hit")
+    metrics.inc("bookmark_upload_bytes_saved_total", payload.html_size, reason="precheck")
+    return {"status": "saved", "id": str(bookmark_id)}
 
 
 @router.get("/bookmarks")
@@ -53,3 +255,275 @@ async def list_bookmarks(
         r["created_at"] = r["created_at"].isoformat()
     return {"bookmarks": rows}
 
+
+@router.get("/bookmarks/stats")
+async def bookmark_stats(
+    days: int = 30,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+):
+    days = max(1, min(int(days), 366))
+    stats = await db.get_bookmark_stats(user_id=user_id, days=days)
+    for r in stats["per_day"]:
+        r["day"] = r["day"].isoformat()
+    return stats
+
+
+@router.get("/bookmarks/changes")
+async def bookmark_changes(
+    since: str = "0",
+    limit: int = 500,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+):
+    """
+    Incremental sync: everything written or deleted after the `since` token.
+
+    Start with `since=0`, then pass back `next` until `has_more` is false. A 410
+    means the token is not valid for this account; drop local state and resync.
+    """
+    try:
+        seq = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    limit = max(1, min(int(limit), 1000))
+
+    result = await db.list_bookmark_changes(user_id=user_id, since=seq, limit=limit)
+    if result is None:
+        raise HTTPException(status_code=410, detail="Sync token expired, resync from 0")
+    changed = [
+        {
+            "id": str(r["id"]),
+            "url": r["url"],
+            "title": r["title"],
+            "version": r["version"],
+            "created_at": r["created_at"].isoformat(),
+        }
+        for r in result["changed"]
+    ]
+    deleted = [
+        {"id": str(r["id"]), "deleted_at": r["deleted_at"].isoformat()}
+        for r in result["deleted"]
+    ]
+    return {
+        "changed": changed,
+        "deleted": deleted,
+        "next": str(result["seq"]),
+        "has_more": result["has_more"],
+    }
+
+
+@router.get("/bookmarks/export")
+async def export_bookmarks(
+    format: str = "ndjson",
+    compression: str | None = None,
+    html: bool = False,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+    rl=Depends(get_rate_limiter),
+):
+    """
+    The whole archive as one download: `ndjson`, `tar` or `warc`, compressed
+    with `zstd` (default when installed), `gzip` or `none`. `html=true`
+    includes the stored documents.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    compression = compression or default_compression()
+    if compression not in available_compressions():
+        raise HTTPException(status_code=400, detail=f"Unsupported compression: {compression}")
+    if not rl.allow(key=f"bookmark:export:{user_id}", limit=5, window_seconds=3600):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    # The connection is only taken once the body starts streaming, when a 503
+    # can no longer be sent; shed up front instead.
+    db.admission.check("export")
+
+    rows = db.iter_bookmark_export(user_id=user_id, include_html=html)
+    filename = export_filename(format, compression)
+    return StreamingResponse(
+        export_stream(rows, user_id=user_id, fmt=format, compression=compression),
+        media_type=export_media_type(format, compression),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _sse(event: str, data: dict, *, event_id: int | None = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def _bookmark_event(r: dict) -> dict:
+    return {
+        "id": str(r["id"]),
+        "url": r["url"],
+        "title": r["title"],
+        "version": r["version"],
+        "created_at": r["created_at"].isoformat(),
+    }
+
+
+async def _bookmark_events(
+    *,
+    db: Db,
+    hub: EventHub,
+    sub: Subscription,
+    user_id: uuid.UUID,
+    last_seq: int | None,
+) -> AsyncIterator[bytes]:
+    try:
+        yield b"retry: 3000\n\n"
+        # Subscribed before the replay, so nothing falls between the two; live
+        # events the replay already covered are skipped by sequence.
+        seen = 0
+        if last_seq is not None:
+            page = await db.list_bookmark_changes(user_id=user_id, since=last_seq)
+            if page is None or page["has_more"]:
+                yield _sse("resync", {})
+            if page is not None and not page["has_more"]:
+                replay = [("bookmark", r, _bookmark_event(r)) for r in page["changed"]] + [
+                    ("deleted", r, {"id": str(r["id"])}) for r in page["deleted"]
+                ]
+                for name, r, data in sorted(replay, key=lambda e: e[1]["change_seq"]):
+                    yield _sse(name, data, event_id=r["change_seq"])
+                seen = page["seq"]
+
+        while True:
+            event = await sub.next(app_config.sse_heartbeat_seconds)
+            if sub.overflowed:
+                # Too far behind: close; the client reconnects with Last-Event-ID.
+                return
+            if event is None:
+                yield b": ping\n\n"
+                continue
+            seq = event.get("change_seq") or 0
+            if seq <= seen:
+                continue
+            data = {k: v for k, v in event.items() if k not in ("type", "user_id", "change_seq")}
+            yield _sse("bookmark", data, event_id=seq)
+    finally:
+        hub.unsubscribe(sub)
+
+
+@router.get("/bookmarks/stream")
+async def bookmark_stream(
+    request: Request,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+    hub: EventHub = Depends(get_event_hub),
+):
+    """
+    Server-sent events for bookmarks saved on any device.
+
+    Events carry `id: <change seq>`; reconnecting with `Last-Event-ID` replays
+    what was missed, or sends `resync` when the client should page through
+    `GET /bookmarks/changes` instead.
+    """
+    last_seq = None
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        try:
+            last_seq = max(0, int(last_event_id))
+        except ValueError:
+            last_seq = 0
+
+    sub = hub.subscribe(user_id)
+    if sub is None:
+        raise HTTPException(
+            status_code=503, detail="Too many open streams", headers={"Retry-After": "30"}
+        )
+    return StreamingResponse(
+        _bookmark_events(db=db, hub=hub, sub=sub, user_id=user_id, last_seq=last_seq),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS,
+        # Also covers a stream that ends before its generator ever ran.
+        background=BackgroundTask(hub.unsubscribe, sub),
+    )
+
+
+@router.delete("/bookmarks/{bookmark_id}")
+async def delete_bookmark(
+    bookmark_id: uuid.UUID,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+):
+    deleted = await db.delete_bookmark(user_id=user_id, bookmark_id=bookmark_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    return {"deleted": [str(i) for i in deleted]}
+
+
+@router.get("/bookmarks/{bookmark_id}/versions")
+async def list_bookmark_versions(
+    bookmark_id: uuid.UUID,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+):
+    rows = await db.list_bookmark_versions(user_id=user_id, bookmark_id=bookmark_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    for r in rows:
+        r["id"] = str(r["id"])
+        r["created_at"] = r["created_at"].isoformat()
+    return {"versions": rows}
+
+
+@router.get("/bookmarks/{bookmark_id}/versions/{version}")
+async def get_bookmark_version(
+    bookmark_id: uuid.UUID,
+    version: int,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+):
+    row = await db.get_bookmark_version(user_id=user_id, bookmark_id=bookmark_id, version=version)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    row["id"] = str(row["id"])
+    row["created_at"] = row["created_at"].isoformat()
+    return row
+
+
+@router.get("/bookmarks/{bookmark_id}/html")
+async def get_bookmark_html(
+    bookmark_id: uuid.UUID,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+):
+    source = await db.open_bookmark_html(user_id=user_id, bookmark_id=bookmark_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    if source.path is not None:
+        # FileResponse only stats the file once the response has started (a 500).
+        if not await run_in_threadpool(source.path.is_file):
+            raise HTTPException(status_code=404, detail="Bookmark HTML snapshot is missing")
+        return FileResponse(
+            source.path, media_type=_SNAPSHOT_MEDIA_TYPE, headers=_SNAPSHOT_HEADERS
+        )
+    if source.chunks is not None:
+        return StreamingResponse(
+            source.chunks, media_type=_SNAPSHOT_MEDIA_TYPE, headers=_SNAPSHOT_HEADERS
+        )
+    if source.html is not None:
+        return HTMLResponse(source.html, headers=_SNAPSHOT_HEADERS)
+    raise HTTPException(status_code=404, detail="Bookmark has no HTML snapshot")
+
+
+@router.get("/bookmarks/{bookmark_id}/similar")
+async def similar_bookmarks(
+    bookmark_id: uuid.UUID,
+    max_distance: int = MAX_DISTANCE,
+    user_id=Depends(get_bearer_user_id),
+    db: Db = Depends(get_db),
+):
+    # Band lookups only guarantee recall up to MAX_DISTANCE differing bits.
+    max_distance = max(0, min(int(max_distance), MAX_DISTANCE))
+    rows = await db.find_similar_bookmarks(
+        user_id=user_id, bookmark_id=bookmark_id, max_distance=max_distance
+    )
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Bookmark not found")
+    for r in rows:
+        r["id"] = str(r["id"])
+        r["created_at"] = r["created_at"].isoformat()
+    return {"similar": rows}
@@ -1,4 +1,9 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import PlainTextResponse
+
+from ..dependencies import get_admin_profiler, get_metrics
+from ...core.metrics import Metrics
+from ...core.profiling import Profiler
 
 
 router = APIRouter()
@@ -9,3 +14,29 @@ def read_root(request: Request):
     if user:
         return {"message": f"Hello {user.get('name', 'User')}", "user": user}
     return {"message": "Hello World", "login_url": "/login"}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics(metrics: Metrics = Depends(get_metrics)):
+    # async: counters are updated on the event loop, so render them there too.
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse, include_in_schema=False)
+def read_profile(
+    route: str | None = None,
+    request_id: str | None = None,
+    profiler: Profiler = Depends(get_admin_profiler),
+):
+    """
+    Profiled samples as collapsed stacks (`route;[kind];frame;... count`), one
+    sample per PROFILING_INTERVAL_MS. Pipe into flamegraph.pl or load into
+    speedscope. `route` is e.g. "POST /bookmarks"; `request_id` is a flagged
+    request's `X-Profile-Id`.
+    """
+    return PlainTextResponse(profiler.collapsed(route=route, request_id=request_id))
+
+
+@router.delete("/debug/profile", status_code=204, include_in_schema=False)
+def reset_profile(profiler: Profiler = Depends(get_admin_profiler)):
+    profiler.reset()
@@ -1,16 +1,30 @@
+import asyncio
+import math
 from pathlib import Path
 
 from ..core.config import app_config
 from ..api.routes import public, auth, protected
 from ..api.routes import auth_api, bookmarks
+from ..core.admission import Overloaded
+from ..core.blobs import create_blob_store
 from ..core.db import create_db
+from ..core.events import EventHub
+from ..core.fetcher import PageFetcher
+from ..core.html_slim import SlimPolicy
+from ..core.idempotency import IDEMPOTENCY_HEADER, InFlightRequests
+from ..core.maintenance import run_periodically
+from ..core.metrics import Metrics
+from ..core.profiling import PROFILE_HEADER, Profiler, ProfilingMiddleware
 from ..core.rate_limit import RateLimiter
+from ..core.revocation import REVOCATION_CHANNEL, TokenRevocations
+from ..core.tokens import VerifiedTokenCache
 
 from starlette.concurrency import run_in_threadpool
 from pyngrok.exception import PyngrokNgrokError
 from contextlib import asynccontextmanager
 from pyngrok import ngrok
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
@@ -26,13 +40,98 @@ logger = get_logger()
 async def lifespan(app: FastAPI):
     public_url = None
     db = None
+    events = None
+    fetcher = None
+    background: list[asyncio.Task] = []
     app.state.rate_limiter = RateLimiter()
+    app.state.in_flight = InFlightRequests()
+    app.state.metrics = Metrics()
+    app.state.revocations = revocations = TokenRevocations()
+    app.state.token_cache = VerifiedTokenCache(max_entries=app_config.access_token_cache_size)
+    profiler = getattr(app.state, "profiler", None)
+    if profiler is not None:
+        profiler.start()
 
     if app_config.database_url:
-        db = await create_db(app_config.database_url)
+        blobs = create_blob_store(
+            app_config.blob_backend,
+            fs_root=Path(app_config.blob_fs_root),
+            s3_bucket=app_config.blob_s3_bucket,
+            s3_endpoint_url=app_config.blob_s3_endpoint_url,
+        )
+        db = await create_db(app_config.database_url, blobs=blobs)
         await db.migrate(migrations_dir=Path("migrations"))
         app.state.db = db
 
+        events = EventHub(
+            app_config.database_url,
+            buffer_size=app_config.sse_buffer_size,
+            max_subscribers=app_config.sse_max_subscribers,
+        )
+
+        async def load_revocations() -> None:
+            revocations.load(await db.load_token_generations())
+
+        # Listen before loading so no revocation falls between the two.
+        events.listen(REVOCATION_CHANNEL, revocations.on_notify, resync=load_revocations)
+        await events.start()
+        app.state.events = events
+        await load_revocations()
+
+        if app_config.page_fetch_enabled:
+            fetcher = PageFetcher(
+                concurrency=app_config.page_fetch_concurrency,
+                per_host=app_config.page_fetch_per_host,
+                timeout_seconds=app_config.page_fetch_timeout_seconds,
+                max_bytes=app_config.max_html_bytes,
+                queue_size=app_config.page_fetch_queue_size,
+                user_agent=app_config.page_fetch_user_agent,
+                allow_private=app_config.page_fetch_allow_private,
+                slim_policy=SlimPolicy.from_names(
+                    app_config.html_slim_strip,
+                    data_uri_min_bytes=app_config.html_slim_data_uri_min_bytes,
+                ),
+                fingerprint=app_config.fingerprint_enabled,
+            )
+            await fetcher.start(db)
+            app.state.fetcher = fetcher
+
+        await db.ensure_bookmark_partitions(months_ahead=app_config.partition_months_ahead)
+        background.append(
+            asyncio.create_task(
+                run_periodically(
+                    lambda: db.ensure_bookmark_partitions(
+                        months_ahead=app_config.partition_months_ahead
+                    ),
+                    interval_seconds=app_config.partition_maintenance_interval_seconds,
+                    name="bookmark partition maintenance",
+                )
+            )
+        )
+        background.append(
+            asyncio.create_task(
+                run_periodically(
+                    db.purge_idempotency_keys,
+                    interval_seconds=min(app_config.idempotency_key_ttl_seconds, 60 * 60),
+                    name="idempotency key expiry",
+                )
+            )
+        )
+        if app_config.stats_reconcile_interval_seconds > 0:
+            background.append(
+                asyncio.create_task(
+                    run_periodically(
+                        # Every process schedules it; the first to fire each
+                        # interval runs it, the others find it fresh and skip.
+                        lambda: db.reconcile_bookmark_stats(
+                            min_interval_seconds=app_config.stats_reconcile_interval_seconds / 2
+                        ),
+                        interval_seconds=app_config.stats_reconcile_interval_seconds,
+                        name="bookmark stats reconciliation",
+                    )
+                )
+            )
+
     if app_config.env != "production":
         try:
             listener = await run_in_threadpool(
@@ -51,27 +150,88 @@ async def lifespan(app: FastAPI):
     # yields to the running application
     yield
 
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
     if public_url:
         await run_in_threadpool(ngrok.disconnect, public_url)
         await logger.info("ngrok tunnel closed")
+    if fetcher is not None:
+        await fetcher.stop()
+    if events is not None:
+        await events.stop()
+    if profiler is not None:
+        profiler.stop()
     if db is not None:
-        await db.pool.close()
+        if db.group_commit is not None:
+            await db.group_commit.drain()
+        await db.close()
 
 
 # Create the application instance
 app = FastAPI(lifespan=lifespan)
 
+if app_config.profiling_enabled:
+    app.state.profiler = Profiler(
+        interval_seconds=app_config.profiling_interval_ms / 1000,
+        sample_rate=app_config.profiling_sample_rate,
+        admin_token=app_config.profiling_admin_token,
+    )
+    # Added first so it is the innermost middleware: samples start at the routes.
+    app.add_middleware(ProfilingMiddleware, profiler=app.state.profiler)
+
 # required to "remember" the user after they log in
 app.add_middleware(SessionMiddleware, secret_key=app_config.starlette_session_key)
 
+def _overloaded_response(exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily overloaded, retry later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+class ShedSavesWhenOverloaded:
+    """
+    ASGI middleware that answers 503 to saves while the write budget is
+    saturated. Save bodies (up to MAX_HTML_BYTES) are only read inside the
+    route, so this sheds them before anything is buffered. A precheck hit is a
+    save too.
+    """
+
+    SAVES = {("POST", "/bookmarks"), ("POST", "/bookmarks/precheck")}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (scope["method"], scope["path"]) in self.SAVES:
+            db = getattr(scope["app"].state, "db", None)
+            if db is not None:
+                try:
+                    db.admission.check("write")
+                except Overloaded as exc:
+                    return await _overloaded_response(exc)(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+# Inside CORS, so a shed save's 503 still carries the CORS headers.
+app.add_middleware(ShedSavesWhenOverloaded)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origin_regex=app_config.cors_allow_origin_regex,
     allow_credentials=False,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type", IDEMPOTENCY_HEADER, PROFILE_HEADER],
 )
 
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return _overloaded_response(exc)
+
+
 app.include_router(public.router, tags=["public"])
 app.include_router(auth.router, tags=["auth"])
 app.include_router(auth_api.router, tags=["auth"])
@@ -0,0 +1,209 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import asyncpg
+
+__all__ = ["Overloaded", "Budget", "CircuitBreaker", "AdmissionControl"]
+
+
+class Overloaded(Exception):
+    """The database is saturated or failing; the API answers 503 + Retry-After."""
+
+    def __init__(self, reason: str, *, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# Failures that say "the database is unhealthy", as opposed to a bad request
+# (constraint violations, invalid input) that says nothing about its health.
+# Only errors from the server or the connection count: a timeout waiting for a
+# free pooled connection is contention in this process, not a sick database.
+_DB_FAILURES = (
+    ConnectionError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.TooManyConnectionsError,
+    asyncpg.QueryCanceledError,
+    asyncpg.AdminShutdownError,
+)
+
+
+@dataclass
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker around the database.
+
+    Notes:
+    - Opens after `failure_threshold` failures in a row; while open, callers are
+      rejected without touching the pool.
+    - After `reset_seconds` one trial call is let through (half-open); its
+      outcome closes or re-opens the breaker.
+    """
+
+    failure_threshold: int = 5
+    reset_seconds: float = 10.0
+    failures: int = 0
+    opened_at: float | None = None
+    trial_in_flight: bool = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def check(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return
+        retry_after = max(1.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        raise Overloaded("database circuit open", retry_after=retry_after)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+@dataclass
+class Budget:
+    """
+    Connection slots reserved for one class of operation.
+
+    At most `concurrency` connections are held at once and at most `max_queue`
+    callers wait for one; beyond that callers are shed immediately instead of
+    piling up (with their request bodies) behind a slow database.
+
+    `pool` holds the budget's own connections, opened with its
+    `statement_timeout` (see `create_db`); None borrows the pool passed to
+    `AdmissionControl.connection`, without a statement timeout.
+    """
+
+    name: str
+    concurrency: int
+    max_queue: int
+    acquire_timeout: float
+    statement_timeout_ms: int
+    pool: asyncpg.Pool | None = field(default=None, repr=False)
+    waiting: int = 0
+    _slots: asyncio.Semaphore | None = field(default=None, repr=False)
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running loop.
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+    @property
+    def saturated(self) -> bool:
+        return self.slots.locked() and self.waiting >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self.saturated:
+            raise Overloaded(f"{self.name} queue full", retry_after=self.acquire_timeout)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(f"{self.name} queue timeout", retry_after=self.acquire_timeout)
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+
+def _default_budgets() -> dict[str, Budget]:
+    budgets = {
+        op: Budget(op, concurrency=n, max_queue=50, acquire_timeout=2.0, statement_timeout_ms=ms)
+        for op, n, ms in (("read", 4, 5_000), ("write", 4, 15_000), ("auth", 2, 5_000))
+    }
+    budgets["export"] = Budget(
+        "export", concurrency=2, max_queue=0, acquire_timeout=2.0, statement_timeout_ms=5_000
+    )
+    budgets["background"] = Budget(
+        "background", concurrency=2, max_queue=50, acquire_timeout=2.0, statement_timeout_ms=15_000
+    )
+    return budgets
+
+
+@dataclass
+class AdmissionControl:
+    """
+    Admission control for `Db`: per-operation budgets plus a shared breaker.
+
+    Budgets are disjoint sets of connections, so bulk saves can never take the
+    connections refresh and login need. `connection(pool, op)` is a drop-in for
+    `pool.acquire()` that takes a connection from the budget's own pool.
+    """
+
+    budgets: dict[str, Budget] = field(default_factory=_default_budgets)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+
+    def check(self, op: str) -> None:
+        """Reject up front (before reading a request body) when `op` would be shed."""
+        budget = self.budgets[op]
+        if budget.saturated:
+            raise Overloaded(f"{op} queue full", retry_after=budget.acquire_timeout)
+        if self.breaker.state == "open":
+            self.breaker.check()
+
+    @asynccontextmanager
+    async def connection(self, pool, op: str) -> AsyncIterator[asyncpg.Connection]:
+        budget = self.budgets[op]
+        pool = budget.pool or pool
+        breaker = self.breaker
+        breaker.check()
+        try:
+            async with budget.slot():
+                acquired = False
+                try:
+                    async with pool.acquire(timeout=budget.acquire_timeout) as conn:
+                        acquired = True
+                        yield conn
+                except asyncio.TimeoutError:
+                    if acquired:
+                        raise
+                    # No free pooled connection: contention in this process,
+                    # which says nothing about the database.
+                    raise Overloaded(f"{op} pool timeout", retry_after=budget.acquire_timeout)
+                except _DB_FAILURES as exc:
+                    breaker.record_failure()
+                    raise Overloaded(
+                        f"{op} database error: {type(exc).__name__}",
+                        retry_after=max(1.0, budget.acquire_timeout),
+                    ) from exc
+                except Exception:
+                    # The database answered; the request itself was bad.
+                    breaker.record_success()
+                    raise
+                else:
+                    breaker.record_success()
+        finally:
+            # Shed before reaching the database: no verdict for a half-open trial.
+            breaker.trial_in_flight = False
+
+    async def close(self) -> None:
+        """Closes the budgets' own pools."""
+        for budget in self.budgets.values():
+            if budget.pool is not None:
+                await budget.pool.close()
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, ClassVar, Protocol
+
+try:
+    import boto3
+except ImportError:  # optional: only needed for BLOB_BACKEND=s3
+    boto3 = None
+
+__all__ = [
+    "BlobStore",
+    "PostgresBlobStore",
+    "FilesystemBlobStore",
+    "S3BlobStore",
+    "create_blob_store",
+]
+
+
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def _digest(key: str, scheme: str) -> str:
+    prefix, _, digest = key.partition(":")
+    if prefix != scheme or not _DIGEST_RE.fullmatch(digest):
+        raise ValueError(f"Not a {scheme} blob key: {key!r}")
+    return digest
+
+
+class BlobStore(Protocol):
+    """
+    Where full HTML documents live.
+
+    `put` returns the key to record in `bookmarks.html_blob`, or None when the
+    document should stay inline in `bookmarks.html`.
+    """
+
+    scheme: ClassVar[str]
+
+    async def put(self, data: bytes) -> str | None: ...
+
+    async def get(self, key: str) -> bytes: ...
+
+
+@dataclass(frozen=True)
+class PostgresBlobStore:
+    scheme: ClassVar[str] = "postgres"
+
+    async def put(self, data: bytes) -> str | None:
+        return None
+
+    async def get(self, key: str) -> bytes:
+        raise ValueError(f"Inline store has no external blobs: {key!r}")
+
+
+@dataclass(frozen=True)
+class FilesystemBlobStore:
+    """
+    Content-addressed files under `root/ab/cd/<sha256>`.
+
+    Identical documents are written once; writes go through a temp file and
+    `os.replace` so readers never see a partial blob.
+    """
+
+    root: Path
+    scheme: ClassVar[str] = "fs"
+
+    def path_for(self, key: str) -> Path:
+        digest = _digest(key, self.scheme)
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    async def put(self, data: bytes) -> str | None:
+        key = f"{self.scheme}:{hashlib.sha256(data).hexdigest()}"
+        await asyncio.to_thread(self._write, self.path_for(key), data)
+        return key
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.path_for(key).read_bytes)
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+
+@dataclass(frozen=True)
+class S3BlobStore:
+    """
+    Content-addressed objects in an S3-compatible bucket.
+
+    Notes:
+    - Requires `boto3`; credentials come from the usual AWS_* env vars.
+    - Point `endpoint_url` at a local MinIO for development.
+    """
+
+    bucket: str
+    client: Any
+    scheme: ClassVar[str] = "s3"
+
+    def object_key(self, key: str) -> str:
+        digest = _digest(key, self.scheme)
+        return f"html/{digest[:2]}/{digest}"
+
+    async def put(self, data: bytes) -> str | None:
+        key = f"{self.scheme}:{hashlib.sha256(data).hexdigest()}"
+        await asyncio.to_thread(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Body=data,
+            ContentType="text/html; charset=utf-8",
+        )
+        return key
+
+    async def get(self, key: str) -> bytes:
+        obj = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self.object_key(key)
+        )
+        return await asyncio.to_thread(obj["Body"].read)
+
+    async def iter_chunks(self, key: str, *, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        obj = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self.object_key(key)
+        )
+        body = obj["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+
+def create_blob_store(
+    backend: str,
+    *,
+    fs_root: Path | None = None,
+    s3_bucket: str | None = None,
+    s3_endpoint_url: str | None = None,
+) -> BlobStore:
+    if backend == PostgresBlobStore.scheme:
+        return PostgresBlobStore()
+    if backend in (FilesystemBlobStore.scheme, "filesystem"):
+        if fs_root is None:
+            raise RuntimeError("BLOB_FS_ROOT is not configured")
+        return FilesystemBlobStore(root=fs_root)
+    if backend == S3BlobStore.scheme:
+        if boto3 is None:
+            raise RuntimeError("BLOB_BACKEND=s3 requires boto3 (pip install boto3)")
+        if not s3_bucket:
+            raise RuntimeError("BLOB_S3_BUCKET is not configured")
+        client = boto3.client("s3", endpoint_url=s3_endpoint_url)
+        return S3BlobStore(bucket=s3_bucket, client=client)
+    raise ValueError(f"Unknown blob backend: {backend!r}")
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 import os
+from importlib.util import find_spec
 from dotenv import load_dotenv
 from ..utils.services.db_utils import get_database_url
 
@@ -17,7 +18,52 @@ class AppConfig(BaseModel):
     api_jwt_issuer: str = "legendary_potato"
     api_jwt_ttl_seconds: int = 60 * 60 * 24 * 7  # 7 days
     refresh_token_ttl_seconds: int = 60 * 60 * 24 * 30  # 30 days
+    access_token_cache_size: int = 10_000  # verified tokens kept per process; 0 disables
     max_html_bytes: int = 1_500_000  # ~1.5MB
+    idempotency_key_ttl_seconds: int = 60 * 60 * 24
+    html_slim_strip: list[str] = Field(
+        default_factory=lambda: ["scripts", "styles", "svg_sprites", "data_uris"]
+    )
+    html_slim_data_uri_min_bytes: int = 1024
+    fingerprint_enabled: bool = False  # env default: on when numpy is installed
+    snapshot_keyframe_interval: int = 0  # 0 disables snapshot chains
+    blob_backend: str = "postgres"  # postgres | fs | s3
+    blob_fs_root: str = "blobs"
+    blob_s3_bucket: str | None = None
+    blob_s3_endpoint_url: str | None = None
+    stats_reconcile_interval_seconds: int = 60 * 60 * 24  # 0 disables
+    partition_months_ahead: int = 3
+    partition_maintenance_interval_seconds: int = 60 * 60 * 24
+    db_read_concurrency: int = 4
+    db_write_concurrency: int = 4
+    db_auth_concurrency: int = 2
+    db_export_concurrency: int = 2  # long-lived export downloads, never queued
+    db_background_concurrency: int = 2  # page fetcher
+    db_maintenance_connections: int = 2  # migrations, partitions, stats reconciliation
+    db_queue_limit: int = 50  # waiters per budget before shedding with 503
+    db_acquire_timeout_seconds: float = 2.0
+    db_statement_timeout_ms: int = 5_000
+    db_write_statement_timeout_ms: int = 15_000
+    db_breaker_failures: int = 5
+    db_breaker_reset_seconds: float = 10.0
+    write_coalesce_enabled: bool = False  # group commit for concurrent saves
+    write_coalesce_window_ms: float = 2.0
+    write_coalesce_max_batch: int = 64
+    write_coalesce_direct_when_idle: bool = True
+    sse_heartbeat_seconds: float = 15.0
+    sse_buffer_size: int = 100  # events queued per stream before it is closed
+    sse_max_subscribers: int = 10_000  # open streams per process
+    page_fetch_enabled: bool = True
+    page_fetch_concurrency: int = 8
+    page_fetch_per_host: int = 2
+    page_fetch_timeout_seconds: float = 10.0
+    page_fetch_queue_size: int = 10_000
+    page_fetch_allow_private: bool = False
+    page_fetch_user_agent: str = "legendary_potato-fetcher/0.1"
+    profiling_enabled: bool = False
+    profiling_admin_token: str | None = None
+    profiling_sample_rate: float = 0.0  # fraction of requests profiled without the token
+    profiling_interval_ms: float = 5.0
     cors_allow_origin_regex: str | None = r"chrome-extension://.*"
     extension_return_to_allowlist: list[str] = Field(default_factory=list)
     uvicorn_port: int = 8001
@@ -36,7 +82,71 @@ app_config = AppConfig(
     refresh_token_ttl_seconds=int(
         os.environ.get("REFRESH_TOKEN_TTL_SECONDS", 60 * 60 * 24 * 30)
     ),
+    access_token_cache_size=int(os.environ.get("ACCESS_TOKEN_CACHE_SIZE", 10_000)),
     max_html_bytes=int(os.environ.get("MAX_HTML_BYTES", 1_500_000)),
+    idempotency_key_ttl_seconds=int(
+        os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", 60 * 60 * 24)
+    ),
+    html_slim_strip=[
+        s.strip()
+        for s in os.environ.get(
+            "HTML_SLIM_STRIP", "scripts,styles,svg_sprites,data_uris"
+        ).split(",")
+        if s.strip()
+    ],
+    html_slim_data_uri_min_bytes=int(os.environ.get("HTML_SLIM_DATA_URI_MIN_BYTES", 1024)),
+    # The pure-Python SimHash takes seconds on large pages; only default on with numpy.
+    fingerprint_enabled=os.environ.get(
+        "FINGERPRINT_ENABLED", "true" if find_spec("numpy") else "false"
+    ).lower()
+    in ("1", "true", "yes"),
+    snapshot_keyframe_interval=int(os.environ.get("SNAPSHOT_KEYFRAME_INTERVAL", 0)),
+    blob_backend=os.environ.get("BLOB_BACKEND", "postgres"),
+    blob_fs_root=os.environ.get("BLOB_FS_ROOT", "blobs"),
+    blob_s3_bucket=os.environ.get("BLOB_S3_BUCKET"),
+    blob_s3_endpoint_url=os.environ.get("BLOB_S3_ENDPOINT_URL"),
+    stats_reconcile_interval_seconds=int(
+        os.environ.get("STATS_RECONCILE_INTERVAL_SECONDS", 60 * 60 * 24)
+    ),
+    partition_months_ahead=int(os.environ.get("PARTITION_MONTHS_AHEAD", 3)),
+    partition_maintenance_interval_seconds=int(
+        os.environ.get("PARTITION_MAINTENANCE_INTERVAL_SECONDS", 60 * 60 * 24)
+    ),
+    db_read_concurrency=int(os.environ.get("DB_READ_CONCURRENCY", 4)),
+    db_write_concurrency=int(os.environ.get("DB_WRITE_CONCURRENCY", 4)),
+    db_auth_concurrency=int(os.environ.get("DB_AUTH_CONCURRENCY", 2)),
+    db_export_concurrency=int(os.environ.get("DB_EXPORT_CONCURRENCY", 2)),
+    db_background_concurrency=int(os.environ.get("DB_BACKGROUND_CONCURRENCY", 2)),
+    db_maintenance_connections=int(os.environ.get("DB_MAINTENANCE_CONNECTIONS", 2)),
+    db_queue_limit=int(os.environ.get("DB_QUEUE_LIMIT", 50)),
+    db_acquire_timeout_seconds=float(os.environ.get("DB_ACQUIRE_TIMEOUT_SECONDS", 2.0)),
+    db_statement_timeout_ms=int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 5_000)),
+    db_write_statement_timeout_ms=int(os.environ.get("DB_WRITE_STATEMENT_TIMEOUT_MS", 15_000)),
+    db_breaker_failures=int(os.environ.get("DB_BREAKER_FAILURES", 5)),
+    db_breaker_reset_seconds=float(os.environ.get("DB_BREAKER_RESET_SECONDS", 10.0)),
+    write_coalesce_enabled=os.environ.get("WRITE_COALESCE_ENABLED", "false").lower()
+    in ("1", "true", "yes"),
+    write_coalesce_window_ms=float(os.environ.get("WRITE_COALESCE_WINDOW_MS", 2.0)),
+    write_coalesce_max_batch=int(os.environ.get("WRITE_COALESCE_MAX_BATCH", 64)),
+    write_coalesce_direct_when_idle=os.environ.get(
+        "WRITE_COALESCE_DIRECT_WHEN_IDLE", "true"
+    ).lower()
+    in ("1", "true", "yes"),
+    sse_heartbeat_seconds=float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15.0)),
+    sse_buffer_size=int(os.environ.get("SSE_BUFFER_SIZE", 100)),
+    sse_max_subscribers=int(os.environ.get("SSE_MAX_SUBSCRIBERS", 10_000)),
+    page_fetch_enabled=os.environ.get("PAGE_FETCH_ENABLED", "true").lower() in ("1", "true", "yes"),
+    page_fetch_concurrency=int(os.environ.get("PAGE_FETCH_CONCURRENCY", 8)),
+    page_fetch_per_host=int(os.environ.get("PAGE_FETCH_PER_HOST", 2)),
+    page_fetch_timeout_seconds=float(os.environ.get("PAGE_FETCH_TIMEOUT_SECONDS", 10.0)),
+    page_fetch_queue_size=int(os.environ.get("PAGE_FETCH_QUEUE_SIZE", 10_000)),
+    page_fetch_allow_private=os.environ.get("PAGE_FETCH_ALLOW_PRIVATE", "false").lower()
+    in ("1", "true", "yes"),
+    page_fetch_user_agent=os.environ.get("PAGE_FETCH_USER_AGENT", "legendary_potato-fetcher/0.1"),
+    profiling_enabled=os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes"),
+    profiling_admin_token=os.environ.get("PROFILING_ADMIN_TOKEN"),
+    profiling_sample_rate=float(os.environ.get("PROFILING_SAMPLE_RATE", 0.0)),
+    profiling_interval_ms=float(os.environ.get("PROFILING_INTERVAL_MS", 5.0)),
     cors_allow_origin_regex=os.environ.get("CORS_ALLOW_ORIGIN_REGEX", r"chrome-extension://.*"),
     extension_return_to_allowlist=[
         s.strip()
@@ -1,16 +1,30 @@
+import asyncio
 import hashlib
+import json
 import secrets
 import uuid
-from dataclasses import dataclass
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import asyncpg
 
+from .admission import AdmissionControl, Budget, CircuitBreaker
+from .blobs import BlobStore, FilesystemBlobStore, PostgresBlobStore, S3BlobStore
 from .config import app_config
+from .delta import apply_delta, make_delta
+from .events import BOOKMARK_CHANNEL, bookmark_event_payload
+from .fingerprint import hamming, simhash_bands
+from .group_commit import GroupCommit
 from .migrations import MigrationRunner
+from .revocation import REVOCATION_CHANNEL
 
-__all__ = ["Db", "create_db"]
+__all__ = ["Db", "HtmlSource", "create_db"]
+
+
+# Leader lock and `maintenance_runs` name for stats reconciliation.
+_RECONCILE_JOB = "bookmark_stats:reconcile"
 
 
 def _hash_refresh_token(token: str) -> str:
@@ -24,9 +38,69 @@ def _hash_refresh_token(token: str) -> str:
     return h.hexdigest()
 
 
+def _apply_chain(html: str, deltas: list[bytes]) -> str:
+    for delta in deltas:
+        html = apply_delta(html, delta)
+    return html
+
+
+def _created_event(
+    *,
+    bookmark_id: uuid.UUID,
+    user_id: uuid.UUID,
+    url: str,
+    title: str | None,
+    version: int,
+    inserted: asyncpg.Record,
+) -> dict:
+    return {
+        "type": "created",
+        "user_id": str(user_id),
+        "id": str(bookmark_id),
+        "url": url,
+        "title": title,
+        "version": version,
+        "created_at": inserted["created_at"].isoformat(),
+        "change_seq": inserted["change_seq"],
+    }
+
+
+@dataclass(frozen=True)
+class HtmlSource:
+    """
+    How to serve a stored document; exactly one field is set when it has HTML.
+
+    - `path`: filesystem blob, served with sendfile
+    - `chunks`: S3 blob or inline Postgres text, streamed without buffering
+    - `html`: delta-chain document, reconstructed in memory
+    """
+
+    path: Path | None = None
+    chunks: AsyncIterator[bytes] | None = None
+    html: str | None = None
+
+
 @dataclass(frozen=True)
 class Db:
     pool: asyncpg.Pool
+    blobs: BlobStore = field(default_factory=PostgresBlobStore)
+    admission: AdmissionControl = field(default_factory=AdmissionControl)
+    # Coalesces plain (non-snapshot, unkeyed) bookmark inserts; None inserts directly.
+    group_commit: GroupCommit | None = None
+
+    def _connection(self, op: str):
+        """
+        A connection from the `op` budget ("read", "write", "auth", "export" or
+        "background").
+
+        Raises `Overloaded` instead of queueing without bound. Migrations and
+        maintenance jobs use `pool` directly.
+        """
+        return self.admission.connection(self.pool, op)
+
+    async def close(self) -> None:
+        await self.admission.close()
+        await self.pool.close()
 
     async def migrate(self, *, migrations_dir: Path) -> list[str]:
         async with self.pool.acquire() as conn:
@@ -42,7 +116,7 @@ class Db:
         name: str | None,
         avatar_url: str | None,
     ) -> uuid.UUID:
-        async with self.pool.acquire() as conn:
+        async with self._connection("auth") as conn:
             async with conn.transaction():
                 row = await conn.fetchrow(
                     """
@@ -80,7 +154,7 @@ class Db:
                 return user_id
 
     async def get_identities(self, *, user_id: uuid.UUID) -> list[dict]:
-        async with self.pool.acquire() as conn:
+        async with self._connection("auth") as conn:
             rows = await conn.fetch(
                 """
                 SELECT provider, provider_subject, email, name, avatar_url, created_at
@@ -99,29 +173,606 @@ class Db:
         url: str,
         title: str | None,
         html: str | None,
-    ) -> uuid.UUID:
+        html_original_bytes: int | None = None,
+        html_bytes: int | None = None,
+        simhash: int | None = None,
+        html_sha256: bytes | None = None,
+        html_blob: str | None = None,
+        idempotency_key: str | None = None,
+    ) -> tuple[uuid.UUID, bool]:
+        """
+        Returns (id, created): the new bookmark's id and True, or with an
+        `idempotency_key` already used by this user, the id of the bookmark saved
+        with it and False (nothing is inserted).
+
+        Notes:
+        - `html_sha256` is the hash of the page as captured (before slimming);
+          it is recorded for `create_bookmark_from_hash`.
+        - `html_blob` reuses a document already in the blob store in place of
+          `html`. In snapshot chain mode it is stored as a keyframe.
+        """
         bookmark_id = uuid.uuid4()
+        if int(app_config.snapshot_keyframe_interval) <= 0:
+            row = {
+                "bookmark_id": bookmark_id,
+                "user_id": user_id,
+                "url": url,
+                "title": title,
+                "html": html,
+                "html_blob": html_blob,
+                "html_original_bytes": html_original_bytes,
+                "html_bytes": html_bytes,
+                "simhash": simhash,
+                "html_sha256": html_sha256,
+            }
+            if idempotency_key:
+                # Key and row commit together. The key is claimed before the blob
+                # is written: blobs are content-addressed and may be shared, so a
+                # replay's blob could not be deleted again.
+                async with self._connection("write") as conn:
+                    async with conn.transaction():
+                        existing = await self._claim_idempotency_key(
+                            conn, user_id=user_id, key=idempotency_key, bookmark_id=bookmark_id
+                        )
+                        if existing is not None:
+                            return existing, False
+                        if html_blob is None:
+                            row["html"], row["html_blob"] = await self._externalize(html)
+                        await self._insert_bookmark(conn, **row)
+                return bookmark_id, True
+
+            # Write the blob before taking a pool connection.
+            if html_blob is None:
+                row["html"], row["html_blob"] = await self._externalize(html)
+            if self.group_commit is not None:
+                await self.group_commit.submit(
+                    row,
+                    flush=self._insert_bookmark_batch,
+                    direct=lambda: self._insert_bookmark_direct(row),
+                )
+                return bookmark_id, True
+            async with self._connection("write") as conn:
+                await self._insert_bookmark(conn, **row)
+            return bookmark_id, True
+
+        async with self._connection("write") as conn:
+            async with conn.transaction():
+                if idempotency_key:
+                    existing = await self._claim_idempotency_key(
+                        conn, user_id=user_id, key=idempotency_key, bookmark_id=bookmark_id
+                    )
+                    if existing is not None:
+                        return existing, False
+                version, delta_base_id, html_delta = await self._next_snapshot(
+                    conn, user_id=user_id, url=url, html=html
+                )
+                if html_delta is not None:
+                    html, html_blob = None, None
+                elif html_blob is None:
+                    html, html_blob = await self._externalize(html)
+                await self._insert_bookmark(
+                    conn,
+                    bookmark_id=bookmark_id,
+                    user_id=user_id,
+                    url=url,
+                    title=title,
+                    html=html,
+                    html_blob=html_blob,
+                    html_original_bytes=html_original_bytes,
+                    html_bytes=html_bytes,
+                    simhash=simhash,
+                    version=version,
+                    delta_base_id=delta_base_id,
+                    html_delta=html_delta,
+                    html_sha256=html_sha256,
+                )
+        return bookmark_id, True
+
+    async def create_bookmark_from_hash(
+        self,
+        *,
+        user_id: uuid.UUID,
+        url: str,
+        title: str | None,
+        html_sha256: bytes,
+        html_size: int,
+        idempotency_key: str | None = None,
+    ) -> tuple[uuid.UUID, bool] | None:
+        """
+        Saves a bookmark with a page this user already stored, identified by the
+        sha256 and UTF-8 size of the HTML as captured. Returns (id, created) as
+        `create_bookmark` does, or None on a miss; the client then uploads the page.
+
+        Notes:
+        - A miss costs one primary-key lookup in `bookmark_html_hashes`.
+        - The stored (slimmed) document is reused as it is. A blob is referenced
+          again by its key. Inline or delta-encoded pages are copied from the
+          database, so nothing has to be sent over the wire again.
+        """
+        async with self._connection("read") as conn:
+            source = await conn.fetchrow(
+                """
+                SELECT b.id, b.html, b.html_blob, b.html_delta IS NOT NULL AS is_delta,
+                       b.html_original_bytes, b.html_bytes, b.simhash
+                FROM bookmark_html_hashes h
+                JOIN bookmarks b
+                  ON b.id = h.bookmark_id AND b.created_at = h.created_at AND b.user_id = h.user_id
+                WHERE h.user_id = $1 AND h.html_sha256 = $2 AND h.html_size = $3
+                """,
+                user_id,
+                html_sha256,
+                html_size,
+            )
+            if source is None:
+                return None
+            html = source["html"]
+            if source["is_delta"]:
+                html = await self._load_html(conn, bookmark_id=source["id"])
+                if html is None:
+                    return None
+        return await self.create_bookmark(
+            user_id=user_id,
+            url=url,
+            title=title,
+            html=html,
+            html_blob=source["html_blob"],
+            html_original_bytes=source["html_original_bytes"],
+            html_bytes=source["html_bytes"],
+            simhash=source["simhash"],
+            html_sha256=html_sha256,
+            idempotency_key=idempotency_key,
+        )
+
+    async def _insert_bookmark_direct(self, row: dict) -> uuid.UUID:
+        async with self._connection("write") as conn:
+            await self._insert_bookmark(conn, **row)
+        return row["bookmark_id"]
+
+    async def _insert_bookmark_batch(self, rows: list[dict]) -> list[uuid.UUID | Exception]:
+        """
+        Inserts a group-commit batch in one transaction: one multi-row INSERT and
+        one NOTIFY statement for all rows.
+
+        A bad row (unknown user, no partition for its date) fails the whole
+        statement. The rows are then retried one by one, so each caller gets its
+        own id or error.
+        """
+        # Rows lock their user's `users` row (change_seq trigger) before any
+        # stats rows; taking users in one order keeps concurrent batches from
+        # deadlocking.
+        ordered = sorted(rows, key=lambda r: r["user_id"])
+        async with self._connection("write") as conn:
+            try:
+                async with conn.transaction():
+                    inserted = await conn.fetch(
+                        """
+                        WITH new AS (
+                          SELECT *
+                          FROM unnest(
+                            $1::uuid[], $2::uuid[], $3::text[], $4::text[], $5::text[],
+                            $6::text[], $7::integer[], $8::integer[], $9::bigint[], $10::bytea[]
+                          ) AS r(id, user_id, url, title, html, html_blob, html_original_bytes,
+                                 html_bytes, simhash, html_sha256)
+                        ), inserted AS (
+                          INSERT INTO bookmarks
+                            (id, user_id, url, title, html, html_blob, html_original_bytes,
+                             html_bytes, simhash)
+                          SELECT id, user_id, url, title, html, html_blob, html_original_bytes,
+                                 html_bytes, simhash
+                          FROM new
+                          RETURNING id, user_id, created_at, change_seq
+                        ), hashed AS (
+                          INSERT INTO bookmark_html_hashes
+                            (user_id, html_sha256, html_size, bookmark_id, created_at)
+                          SELECT DISTINCT ON (i.user_id, n.html_sha256)
+                                 i.user_id, n.html_sha256, n.html_original_bytes, i.id, i.created_at
+                          FROM inserted i
+                          JOIN new n ON n.id = i.id
+                          WHERE n.html_sha256 IS NOT NULL
+                          ON CONFLICT (user_id, html_sha256) DO UPDATE
+                            SET html_size = EXCLUDED.html_size,
+                                bookmark_id = EXCLUDED.bookmark_id,
+                                created_at = EXCLUDED.created_at
+                        )
+                        SELECT id, created_at, change_seq FROM inserted
+                        """,
+                        *(
+                            [r[name] for r in ordered]
+                            for name in (
+                                "bookmark_id", "user_id", "url", "title", "html", "html_blob",
+                                "html_original_bytes", "html_bytes", "simhash", "html_sha256",
+                            )
+                        ),
+                    )
+                    saved = {r["id"]: r for r in inserted}
+                    events = [
+                        bookmark_event_payload(
+                            _created_event(
+                                bookmark_id=r["bookmark_id"], user_id=r["user_id"],
+                                url=r["url"], title=r["title"], version=1,
+                                inserted=saved[r["bookmark_id"]],
+                            )
+                        )
+                        for r in ordered
+                    ]
+                    await conn.execute(
+                        "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                        BOOKMARK_CHANNEL,
+                        events,
+                    )
+            except (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError):
+                # One at a time on this connection: the retry must not queue
+                # a whole batch's worth of waiters on the write budget.
+                results = []
+                for r in rows:
+                    try:
+                        await self._insert_bookmark(conn, **r)
+                    except (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError) as e:
+                        results.append(e)
+                    else:
+                        results.append(r["bookmark_id"])
+                return results
+        return [r["bookmark_id"] for r in rows]
+
+    async def _claim_idempotency_key(
+        self,
+        conn: asyncpg.Connection,
+        *,
+        user_id: uuid.UUID,
+        key: str,
+        bookmark_id: uuid.UUID,
+    ) -> uuid.UUID | None:
+        """
+        Records `key` -> `bookmark_id`; returns the existing bookmark id instead
+        when the key is already taken.
+
+        Must run in the inserting transaction. A concurrent save with the same
+        key waits here on the primary key until this one commits or rolls back.
+        An expired key is taken over.
+        """
+        claimed = await conn.fetchval(
+            """
+            INSERT INTO idempotency_keys (user_id, key, bookmark_id)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (user_id, key) DO UPDATE
+              SET bookmark_id = EXCLUDED.bookmark_id, created_at = now()
+              WHERE idempotency_keys.created_at <= now() - make_interval(secs => $4)
+            RETURNING bookmark_id
+            """,
+            user_id,
+            key,
+            bookmark_id,
+            float(app_config.idempotency_key_ttl_seconds),
+        )
+        if claimed is not None:
+            return None
+        return await conn.fetchval(
+            "SELECT bookmark_id FROM idempotency_keys WHERE user_id = $1 AND key = $2",
+            user_id,
+            key,
+        )
+
+    async def get_idempotent_bookmark(self, *, user_id: uuid.UUID, key: str) -> uuid.UUID | None:
+        """The bookmark an unexpired `Idempotency-Key` created, if any."""
+        async with self._connection("read") as conn:
+            return await conn.fetchval(
+                """
+                SELECT bookmark_id
+                FROM idempotency_keys
+                WHERE user_id = $1
+                  AND key = $2
+                  AND created_at > now() - make_interval(secs => $3)
+                """,
+                user_id,
+                key,
+                float(app_config.idempotency_key_ttl_seconds),
+            )
+
+    async def purge_idempotency_keys(self) -> int:
+        """Deletes expired idempotency keys; returns how many."""
         async with self.pool.acquire() as conn:
-            await conn.execute(
+            deleted = await conn.fetch(
+                """
+                DELETE FROM idempotency_keys
+                WHERE created_at <= now() - make_interval(secs => $1)
+                RETURNING 1
+                """,
+                float(app_config.idempotency_key_ttl_seconds),
+            )
+        return len(deleted)
+
+    async def _externalize(self, html: str | None) -> tuple[str | None, str | None]:
+        """
+        Hands a full document to the blob store; returns (inline html, blob key).
+        """
+        if html is None:
+            return None, None
+        key = await self.blobs.put(html.encode("utf-8"))
+        return (None, key) if key else (html, None)
+
+    async def _insert_bookmark(
+        self,
+        conn: asyncpg.Connection,
+        *,
+        bookmark_id: uuid.UUID,
+        user_id: uuid.UUID,
+        url: str,
+        title: str | None,
+        html: str | None,
+        html_blob: str | None,
+        html_original_bytes: int | None,
+        html_bytes: int | None,
+        simhash: int | None,
+        version: int = 1,
+        delta_base_id: uuid.UUID | None = None,
+        html_delta: bytes | None = None,
+        html_sha256: bytes | None = None,
+    ) -> None:
+        # The hash row rides along in the same statement: no extra round trip.
+        row = await conn.fetchrow(
+            """
+            WITH inserted AS (
+              INSERT INTO bookmarks
+                (id, user_id, url, title, html, html_blob, html_original_bytes, html_bytes,
+                 simhash, version, delta_base_id, html_delta)
+              VALUES
+                ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+              RETURNING id, user_id, created_at, change_seq
+            ), hashed AS (
+              INSERT INTO bookmark_html_hashes
+                (user_id, html_sha256, html_size, bookmark_id, created_at)
+              SELECT user_id, $13, $7, id, created_at
+              FROM inserted
+              WHERE $13::bytea IS NOT NULL
+              ON CONFLICT (user_id, html_sha256) DO UPDATE
+                SET html_size = EXCLUDED.html_size,
+                    bookmark_id = EXCLUDED.bookmark_id,
+                    created_at = EXCLUDED.created_at
+            )
+            SELECT created_at, change_seq FROM inserted
+            """,
+            bookmark_id,
+            user_id,
+            url,
+            title,
+            html,
+            html_blob,
+            html_original_bytes,
+            html_bytes,
+            simhash,
+            version,
+            delta_base_id,
+            html_delta,
+            html_sha256,
+        )
+        # Inside a transaction the notification is delivered on commit.
+        event = _created_event(
+            bookmark_id=bookmark_id, user_id=user_id, url=url, title=title, version=version,
+            inserted=row,
+        )
+        await conn.execute(
+            "SELECT pg_notify($1, $2)", BOOKMARK_CHANNEL, bookmark_event_payload(event)
+        )
+
+    async def _next_snapshot(
+        self,
+        conn: asyncpg.Connection,
+        *,
+        user_id: uuid.UUID,
+        url: str,
+        html: str | None,
+    ) -> tuple[int, uuid.UUID | None, bytes | None]:
+        """
+        Returns (version, delta_base_id, html_delta) for a new save of user+URL.
+
+        Must run inside a transaction: the advisory lock serializes concurrent
+        saves of the same user+URL so each version has a single base.
+        """
+        await conn.execute(
+            "SELECT pg_advisory_xact_lock(hashtextextended($1, 0))",
+            f"{user_id}:{url}",
+        )
+        prev = await conn.fetchrow(
+            """
+            SELECT id, version
+            FROM bookmarks
+            WHERE user_id = $1 AND url = $2
+            ORDER BY version DESC, created_at DESC
+            LIMIT 1
+            """,
+            user_id,
+            url,
+        )
+        if prev is None:
+            return 1, None, None
+
+        version = prev["version"] + 1
+        # Every K-th version is a keyframe so reconstruction applies < K deltas.
+        if html is None or (version - 1) % int(app_config.snapshot_keyframe_interval) == 0:
+            return version, None, None
+
+        base = await self._load_html(conn, bookmark_id=prev["id"])
+        if base is None:
+            return version, None, None
+
+        delta = await asyncio.to_thread(make_delta, base, html)
+        # Very large and heavily rewritten pages are cheaper to store (and
+        # rebuild) in full.
+        if delta is None or len(delta) * 2 > len(html):
+            return version, None, None
+        return version, prev["id"], delta
+
+    async def _load_html(self, conn: asyncpg.Connection, *, bookmark_id: uuid.UUID) -> str | None:
+        # The LATERAL ... LIMIT 1 keeps each step a nested-loop index probe; as a
+        # plain join the planner hashes the recursive term against every
+        # partition. Each step looks the row's created_at up in bookmark_ids,
+        # which prunes the probe to the one partition that holds it.
+        rows = await conn.fetch(
+            """
+            WITH RECURSIVE chain AS (
+              SELECT id, user_id, url, created_at, delta_base_id, html, html_blob,
+                     html_delta, 0 AS depth
+              FROM bookmarks
+              WHERE id = $1
+                AND created_at = (SELECT created_at FROM bookmark_ids WHERE id = $1)
+              UNION ALL
+              SELECT b.id, b.user_id, b.url, b.created_at, b.delta_base_id, b.html,
+                     b.html_blob, b.html_delta, c.depth + 1
+              FROM chain c
+              CROSS JOIN LATERAL (
+                SELECT *
+                FROM bookmarks
+                WHERE id = c.delta_base_id
+                  AND created_at = (
+                    SELECT created_at FROM bookmark_ids WHERE id = c.delta_base_id
+                  )
+                  AND user_id = c.user_id
+                  AND url = c.url
+                LIMIT 1
+              ) b
+              WHERE c.html_delta IS NOT NULL
+            )
+            SELECT html, html_blob, html_delta
+            FROM chain
+            ORDER BY depth DESC
+            """,
+            bookmark_id,
+        )
+        if not rows:
+            return None
+        html = rows[0]["html"]
+        if rows[0]["html_blob"]:
+            html = (await self.blobs.get(rows[0]["html_blob"])).decode("utf-8")
+        deltas = [r["html_delta"] for r in rows[1:]]
+        if html is None or not deltas:
+            return html
+        return await asyncio.to_thread(_apply_chain, html, deltas)
+
+    async def open_bookmark_html(
+        self, *, user_id: uuid.UUID, bookmark_id: uuid.UUID
+    ) -> HtmlSource | None:
+        async with self._connection("read") as conn:
+            row = await conn.fetchrow(
                 """
-                INSERT INTO bookmarks (id, user_id, url, title, html)
-                VALUES ($1, $2, $3, $4, $5)
+                SELECT created_at, html IS NOT NULL AS has_inline, html_blob,
+                       html_delta IS NOT NULL AS is_delta
+                FROM bookmarks
+                WHERE id = $1 AND user_id = $2
+                  AND created_at = (SELECT created_at FROM bookmark_ids WHERE id = $1)
                 """,
                 bookmark_id,
                 user_id,
-                url,
-                title,
-                html,
             )
-        return bookmark_id
+            if not row:
+                return None
+            if row["is_delta"]:
+                return HtmlSource(html=await self._load_html(conn, bookmark_id=bookmark_id))
+
+        key = row["html_blob"]
+        if key:
+            if isinstance(self.blobs, FilesystemBlobStore):
+                return HtmlSource(path=self.blobs.path_for(key))
+            if isinstance(self.blobs, S3BlobStore):
+                return HtmlSource(chunks=self.blobs.iter_chunks(key))
+            return HtmlSource(html=(await self.blobs.get(key)).decode("utf-8"))
+        if row["has_inline"]:
+            return HtmlSource(
+                chunks=self._iter_inline_html(bookmark_id=bookmark_id, created_at=row["created_at"])
+            )
+        return HtmlSource()
+
+    async def _iter_inline_html(
+        self, *, bookmark_id: uuid.UUID, created_at: datetime, chunk_chars: int = 256 * 1024
+    ) -> AsyncIterator[bytes]:
+        # Compressed TOAST values are decompressed up to the requested slice on
+        # every call, so chunks are large to keep the number of passes small.
+        # The connection is taken per chunk: a slow client must not hold a
+        # read slot while it downloads.
+        offset = 1
+        while True:
+            async with self._connection("read") as conn:
+                chunk = await conn.fetchval(
+                    """
+                    SELECT substr(html, $3, $4)
+                    FROM bookmarks
+                    WHERE id = $1 AND created_at = $2
+                    """,
+                    bookmark_id,
+                    created_at,
+                    offset,
+                    chunk_chars,
+                )
+            if not chunk:
+                return
+            yield chunk.encode("utf-8")
+            if len(chunk) < chunk_chars:
+                return
+            offset += chunk_chars
+
+    async def list_bookmark_versions(
+        self, *, user_id: uuid.UUID, bookmark_id: uuid.UUID
+    ) -> list[dict]:
+        # The url is resolved in an InitPlan so the outer scan can use the
+        # (user_id, url, version) index; a self-join falls back to scanning all
+        # of a heavy user's rows by user_id.
+        async with self._connection("read") as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id, version, title, created_at, html_bytes,
+                       html_delta IS NULL AS is_keyframe
+                FROM bookmarks
+                WHERE user_id = $2
+                  AND url = (
+                    SELECT url
+                    FROM bookmarks
+                    WHERE id = $1 AND user_id = $2
+                      AND created_at = (SELECT created_at FROM bookmark_ids WHERE id = $1)
+                  )
+                ORDER BY version DESC, created_at DESC
+                """,
+                bookmark_id,
+                user_id,
+            )
+        return [dict(r) for r in rows]
+
+    async def get_bookmark_version(
+        self, *, user_id: uuid.UUID, bookmark_id: uuid.UUID, version: int
+    ) -> dict | None:
+        async with self._connection("read") as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT id, url, title, version, created_at
+                FROM bookmarks
+                WHERE user_id = $2
+                  AND url = (
+                    SELECT url
+                    FROM bookmarks
+                    WHERE id = $1 AND user_id = $2
+                      AND created_at = (SELECT created_at FROM bookmark_ids WHERE id = $1)
+                  )
+                  AND version = $3
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                bookmark_id,
+                user_id,
+                version,
+            )
+            if not row:
+                return None
+            result = dict(row)
+            result["html"] = await self._load_html(conn, bookmark_id=row["id"])
+        return result
 
     async def list_bookmarks(self, *, user_id: uuid.UUID, limit: int = 50) -> list[dict]:
-        async with self.pool.acquire() as conn:
+        # `created_at <= now()` prunes the empty future partitions at executor
+        # startup; the ordered Append then stops once `limit` rows are found.
+        async with self._connection("read") as conn:
             rows = await conn.fetch(
                 """
                 SELECT id, url, title, created_at
                 FROM bookmarks
-                WHERE user_id = $1
+                WHERE user_id = $1 AND created_at <= now()
                 ORDER BY created_at DESC
                 LIMIT $2
                 """,
@@ -130,29 +781,580 @@ class Db:
             )
         return [dict(r) for r in rows]
 
-    async def issue_refresh_token(self, *, user_id: uuid.UUID) -> str:
-        token = secrets.token_urlsafe(48)
-        token_hash = _hash_refresh_token(token)
-        now = datetime.now(timezone.utc)
-        expires_at = now + timedelta(seconds=int(app_config.refresh_token_ttl_seconds))
+    async def iter_bookmark_export(
+        self, *, user_id: uuid.UUID, include_html: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        Every bookmark of the user, read through a server-side cursor.
+
+        Notes:
+        - One repeatable-read snapshot for the whole export; rows are fetched in
+          small batches, so memory does not grow with the archive.
+        - Ordered by URL and ascending version (a backward scan of the
+          `(user_id, url, version DESC)` index), so a delta's base is the row
+          just before it and only that one document is kept to rebuild it.
+        - Holds one `export` connection for as long as the client keeps reading;
+          slow downloads cannot use up the slots interactive reads need.
+        """
+        prefetch = 16 if include_html else 500
+        async with self._connection("export") as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                prev_id, prev_html = None, None
+                async for r in conn.cursor(
+                    """
+                    SELECT id, url, title, version, created_at, html_bytes, delta_base_id,
+                           CASE WHEN $2 THEN html END AS html,
+                           CASE WHEN $2 THEN html_blob END AS html_blob,
+                           CASE WHEN $2 THEN html_delta END AS html_delta
+                    FROM bookmarks
+                    WHERE user_id = $1
+                    ORDER BY url DESC, version ASC
+                    """,
+                    user_id,
+                    include_html,
+                    prefetch=prefetch,
+                ):
+                    row = dict(r)
+                    for internal in ("delta_base_id", "html", "html_blob", "html_delta"):
+                        del row[internal]
+                    if include_html:
+                        html = r["html"]
+                        if r["html_blob"]:
+                            html = (await self.blobs.get(r["html_blob"])).decode("utf-8")
+                        elif r["html_delta"] is not None:
+                            if r["delta_base_id"] == prev_id and prev_html is not None:
+                                html = await asyncio.to_thread(
+                                    _apply_chain, prev_html, [r["html_delta"]]
+                                )
+                            else:
+                                html = await self._load_html(conn, bookmark_id=r["id"])
+                        prev_id, prev_html = r["id"], html
+                        row["html"] = html
+                    yield row
+
+    async def list_bookmark_changes(
+        self, *, user_id: uuid.UUID, since: int, limit: int = 500
+    ) -> dict | None:
+        """
+        Bookmarks written and deleted after change `since`, oldest first.
+
+        Returns None when `since` is ahead of the user's sequence (the client's
+        state came from elsewhere and it must resync from 0). Otherwise
+        `changed`/`deleted` hold at most `limit` entries in total, and `seq` is
+        the cursor to pass next time.
+        """
+        async with self._connection("read") as conn:
+            current = await conn.fetchval(
+                "SELECT bookmark_change_seq FROM users WHERE id = $1", user_id
+            )
+            if current is None or since > current:
+                return None
+            # Values up to `current` were assigned by committed transactions (the
+            # user row stays locked until commit), so both reads below see the
+            # same complete prefix of the sequence.
+            changed = await conn.fetch(
+                """
+                SELECT id, url, title, created_at, version, change_seq
+                FROM bookmarks
+                WHERE user_id = $1 AND change_seq > $2 AND change_seq <= $3
+                ORDER BY change_seq
+                LIMIT $4
+                """,
+                user_id,
+                since,
+                current,
+                limit,
+            )
+            deleted = await conn.fetch(
+                """
+                SELECT bookmark_id AS id, deleted_at, change_seq
+                FROM bookmark_tombstones
+                WHERE user_id = $1 AND change_seq > $2 AND change_seq <= $3
+                ORDER BY change_seq
+                LIMIT $4
+                """,
+                user_id,
+                since,
+                current,
+                limit,
+            )
+
+        # Merge both streams by sequence and cut at `limit`, so the cursor never
+        # skips a change that was fetched from one stream but not returned.
+        merged = sorted([*changed, *deleted], key=lambda r: r["change_seq"])[:limit]
+        seq = merged[-1]["change_seq"] if merged else current
+        kept = {r["change_seq"] for r in merged}
+        return {
+            "changed": [dict(r) for r in changed if r["change_seq"] in kept],
+            "deleted": [dict(r) for r in deleted if r["change_seq"] in kept],
+            "seq": seq,
+            "has_more": seq < current,
+        }
+
+    async def delete_bookmark(
+        self, *, user_id: uuid.UUID, bookmark_id: uuid.UUID
+    ) -> list[uuid.UUID]:
+        """
+        Deletes one bookmark. Returns the deleted ids: `[bookmark_id]`, or empty
+        when the bookmark does not exist.
+
+        Later snapshots stored as deltas against it are kept: the first becomes
+        a keyframe holding its full document, and any other direct dependents are
+        re-encoded against that one.
+        """
+        async with self._connection("write") as conn:
+            async with conn.transaction():
+                target = await conn.fetchrow(
+                    """
+                    SELECT url, created_at
+                    FROM bookmarks
+                    WHERE id = $1 AND user_id = $2
+                      AND created_at = (SELECT created_at FROM bookmark_ids WHERE id = $1)
+                    """,
+                    bookmark_id,
+                    user_id,
+                )
+                if target is None:
+                    return []
+                # Same lock as `_next_snapshot`: no new delta can be based on a
+                # row while it is being deleted.
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock(hashtextextended($1, 0))",
+                    f"{user_id}:{target['url']}",
+                )
+                dependents = await conn.fetch(
+                    """
+                    SELECT id, created_at
+                    FROM bookmarks
+                    WHERE user_id = $1
+                      AND url = $2
+                      AND delta_base_id = $3
+                      AND created_at >= $4
+                    ORDER BY version, created_at
+                    """,
+                    user_id,
+                    target["url"],
+                    bookmark_id,
+                    target["created_at"],
+                )
+                # Rebuilt while the target row, their base, still exists.
+                documents = [
+                    await self._load_html(conn, bookmark_id=r["id"]) for r in dependents
+                ]
+                keyframe = None
+                for r, html in zip(dependents, documents):
+                    delta = None
+                    if keyframe is not None and html is not None:
+                        delta = await asyncio.to_thread(make_delta, keyframe["html"], html)
+                        if delta is not None and len(delta) * 2 > len(html):
+                            delta = None
+                    if delta is not None:
+                        await self._rebase_snapshot(
+                            conn, r, delta_base_id=keyframe["id"], html_delta=delta
+                        )
+                        continue
+                    inline, blob = await self._externalize(html)
+                    await self._rebase_snapshot(conn, r, html=inline, html_blob=blob)
+                    if keyframe is None and html is not None:
+                        keyframe = {"id": r["id"], "html": html}
+
+                # Matching on created_at too lets the delete prune partitions.
+                deleted = await conn.fetchval(
+                    """
+                    DELETE FROM bookmarks
+                    WHERE id = $1 AND user_id = $2 AND created_at = $3
+                    RETURNING id
+                    """,
+                    bookmark_id,
+                    user_id,
+                    target["created_at"],
+                )
+        return [deleted] if deleted is not None else []
+
+    @staticmethod
+    async def _rebase_snapshot(
+        conn: asyncpg.Connection,
+        row: asyncpg.Record,
+        *,
+        html: str | None = None,
+        html_blob: str | None = None,
+        delta_base_id: uuid.UUID | None = None,
+        html_delta: bytes | None = None,
+    ) -> None:
+        """Replaces how a snapshot's document is stored; its content is unchanged."""
+        await conn.execute(
+            """
+            UPDATE bookmarks
+            SET html = $3, html_blob = $4, delta_base_id = $5, html_delta = $6
+            WHERE id = $1 AND created_at = $2
+            """,
+            row["id"],
+            row["created_at"],
+            html,
+            html_blob,
+            delta_base_id,
+            html_delta,
+        )
+
+    async def find_similar_bookmarks(
+        self,
+        *,
+        user_id: uuid.UUID,
+        bookmark_id: uuid.UUID,
+        max_distance: int,
+        max_candidates: int = 1000,
+    ) -> list[dict] | None:
+        """
+        Bookmarks within `max_distance` bits of this one's SimHash.
+
+        Notes:
+        - Candidates share at least one LSH band. Past `max_candidates`, those
+          matching the most bands (16 equal bits each) are kept, so the nearest
+          pages survive the cut.
+        """
+        async with self._connection("read") as conn:
+            src = await conn.fetchrow(
+                """
+                SELECT simhash
+                FROM bookmarks
+                WHERE id = $1 AND user_id = $2
+                  AND created_at = (SELECT created_at FROM bookmark_ids WHERE id = $1)
+                """,
+                bookmark_id,
+                user_id,
+            )
+            if not src:
+                return None
+            if src["simhash"] is None:
+                return []
+
+            target = src["simhash"]
+            bands = simhash_bands(target)
+            candidates = await conn.fetch(
+                """
+                SELECT f.bookmark_id, f.simhash
+                FROM unnest($2::smallint[], $3::integer[]) AS q(band, value)
+                JOIN bookmark_fingerprint_bands f
+                  ON f.user_id = $1 AND f.band = q.band AND f.value = q.value
+                WHERE f.bookmark_id <> $4
+                GROUP BY f.bookmark_id, f.simhash
+                ORDER BY count(*) DESC, f.bookmark_id
+                LIMIT $5
+                """,
+                user_id,
+                list(range(len(bands))),
+                bands,
+                bookmark_id,
+                max_candidates,
+            )
+            distances = {
+                r["bookmark_id"]: d
+                for r in candidates
+                if (d := hamming(r["simhash"], target)) <= max_distance
+            }
+            if not distances:
+                return []
+
+            # One probe per match, pruned to its partition by the LATERAL's
+            # created_at; `id = ANY(...)` alone probes every partition.
+            rows = await conn.fetch(
+                """
+                SELECT b.id, b.url, b.title, b.created_at
+                FROM bookmark_ids i
+                CROSS JOIN LATERAL (
+                  SELECT id, url, title, created_at
+                  FROM bookmarks
+                  WHERE id = i.id AND created_at = i.created_at AND user_id = $1
+                  LIMIT 1
+                ) b
+                WHERE i.id = ANY($2::uuid[])
+                """,
+                user_id,
+                list(distances),
+            )
+        out = [{**dict(r), "distance": distances[r["id"]]} for r in rows]
+        out.sort(key=lambda r: (r["distance"], r["created_at"]))
+        return out
+
+    async def get_bookmark_stats(
+        self, *, user_id: uuid.UUID, days: int = 30, top_domains: int = 20
+    ) -> dict:
+        since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+        async with self._connection("read") as conn:
+            totals = await conn.fetchrow(
+                """
+                SELECT total_count, total_bytes
+                FROM bookmark_stats
+                WHERE user_id = $1
+                """,
+                user_id,
+            )
+            domains = await conn.fetch(
+                """
+                SELECT domain, count
+                FROM bookmark_domain_stats
+                WHERE user_id = $1
+                ORDER BY count DESC
+                LIMIT $2
+                """,
+                user_id,
+                top_domains,
+            )
+            per_day = await conn.fetch(
+                """
+                SELECT day, count
+                FROM bookmark_daily_stats
+                WHERE user_id = $1 AND day >= $2
+                ORDER BY day ASC
+                """,
+                user_id,
+                since,
+            )
+        return {
+            "total_count": totals["total_count"] if totals else 0,
+            "total_bytes": totals["total_bytes"] if totals else 0,
+            "domains": [dict(r) for r in domains],
+            "per_day": [dict(r) for r in per_day],
+        }
+
+    async def reconcile_bookmark_stats(
+        self, *, batch_size: int = 500, min_interval_seconds: float = 0
+    ) -> int | None:
+        """
+        Rebuilds every user's aggregates, one short transaction per user.
+
+        Notes:
+        - One process at a time: returns None without scanning when another
+          holds the leader lock, or when a run finished less than
+          `min_interval_seconds` ago.
+        """
         async with self.pool.acquire() as conn:
-            await conn.execute(
+            # Session lock: released below, or by Postgres if the connection drops.
+            if not await conn.fetchval(
+                "SELECT pg_try_advisory_lock(hashtextextended($1, 0))", _RECONCILE_JOB
+            ):
+                return None
+            try:
+                if min_interval_seconds > 0 and await conn.fetchval(
+                    """
+                    SELECT finished_at > now() - make_interval(secs => $2)
+                    FROM maintenance_runs
+                    WHERE name = $1
+                    """,
+                    _RECONCILE_JOB,
+                    float(min_interval_seconds),
+                ):
+                    return None
+                reconciled = 0
+                last_id = None
+                while True:
+                    user_ids = await conn.fetch(
+                        """
+                        SELECT id
+                        FROM users
+                        WHERE $1::uuid IS NULL OR id > $1
+                        ORDER BY id
+                        LIMIT $2
+                        """,
+                        last_id,
+                        batch_size,
+                    )
+                    if not user_ids:
+                        break
+                    for r in user_ids:
+                        await conn.execute("SELECT bookmark_stats_reconcile($1)", r["id"])
+                    reconciled += len(user_ids)
+                    last_id = user_ids[-1]["id"]
+                await conn.execute(
+                    """
+                    INSERT INTO maintenance_runs (name, finished_at)
+                    VALUES ($1, now())
+                    ON CONFLICT (name) DO UPDATE SET finished_at = EXCLUDED.finished_at
+                    """,
+                    _RECONCILE_JOB,
+                )
+                return reconciled
+            finally:
+                await conn.execute(
+                    "SELECT pg_advisory_unlock(hashtextextended($1, 0))", _RECONCILE_JOB
+                )
+
+    async def ensure_bookmark_partitions(
+        self, *, months_ahead: int = 3, since: datetime | None = None
+    ) -> int:
+        """
+        Creates missing monthly `bookmarks` partitions up to `months_ahead`
+        months past the current one; returns how many were created.
+        """
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                "SELECT ensure_bookmark_partitions($1, $2)",
+                since or datetime.now(timezone.utc),
+                months_ahead,
+            )
+
+    async def attach_fetched_html(
+        self,
+        *,
+        user_id: uuid.UUID,
+        bookmark_id: uuid.UUID,
+        html: str,
+        html_original_bytes: int | None = None,
+        html_bytes: int | None = None,
+        simhash: int | None = None,
+    ) -> bool:
+        """
+        Stores a server-fetched page on a bookmark that was saved without one.
+
+        Returns False when the bookmark is gone or already has HTML.
+        """
+        html, html_blob = await self._externalize(html)
+        async with self._connection("background") as conn:
+            row = await conn.fetchrow(
                 """
-                INSERT INTO refresh_tokens (id, user_id, token_hash, expires_at)
-                VALUES ($1, $2, $3, $4)
+                UPDATE bookmarks
+                SET html = $3, html_blob = $4, html_original_bytes = $5, html_bytes = $6,
+                    simhash = $7
+                WHERE id = $1 AND user_id = $2
+                  AND created_at = (SELECT created_at FROM bookmark_ids WHERE id = $1)
+                  AND html IS NULL AND html_blob IS NULL AND html_delta IS NULL
+                RETURNING url, title, version, created_at, change_seq
                 """,
-                uuid.uuid4(),
+                bookmark_id,
                 user_id,
-                token_hash,
-                expires_at,
+                html,
+                html_blob,
+                html_original_bytes,
+                html_bytes,
+                simhash,
+            )
+            if row is None:
+                return False
+            event = {
+                "type": "updated",
+                "user_id": str(user_id),
+                "id": str(bookmark_id),
+                "url": row["url"],
+                "title": row["title"],
+                "version": row["version"],
+                "created_at": row["created_at"].isoformat(),
+                "change_seq": row["change_seq"],
+            }
+            await conn.execute(
+                "SELECT pg_notify($1, $2)", BOOKMARK_CHANNEL, bookmark_event_payload(event)
+            )
+        return True
+
+    async def get_page_fetch(self, *, url: str) -> dict | None:
+        async with self._connection("background") as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT status, http_status, etag, last_modified, bookmark_id, fetched_at
+                FROM page_fetches
+                WHERE md5(url) = md5($1) AND url = $1
+                """,
+                url,
+            )
+        return dict(row) if row else None
+
+    async def load_page_fetch_html(self, *, url: str) -> str | None:
+        """
+        The copy stored by the last successful fetch of `url`, or None.
+
+        Fetched pages are anonymous public copies, so any user's bookmark may
+        supply one.
+        """
+        async with self._connection("background") as conn:
+            bookmark_id = await conn.fetchval(
+                """
+                SELECT f.bookmark_id
+                FROM page_fetches f
+                WHERE md5(f.url) = md5($1) AND f.url = $1
+                """,
+                url,
+            )
+            if bookmark_id is None:
+                return None
+            return await self._load_html(conn, bookmark_id=bookmark_id)
+
+    async def record_page_fetch(
+        self,
+        *,
+        url: str,
+        status: str,
+        http_status: int | None,
+        etag: str | None,
+        last_modified: str | None,
+        bookmark_id: uuid.UUID | None,
+    ) -> None:
+        """
+        Upserts the outcome of a fetch. Validators and the stored copy are only
+        replaced by a fetch that stored a new copy.
+        """
+        async with self._connection("background") as conn:
+            await conn.execute(
+                """
+                INSERT INTO page_fetches
+                  (url, status, http_status, etag, last_modified, bookmark_id)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (md5(url)) DO UPDATE
+                SET status = EXCLUDED.status,
+                    http_status = EXCLUDED.http_status,
+                    etag = CASE WHEN EXCLUDED.bookmark_id IS NULL
+                                THEN page_fetches.etag ELSE EXCLUDED.etag END,
+                    last_modified = CASE WHEN EXCLUDED.bookmark_id IS NULL
+                                         THEN page_fetches.last_modified
+                                         ELSE EXCLUDED.last_modified END,
+                    bookmark_id = coalesce(EXCLUDED.bookmark_id, page_fetches.bookmark_id),
+                    fetched_at = now()
+                """,
+                url,
+                status,
+                http_status,
+                etag,
+                last_modified,
+                bookmark_id,
             )
-        return token
 
-    async def rotate_refresh_token(self, *, refresh_token: str) -> tuple[uuid.UUID, str]:
+    async def issue_refresh_token(self, *, user_id: uuid.UUID) -> tuple[str, int]:
+        """
+        Returns (refresh token, the user's current access-token generation).
+
+        Stamp new access tokens with this generation, not the process's
+        `TokenRevocations`: a process that missed a NOTIFY would otherwise issue
+        tokens that every other process rejects.
+        """
+        async with self._connection("auth") as conn:
+            return await self._insert_refresh_token(conn, user_id=user_id)
+
+    async def _insert_refresh_token(
+        self, conn: asyncpg.Connection, *, user_id: uuid.UUID
+    ) -> tuple[str, int]:
+        token = secrets.token_urlsafe(48)
+        expires_at = datetime.now(timezone.utc) + timedelta(
+            seconds=int(app_config.refresh_token_ttl_seconds)
+        )
+        generation = await conn.fetchval(
+            """
+            INSERT INTO refresh_tokens (id, user_id, token_hash, expires_at)
+            VALUES ($1, $2, $3, $4)
+            RETURNING (SELECT token_generation FROM users WHERE id = $2)
+            """,
+            uuid.uuid4(),
+            user_id,
+            _hash_refresh_token(token),
+            expires_at,
+        )
+        return token, generation
+
+    async def rotate_refresh_token(
+        self, *, refresh_token: str
+    ) -> tuple[uuid.UUID, str, int]:
+        """Returns (user id, new refresh token, access-token generation)."""
         token_hash = _hash_refresh_token(refresh_token)
         now = datetime.now(timezone.utc)
 
-        async with self.pool.acquire() as conn:
+        async with self._connection("auth") as conn:
             async with conn.transaction():
                 row = await conn.fetchrow(
                     """
@@ -178,28 +1380,130 @@ class Db:
                     row["id"],
                     now,
                 )
+                user_id = uuid.UUID(str(row["user_id"]))
+                new_token, generation = await self._insert_refresh_token(conn, user_id=user_id)
+        return user_id, new_token, generation
 
-        user_id = uuid.UUID(str(row["user_id"]))
-        new_token = await self.issue_refresh_token(user_id=user_id)
-        return user_id, new_token
+    async def revoke_tokens_for_user(self, *, user_id: uuid.UUID) -> tuple[int, int]:
+        """
+        Revokes the user's refresh tokens and every access token issued so far;
+        returns (refresh tokens revoked, new token generation).
 
-    async def revoke_refresh_tokens_for_user(self, *, user_id: uuid.UUID) -> int:
+        Notes:
+        - The generation bump and its NOTIFY commit together, so every process
+          that sees the new generation also sees the revoked refresh tokens.
+        """
         now = datetime.now(timezone.utc)
-        async with self.pool.acquire() as conn:
-            res = await conn.execute(
-                """
-                UPDATE refresh_tokens
-                SET revoked_at = $2
-                WHERE user_id = $1 AND revoked_at IS NULL
-                """,
-                user_id,
-                now,
-            )
+        async with self._connection("auth") as conn:
+            async with conn.transaction():
+                res = await conn.execute(
+                    """
+                    UPDATE refresh_tokens
+                    SET revoked_at = $2
+                    WHERE user_id = $1 AND revoked_at IS NULL
+                    """,
+                    user_id,
+                    now,
+                )
+                generation = await conn.fetchval(
+                    """
+                    UPDATE users
+                    SET token_generation = token_generation + 1
+                    WHERE id = $1
+                    RETURNING token_generation
+                    """,
+                    user_id,
+                )
+                if generation is None:
+                    raise ValueError("Unknown user")
+                await conn.execute(
+                    "SELECT pg_notify($1, $2)",
+                    REVOCATION_CHANNEL,
+                    json.dumps({"user_id": str(user_id), "generation": generation}),
+                )
         # asyncpg returns strings like "UPDATE 3"
-        return int(res.split()[-1]) if res else 0
+        return (int(res.split()[-1]) if res else 0), generation
+
+    async def load_token_generations(self) -> dict[uuid.UUID, int]:
+        """Users whose access tokens have been revoked at least once."""
+        async with self._connection("auth") as conn:
+            rows = await conn.fetch(
+                "SELECT id, token_generation FROM users WHERE token_generation > 0"
+            )
+        return {r["id"]: r["token_generation"] for r in rows}
+
+
+def _admission_from_config() -> AdmissionControl:
+    def budget(op: str, concurrency: int, statement_timeout_ms: int) -> Budget:
+        return Budget(
+            op,
+            concurrency=concurrency,
+            max_queue=app_config.db_queue_limit,
+            acquire_timeout=app_config.db_acquire_timeout_seconds,
+            statement_timeout_ms=statement_timeout_ms,
+        )
+
+    default_ms = app_config.db_statement_timeout_ms
+    return AdmissionControl(
+        budgets={
+            "read": budget("read", app_config.db_read_concurrency, default_ms),
+            "write": budget(
+                "write", app_config.db_write_concurrency, app_config.db_write_statement_timeout_ms
+            ),
+            "auth": budget("auth", app_config.db_auth_concurrency, default_ms),
+            # Held for a whole download: no queue, so a busy export slot sheds at once.
+            "export": Budget(
+                "export",
+                concurrency=app_config.db_export_concurrency,
+                max_queue=0,
+                acquire_timeout=app_config.db_acquire_timeout_seconds,
+                statement_timeout_ms=default_ms,
+            ),
+            # The page fetcher, so background fetches never take interactive slots.
+            "background": budget(
+                "background",
+                app_config.db_background_concurrency,
+                app_config.db_write_statement_timeout_ms,
+            ),
+        },
+        breaker=CircuitBreaker(
+            failure_threshold=app_config.db_breaker_failures,
+            reset_seconds=app_config.db_breaker_reset_seconds,
+        ),
+    )
 
 
-async def create_db(database_url: str) -> Db:
-    pool = await asyncpg.create_pool(dsn=database_url, statement_cache_size=0)
-    return Db(pool=pool)
+async def create_db(database_url: str, *, blobs: BlobStore | None = None) -> Db:
+    admission = _admission_from_config()
+    # A pool per budget, one connection per slot: a holder of a slot always finds
+    # a free connection, and the statement timeout is set once, at connect.
+    for budget in admission.budgets.values():
+        budget.pool = await asyncpg.create_pool(
+            dsn=database_url,
+            statement_cache_size=0,
+            min_size=min(budget.concurrency, 2),
+            max_size=budget.concurrency,
+            server_settings={"statement_timeout": str(int(budget.statement_timeout_ms))},
+        )
+    # Migrations and maintenance jobs (stats reconciliation holds its connection
+    # for the whole run) use their own connections, outside every budget.
+    pool = await asyncpg.create_pool(
+        dsn=database_url,
+        statement_cache_size=0,
+        min_size=1,
+        max_size=app_config.db_maintenance_connections,
+    )
+    group_commit = None
+    if app_config.write_coalesce_enabled:
+        group_commit = GroupCommit(
+            window_seconds=app_config.write_coalesce_window_ms / 1000,
+            max_batch=app_config.write_coalesce_max_batch,
+            direct_when_idle=app_config.write_coalesce_direct_when_idle,
+        )
+    return Db(
+        pool=pool,
+        blobs=blobs or PostgresBlobStore(),
+        admission=admission,
+        group_commit=group_commit,
+    )
 
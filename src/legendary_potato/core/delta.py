@@ -0,0 +1,52 @@
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+__all__ = ["MAX_DELTA_TOKENS", "make_delta", "apply_delta"]
+
+
+# Tokens end at a tag close or a newline, so minified single-line pages still
+# diff at markup granularity instead of as one giant line.
+_TOKEN_RE = re.compile(r"[^>\n]*[>\n]|[^>\n]+")
+
+# SequenceMatcher is roughly quadratic in the token count: ~1s at this size
+# for a page with scattered edits, several seconds at twice it. Larger pages
+# are stored as keyframes.
+MAX_DELTA_TOKENS = 20_000
+
+
+def _tokens(html: str) -> list[str]:
+    return _TOKEN_RE.findall(html)
+
+
+def make_delta(base: str, target: str) -> bytes | None:
+    """
+    Encode `target` as copy/insert ops against `base`, or None when either
+    document has more than `MAX_DELTA_TOKENS` tokens.
+
+    Ops are `[start, length]` (copy base tokens) or a string (literal insert),
+    serialized as zlib-compressed JSON. CPU-bound; run off the event loop.
+    """
+    a, b = _tokens(base), _tokens(target)
+    if max(len(a), len(b)) > MAX_DELTA_TOKENS:
+        return None
+    ops: list = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2 - i1])
+        elif j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    a = _tokens(base)
+    out: list[str] = []
+    for op in json.loads(zlib.decompress(delta)):
+        if isinstance(op, str):
+            out.append(op)
+        else:
+            start, length = op
+            out.append("".join(a[start : start + length]))
+    return "".join(out)
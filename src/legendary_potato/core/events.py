@@ -0,0 +1,177 @@
+import asyncio
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from dc_logger import get_logger
+
+__all__ = ["BOOKMARK_CHANNEL", "Subscription", "EventHub", "bookmark_event_payload"]
+
+
+logger = get_logger()
+
+BOOKMARK_CHANNEL = "bookmark_events"
+
+# NOTIFY payloads must be shorter than 8000 bytes.
+_MAX_PAYLOAD_BYTES = 7900
+
+
+def bookmark_event_payload(event: dict) -> str:
+    """
+    JSON for `pg_notify`. Oversized events drop their free-text fields; clients
+    can fetch them through `GET /bookmarks/changes`.
+    """
+    payload = json.dumps(event, separators=(",", ":"), default=str)
+    if len(payload.encode("utf-8")) > _MAX_PAYLOAD_BYTES:
+        slim = {k: v for k, v in event.items() if k not in ("url", "title")}
+        payload = json.dumps({**slim, "truncated": True}, separators=(",", ":"), default=str)
+    return payload
+
+
+@dataclass(eq=False)
+class Subscription:
+    """
+    One SSE client's view of the hub.
+
+    The buffer is bounded: a client that falls `buffer_size` events behind is
+    closed (`overflowed`) rather than buffered without limit. It reconnects with
+    Last-Event-ID and catches up from the change feed.
+    """
+
+    user_id: uuid.UUID
+    buffer_size: int
+    queue: asyncio.Queue = field(init=False)
+    overflowed: bool = False
+
+    def __post_init__(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.buffer_size)
+
+    def offer(self, event: dict) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Wake the reader so it notices and closes the stream.
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def next(self, timeout: float) -> dict | None:
+        """The next event, or None on timeout or overflow."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+@dataclass
+class EventHub:
+    """
+    Fans Postgres NOTIFY events out to in-process subscribers.
+
+    Notes:
+    - One dedicated LISTEN connection per process, outside the pool (pooled
+      connections are reset with UNLISTEN on release).
+    - Reconnects with backoff when the connection drops; events sent meanwhile
+      are only recoverable through the change feed.
+    - Other channels can share the connection through `listen`; their
+      `resync` callback runs after a reconnect to recover missed payloads.
+    """
+
+    database_url: str
+    buffer_size: int = 100
+    max_subscribers: int = 10_000
+    subscribers: dict[uuid.UUID, set[Subscription]] = field(default_factory=dict)
+    count: int = 0
+    channels: dict[str, Callable[[str], None]] = field(default_factory=dict, repr=False)
+    resyncs: list[Callable[[], Awaitable[None]]] = field(default_factory=list, repr=False)
+    _conn: asyncpg.Connection | None = field(default=None, repr=False)
+    _reconnect: asyncio.Task | None = field(default=None, repr=False)
+    _closed: bool = False
+
+    async def start(self) -> None:
+        self._conn = await asyncpg.connect(self.database_url)
+        self._conn.add_termination_listener(self._on_terminated)
+        await self._conn.add_listener(BOOKMARK_CHANNEL, self._on_notify)
+        for channel, callback in self.channels.items():
+            await self._conn.add_listener(
+                channel, lambda conn, pid, ch, payload, cb=callback: cb(payload)
+            )
+
+    def listen(
+        self,
+        channel: str,
+        callback: Callable[[str], None],
+        *,
+        resync: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        """Registers `callback(payload)` for `channel`; call before `start`."""
+        self.channels[channel] = callback
+        if resync is not None:
+            self.resyncs.append(resync)
+
+    async def stop(self) -> None:
+        self._closed = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+
+    def subscribe(self, user_id: uuid.UUID) -> Subscription | None:
+        """None when the process already serves `max_subscribers` streams."""
+        if self.count >= self.max_subscribers:
+            return None
+        sub = Subscription(user_id=user_id, buffer_size=self.buffer_size)
+        self.subscribers.setdefault(user_id, set()).add(sub)
+        self.count += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self.subscribers.get(sub.user_id)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        self.count -= 1
+        if not subs:
+            del self.subscribers[sub.user_id]
+
+    def publish(self, event: dict) -> None:
+        try:
+            user_id = uuid.UUID(event["user_id"])
+        except (KeyError, TypeError, ValueError):
+            return
+        for sub in self.subscribers.get(user_id, ()):
+            sub.offer(event)
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self.publish(event)
+
+    def _on_terminated(self, conn) -> None:
+        if not self._closed:
+            self._reconnect = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        delay = 1.0
+        while not self._closed:
+            await logger.warning(f"LISTEN connection lost; reconnecting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            try:
+                await self.start()
+            except (OSError, asyncpg.PostgresError) as e:
+                await logger.warning(f"LISTEN reconnect failed: {e}")
+                delay = min(delay * 2, 30.0)
+                continue
+            for resync in self.resyncs:
+                try:
+                    await resync()
+                except Exception as e:
+                    await logger.error(f"Resync after LISTEN reconnect failed: {e}")
+            return
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import tarfile
+import time
+import uuid
+import zlib
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:  # optional: without it exports are gzip-compressed
+    zstandard = None
+
+__all__ = [
+    "EXPORT_FORMATS",
+    "COMPRESSIONS",
+    "ExportFormat",
+    "available_compressions",
+    "default_compression",
+    "export_filename",
+    "export_media_type",
+    "export_stream",
+]
+
+
+# Compressed output is flushed to the client once this much has accumulated.
+_FLUSH_BYTES = 256 * 1024
+# Records larger than this are compressed off the event loop.
+_THREAD_BYTES = 64 * 1024
+
+_TAR_BLOCK = tarfile.BLOCKSIZE
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    extension: str
+    media_type: str
+    # WARC readers expect one compressed member per record so they can seek.
+    compress_per_record: bool = False
+
+
+EXPORT_FORMATS = {
+    "ndjson": ExportFormat("ndjson", "application/x-ndjson"),
+    "tar": ExportFormat("tar", "application/x-tar"),
+    "warc": ExportFormat("warc", "application/warc", compress_per_record=True),
+}
+
+# name -> (file suffix, media type of the compressed download)
+COMPRESSIONS = {
+    "zstd": (".zst", "application/zstd"),
+    "gzip": (".gz", "application/gzip"),
+    "none": ("", None),
+}
+
+
+def available_compressions() -> list[str]:
+    return [c for c in COMPRESSIONS if c != "zstd" or zstandard is not None]
+
+
+def default_compression() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def _compressor(compression: str):
+    """An object with `compress(bytes)` and `flush()`, like zlib's compressobj."""
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the `zstandard` package")
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "none":
+        return None
+    raise ValueError(f"Unknown compression: {compression!r}")
+
+
+def _record_json(row: dict) -> dict:
+    record = {
+        "id": str(row["id"]),
+        "url": row["url"],
+        "title": row["title"],
+        "version": row["version"],
+        "created_at": row["created_at"].isoformat(),
+        "html_bytes": row["html_bytes"],
+    }
+    if "html" in row:
+        record["html"] = row["html"]
+    return record
+
+
+def _ndjson(row: dict) -> list[bytes]:
+    return [json.dumps(_record_json(row), ensure_ascii=False).encode("utf-8") + b"\n"]
+
+
+def _tar_member(name: str, data: bytes, mtime: float) -> list[bytes]:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    padding = -len(data) % _TAR_BLOCK
+    return [info.tobuf(format=tarfile.PAX_FORMAT), data, b"\0" * padding]
+
+
+def _tar(row: dict) -> list[bytes]:
+    """`<id>.json` metadata, plus `<id>.html` when the document is included."""
+    name = f"bookmarks/{row['id']}"
+    mtime = row["created_at"].timestamp()
+    meta = {k: v for k, v in _record_json(row).items() if k != "html"}
+    parts = _tar_member(f"{name}.json", json.dumps(meta, ensure_ascii=False).encode(), mtime)
+    if row.get("html") is not None:
+        parts += _tar_member(f"{name}.html", row["html"].encode("utf-8"), mtime)
+    return parts
+
+
+def _warc_record(headers: dict[str, str], body: bytes) -> bytes:
+    head = "WARC/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    head += f"Content-Length: {len(body)}\r\n\r\n"
+    return head.encode("utf-8") + body + b"\r\n\r\n"
+
+
+def _warc_date(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _warc(row: dict) -> list[bytes]:
+    """A `resource` record for the page (when included) and a `metadata` record."""
+    records = []
+    date = _warc_date(row["created_at"])
+    resource_id = f"<urn:uuid:{row['id']}>"
+    if row.get("html") is not None:
+        records.append(
+            _warc_record(
+                {
+                    "WARC-Type": "resource",
+                    "WARC-Record-ID": resource_id,
+                    "WARC-Date": date,
+                    "WARC-Target-URI": row["url"],
+                    "Content-Type": "text/html; charset=utf-8",
+                },
+                row["html"].encode("utf-8"),
+            )
+        )
+    meta = {k: v for k, v in _record_json(row).items() if k != "html"}
+    headers = {
+        "WARC-Type": "metadata",
+        "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+        "WARC-Date": date,
+        "WARC-Target-URI": row["url"],
+        "Content-Type": "application/json",
+    }
+    if records:
+        headers["WARC-Refers-To"] = resource_id
+    records.append(_warc_record(headers, json.dumps(meta, ensure_ascii=False).encode()))
+    return records
+
+
+def _warcinfo(user_id: uuid.UUID) -> bytes:
+    body = f"software: legendary_potato\r\nformat: WARC File Format 1.1\r\nuser: {user_id}\r\n"
+    return _warc_record(
+        {
+            "WARC-Type": "warcinfo",
+            "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+            "WARC-Date": _warc_date(datetime.now(timezone.utc)),
+            "Content-Type": "application/warc-fields",
+        },
+        body.encode("utf-8"),
+    )
+
+
+_ENCODERS: dict[str, Callable[[dict], list[bytes]]] = {
+    "ndjson": _ndjson,
+    "tar": _tar,
+    "warc": _warc,
+}
+
+
+async def export_stream(
+    rows: AsyncIterator[dict],
+    *,
+    user_id: uuid.UUID,
+    fmt: str,
+    compression: str,
+) -> AsyncIterator[bytes]:
+    """
+    Encodes and compresses `rows` as they arrive.
+
+    Notes:
+    - Memory is bounded by one document plus the compressor's window; output
+      is yielded in ~256 KiB pieces.
+    - Large records (full HTML) are compressed in a worker thread, one at a
+      time, so the compressor is never used concurrently.
+    - WARC records are compressed as independent gzip members / zstd frames,
+      which is what `.warc.gz` readers expect.
+    """
+    encode = _ENCODERS[fmt]
+    per_record = EXPORT_FORMATS[fmt].compress_per_record
+    comp = _compressor(compression)
+    pending: list[bytes] = []
+    size = 0
+
+    def compress(chunks: list[bytes]) -> bytes:
+        nonlocal comp
+        if comp is None:
+            return b"".join(chunks)
+        if not per_record:
+            return b"".join([comp.compress(c) for c in chunks])
+        out = []
+        for c in chunks:
+            out += [comp.compress(c), comp.flush()]
+            comp = _compressor(compression)
+        return b"".join(out)
+
+    if fmt == "warc":
+        pending.append(compress([_warcinfo(user_id)]))
+    async for row in rows:
+        chunks = encode(row)
+        if sum(len(c) for c in chunks) > _THREAD_BYTES:
+            data = await asyncio.to_thread(compress, chunks)
+        else:
+            data = compress(chunks)
+        if data:
+            pending.append(data)
+            size += len(data)
+        if size >= _FLUSH_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+
+    if fmt == "tar":
+        pending.append(compress([b"\0" * (2 * _TAR_BLOCK)]))
+    if comp is not None and not per_record:
+        pending.append(comp.flush())
+    yield b"".join(pending)
+
+
+def export_filename(fmt: str, compression: str) -> str:
+    stamp = time.strftime("%Y%m%d", time.gmtime())
+    return f"bookmarks-{stamp}.{EXPORT_FORMATS[fmt].extension}{COMPRESSIONS[compression][0]}"
+
+
+def export_media_type(fmt: str, compression: str) -> str:
+    return COMPRESSIONS[compression][1] or EXPORT_FORMATS[fmt].media_type
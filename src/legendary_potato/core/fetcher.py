@@ -0,0 +1,326 @@
+import asyncio
+import ipaddress
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from dc_logger import get_logger
+
+from .html_slim import SlimPolicy
+from .ingest import prepare_html
+
+if TYPE_CHECKING:
+    from .db import Db
+
+__all__ = ["FetchJob", "FetchResult", "PageFetcher"]
+
+
+logger = get_logger()
+
+_HTML_TYPES = ("text/html", "application/xhtml+xml")
+_REDIRECTS = (301, 302, 303, 307, 308)
+_MAX_ROBOTS_BYTES = 512 * 1024
+# An unreachable robots.txt disallows the host; retry sooner than a real one expires.
+_ROBOTS_ERROR_TTL_SECONDS = 300.0
+
+
+class _Blocked(Exception):
+    pass
+
+
+class _TooLarge(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class FetchJob:
+    user_id: uuid.UUID
+    bookmark_id: uuid.UUID
+    url: str
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    """
+    `status` is one of: fetched, not_modified, robots_disallowed, blocked,
+    too_large, not_html, http_error, error.
+    """
+
+    status: str
+    url: str
+    html: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    http_status: int | None = None
+    error: str | None = None
+
+
+@dataclass
+class _Host:
+    slots: asyncio.Semaphore
+    users: int = 0
+
+
+@dataclass
+class PageFetcher:
+    """
+    Fetches pages for bookmarks saved without HTML, from a bounded background queue.
+
+    Notes:
+    - One pooled `httpx.AsyncClient` for every fetch; `concurrency` workers, at
+      most `per_host` requests at once per host. Up to `keepalive_connections`
+      idle connections are kept, so hosts in rotation reuse theirs.
+    - Honors robots.txt (cached per origin for `robots_ttl_seconds`) and re-fetches
+      a URL it fetched before with If-None-Match / If-Modified-Since; a 304
+      reuses the stored copy.
+    - Bodies over `max_bytes` are abandoned mid-stream. `timeout_seconds` bounds
+      the whole fetch, redirects included.
+    - Refuses hosts that resolve to private, loopback or link-local addresses
+      unless `allow_private` (redirects are checked hop by hop). Addresses are
+      resolved again by the client, so this does not stop DNS rebinding.
+    - Jobs still queued at shutdown are dropped; so is a job offered to a full queue.
+    """
+
+    concurrency: int = 16
+    per_host: int = 2
+    timeout_seconds: float = 10.0
+    max_bytes: int = 1_500_000
+    queue_size: int = 10_000
+    keepalive_connections: int = 100
+    robots_ttl_seconds: float = 3600.0
+    max_redirects: int = 5
+    user_agent: str = "legendary_potato-fetcher/0.1"
+    allow_private: bool = False
+    slim_policy: SlimPolicy = field(default_factory=lambda: SlimPolicy.from_names([]))
+    fingerprint: bool = True
+    client: httpx.AsyncClient | None = field(default=None, repr=False)
+    _queue: asyncio.Queue | None = field(default=None, repr=False)
+    _workers: list[asyncio.Task] = field(default_factory=list, repr=False)
+    _hosts: dict[str, _Host] = field(default_factory=dict, repr=False)
+    _robots: dict[str, tuple[float, asyncio.Task]] = field(default_factory=dict, repr=False)
+
+    async def start(self, db: "Db | None" = None) -> None:
+        """Opens the client; with a `db`, also starts the queue workers."""
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": self.user_agent},
+            timeout=httpx.Timeout(self.timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=max(self.concurrency, self.keepalive_connections),
+                max_keepalive_connections=self.keepalive_connections,
+            ),
+            follow_redirects=False,
+        )
+        if db is not None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._workers = [
+                asyncio.create_task(self._work(db)) for _ in range(self.concurrency)
+            ]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for _, task in self._robots.values():
+            task.cancel()
+        if self.client is not None:
+            await self.client.aclose()
+
+    def enqueue(self, job: FetchJob) -> bool:
+        """False when the queue is full (or not running) and the job was dropped."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def join(self) -> None:
+        """Waits until every queued job has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def fetch(
+        self, url: str, *, etag: str | None = None, last_modified: str | None = None
+    ) -> FetchResult:
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                return await self._fetch(url, etag=etag, last_modified=last_modified)
+        except _Blocked as e:
+            return FetchResult("blocked", url, error=str(e))
+        except _TooLarge:
+            return FetchResult("too_large", url)
+        except (httpx.HTTPError, OSError, TimeoutError, UnicodeError, ValueError) as e:
+            return FetchResult("error", url, error=f"{type(e).__name__}: {e}")
+
+    async def _fetch(self, url: str, *, etag: str | None, last_modified: str | None) -> FetchResult:
+        headers = {"Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.1"}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        for _ in range(self.max_redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise _Blocked(f"unsupported URL: {url}")
+            await self._check_address(parts.hostname, parts.port)
+            if not await self._robots_allow(url):
+                return FetchResult("robots_disallowed", url)
+
+            async with self._host_slot(parts.netloc.lower()):
+                async with self.client.stream("GET", url, headers=headers) as res:
+                    location = res.headers.get("location")
+                    if res.status_code in _REDIRECTS and location:
+                        url = urljoin(url, location)
+                        continue
+                    if res.status_code == 304:
+                        return FetchResult("not_modified", url, http_status=304)
+                    if res.status_code != 200:
+                        return FetchResult("http_error", url, http_status=res.status_code)
+                    content_type = res.headers.get("content-type", "").split(";")[0].strip()
+                    if content_type.lower() not in _HTML_TYPES:
+                        return FetchResult("not_html", url, http_status=200)
+                    body = await self._read_capped(res, self.max_bytes)
+                    return FetchResult(
+                        "fetched",
+                        url,
+                        html=body.decode(res.encoding or "utf-8", errors="replace"),
+                        etag=res.headers.get("etag"),
+                        last_modified=res.headers.get("last-modified"),
+                        http_status=200,
+                    )
+        raise _Blocked("too many redirects")
+
+    @staticmethod
+    async def _read_capped(res: httpx.Response, max_bytes: int) -> bytes:
+        declared = res.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise _TooLarge()
+        chunks, size = [], 0
+        async for chunk in res.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise _TooLarge()
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = _Host(asyncio.Semaphore(self.per_host))
+        entry.users += 1
+        try:
+            async with entry.slots:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._hosts[host]
+
+    async def _check_address(self, host: str, port: int | None) -> None:
+        if self.allow_private:
+            return
+        try:
+            addresses = [ipaddress.ip_address(host)]
+        except ValueError:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, port or 443, type=socket.SOCK_STREAM
+            )
+            addresses = [ipaddress.ip_address(info[4][0]) for info in infos]
+        for address in addresses:
+            if not address.is_global:
+                raise _Blocked(f"{host} resolves to a non-public address")
+
+    async def _robots_allow(self, url: str) -> bool:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc.lower()}"
+        now = time.monotonic()
+        cached = self._robots.get(origin)
+        if cached is None or cached[0] <= now:
+            task = asyncio.create_task(self._load_robots(origin))
+            self._robots[origin] = cached = (now + self.robots_ttl_seconds, task)
+        parser = await asyncio.shield(cached[1])
+        if parser is None:
+            # Unreachable robots.txt: treat the whole host as disallowed for a while.
+            self._robots[origin] = (min(cached[0], now + _ROBOTS_ERROR_TTL_SECONDS), cached[1])
+            return False
+        return parser.can_fetch(self.user_agent, url)
+
+    async def _load_robots(self, origin: str) -> RobotFileParser | None:
+        parser = RobotFileParser()
+        try:
+            async with self._host_slot(urlsplit(origin).netloc):
+                async with self.client.stream("GET", f"{origin}/robots.txt") as res:
+                    if 400 <= res.status_code < 500:
+                        parser.parse([])  # no robots.txt: everything is allowed
+                        return parser
+                    if res.status_code != 200:
+                        return None
+                    body = await self._read_capped(res, _MAX_ROBOTS_BYTES)
+        except (httpx.HTTPError, OSError, _TooLarge):
+            return None
+        parser.parse(body.decode("utf-8", errors="replace").splitlines())
+        return parser
+
+    async def _work(self, db: "Db") -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.process(db, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await logger.warning(f"Page fetch failed for {job.url}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def process(self, db: "Db", job: FetchJob) -> FetchResult:
+        """Fetches `job.url` and attaches the page to the bookmark."""
+        previous = await db.get_page_fetch(url=job.url)
+        # Validators are only useful while the copy they describe is still stored.
+        if previous is None or previous["bookmark_id"] is None:
+            previous = {"etag": None, "last_modified": None}
+        stored_html = None
+        result = await self.fetch(
+            job.url, etag=previous["etag"], last_modified=previous["last_modified"]
+        )
+        if result.status == "not_modified":
+            stored_html = await db.load_page_fetch_html(url=job.url)
+            if stored_html is None:
+                # The copy we fetched before is gone; fetch unconditionally.
+                result = await self.fetch(job.url)
+
+        html = result.html if result.status == "fetched" else stored_html
+        attached = False
+        if html is not None:
+            prepared = await asyncio.to_thread(
+                prepare_html, html, policy=self.slim_policy, fingerprint=self.fingerprint
+            )
+            attached = await db.attach_fetched_html(
+                user_id=job.user_id,
+                bookmark_id=job.bookmark_id,
+                html=prepared.html,
+                html_original_bytes=prepared.original_bytes,
+                html_bytes=prepared.html_bytes,
+                simhash=prepared.simhash,
+            )
+        stored = attached and result.status == "fetched"
+        await db.record_page_fetch(
+            url=job.url,
+            status=result.status,
+            http_status=result.http_status,
+            etag=result.etag if stored else None,
+            last_modified=result.last_modified if stored else None,
+            bookmark_id=job.bookmark_id if stored else None,
+        )
+        return result
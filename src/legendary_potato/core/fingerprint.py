@@ -0,0 +1,121 @@
+import html as html_lib
+import re
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # optional: falls back to an equivalent pure-Python loop
+    np = None
+
+__all__ = [
+    "SIMHASH_BITS",
+    "LSH_BANDS",
+    "MAX_DISTANCE",
+    "page_text",
+    "simhash",
+    "simhash_bands",
+    "hamming",
+    "to_signed64",
+]
+
+
+SIMHASH_BITS = 64
+# 4 bands of 16 bits: by pigeonhole, any two fingerprints within 3 bits of
+# each other agree exactly on at least one band.
+LSH_BANDS = 4
+BAND_BITS = SIMHASH_BITS // LSH_BANDS
+MAX_DISTANCE = LSH_BANDS - 1
+
+SHINGLE_WORDS = 4
+
+_MASK64 = (1 << 64) - 1
+_PRIME = 0x100000001B3  # FNV-64 prime, used as the shingle polynomial base
+
+_INVISIBLE_RE = re.compile(
+    r"<(script|style|noscript|svg|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+_WORD_RE = re.compile(r"\w+")
+
+
+def page_text(html: str) -> str:
+    text = _TAG_RE.sub(" ", _INVISIBLE_RE.sub(" ", html))
+    return html_lib.unescape(text).lower()
+
+
+def _mix64(x: int) -> int:
+    # splitmix64 finalizer; spreads polynomial hashes over all 64 bits.
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _simhash_numpy(token_ids: list[int]) -> int:
+    tokens = np.asarray(token_ids, dtype=np.uint64)
+    n = len(tokens) - SHINGLE_WORDS + 1
+    h = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(SHINGLE_WORDS):
+            h = h * np.uint64(_PRIME) + tokens[j : j + n]
+        h = np.unique(h)
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+
+    bits = np.unpackbits(h.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    ones = bits.sum(axis=0, dtype=np.int64)
+    out = 0
+    for i in np.flatnonzero(ones * 2 > len(h)):
+        out |= 1 << int(i)
+    return out
+
+
+def _simhash_python(token_ids: list[int]) -> int:
+    shingles = set()
+    for i in range(len(token_ids) - SHINGLE_WORDS + 1):
+        h = 0
+        for t in token_ids[i : i + SHINGLE_WORDS]:
+            h = (h * _PRIME + t) & _MASK64
+        shingles.add(h)
+
+    counts = [0] * SIMHASH_BITS
+    for h in shingles:
+        h = _mix64(h)
+        for i in range(SIMHASH_BITS):
+            counts[i] += (h >> i) & 1
+    out = 0
+    for i, c in enumerate(counts):
+        if c * 2 > len(shingles):
+            out |= 1 << i
+    return out
+
+
+def simhash(html: str) -> int | None:
+    """
+    64-bit SimHash over word 4-shingles of the visible page text.
+
+    Returns None for pages with too little text to fingerprint. CPU-bound;
+    run off the event loop.
+    """
+    token_ids = [zlib.crc32(w.encode("utf-8")) for w in _WORD_RE.findall(page_text(html))]
+    if len(token_ids) < SHINGLE_WORDS:
+        return None
+    if np is not None:
+        return _simhash_numpy(token_ids)
+    return _simhash_python(token_ids)
+
+
+def simhash_bands(value: int) -> list[int]:
+    value &= _MASK64
+    return [(value >> (BAND_BITS * b)) & ((1 << BAND_BITS) - 1) for b in range(LSH_BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK64).bit_count()
+
+
+def to_signed64(value: int) -> int:
+    """Postgres `bigint` is signed; store the same 64 bits."""
+    return value - (1 << 64) if value >= 1 << 63 else value
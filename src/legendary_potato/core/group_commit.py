@@ -0,0 +1,103 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+
+__all__ = ["GroupCommit"]
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Writes a whole batch; returns one result or exception per item, in order.
+Flush = Callable[[list], Awaitable[list]]
+
+
+@dataclass
+class _Batch(Generic[T]):
+    flush: Flush
+    items: list[T] = field(default_factory=list)
+    futures: list[asyncio.Future] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+
+@dataclass
+class GroupCommit(Generic[T, R]):
+    """
+    Coalesces concurrent writes into one transaction (group commit).
+
+    Notes:
+    - A write waits at most `window_seconds` for others to join its batch; a
+      batch of `max_batch` is flushed at once.
+    - With `direct_when_idle`, a write that finds nothing pending or in flight
+      skips the window and runs directly, so a quiet server pays no latency.
+    - Each caller gets its own result or exception: `flush` reports per item.
+    - Every `submit` must pass the same `flush`; a batch uses its opener's.
+    """
+
+    window_seconds: float = 0.002
+    max_batch: int = 64
+    direct_when_idle: bool = True
+    in_flight: int = 0
+    _batch: _Batch | None = field(default=None, repr=False)
+    _flushes: set[asyncio.Task] = field(default_factory=set, repr=False)
+
+    async def submit(
+        self, item: T, *, flush: Flush, direct: Callable[[], Awaitable[R]]
+    ) -> R:
+        if self.direct_when_idle and self._batch is None and self.in_flight == 0:
+            self.in_flight += 1
+            try:
+                return await direct()
+            finally:
+                self.in_flight -= 1
+
+        batch = self._batch
+        if batch is None:
+            batch = self._batch = _Batch(flush)
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.window_seconds, self._flush, batch
+            )
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.max_batch:
+            self._flush(batch)
+        # Shielded: a caller that goes away must not take the batch with it.
+        return await asyncio.shield(future)
+
+    def _flush(self, batch: _Batch) -> None:
+        if self._batch is not batch:
+            return  # already flushed by size
+        self._batch = None
+        batch.timer.cancel()
+        self.in_flight += 1
+        task = asyncio.create_task(self._run(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, batch: _Batch) -> None:
+        try:
+            results = await batch.flush(batch.items)
+        except asyncio.CancelledError:
+            for future in batch.futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            results = [e] * len(batch.items)
+        finally:
+            self.in_flight -= 1
+        for future, result in zip(batch.futures, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+                future.exception()  # retrieved even if its caller went away
+            else:
+                future.set_result(result)
+
+    async def drain(self) -> None:
+        """Flushes the open batch and waits for every flush in flight."""
+        if self._batch is not None:
+            self._flush(self._batch)
+        await asyncio.gather(*self._flushes, return_exceptions=True)
@@ -0,0 +1,155 @@
+import re
+from dataclasses import dataclass
+
+__all__ = ["SlimPolicy", "SlimResult", "slim_html"]
+
+
+_SCRIPT_RE = re.compile(r"<script\b([^>]*)>.*?</script\s*>", re.IGNORECASE | re.DOTALL)
+_STYLE_RE = re.compile(r"<style\b[^>]*>.*?</style\s*>", re.IGNORECASE | re.DOTALL)
+_SVG_TAG_RE = re.compile(r"<(/?)svg\b([^>]*)>", re.IGNORECASE)
+# What a sprite sheet holds besides whitespace: definitions, never drawn as is.
+_SVG_DEFINITION_RE = re.compile(
+    r"<(symbol|defs|title)\b[^>]*>.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL
+)
+_DATA_URI_RE = re.compile(r"""(?<=["'(=])\s*data:[^"')\s>]*""", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+))?""")
+_HIDDEN_STYLE_RE = re.compile(
+    r"(?<![\w-])(?:display\s*:\s*none|visibility\s*:\s*hidden)\b", re.IGNORECASE
+)
+_JSON_LD_RE = re.compile(r"""type\s*=\s*["']?application/ld\+json""", re.IGNORECASE)
+
+# Smallest valid data URI; keeps the surrounding attribute well formed.
+_EMPTY_DATA_URI = "data:,"
+
+
+@dataclass(frozen=True)
+class SlimPolicy:
+    """
+    What to remove from captured HTML before it is persisted.
+
+    Notes:
+    - Regex based: we only drop well-delimited blocks, we never build a DOM.
+    - JSON-LD `<script>` blocks are kept; they carry page metadata, not code.
+    - `data:` URIs shorter than `data_uri_min_bytes` (icons, spacers) are kept.
+    """
+
+    strip_scripts: bool = True
+    strip_styles: bool = True
+    strip_svg_sprites: bool = True
+    strip_data_uris: bool = True
+    data_uri_min_bytes: int = 1024
+
+    @classmethod
+    def from_names(cls, names: list[str], *, data_uri_min_bytes: int = 1024) -> "SlimPolicy":
+        known = {"scripts", "styles", "svg_sprites", "data_uris"}
+        unknown = set(names) - known
+        if unknown:
+            raise ValueError(f"Unknown HTML slim option(s): {', '.join(sorted(unknown))}")
+        return cls(
+            strip_scripts="scripts" in names,
+            strip_styles="styles" in names,
+            strip_svg_sprites="svg_sprites" in names,
+            strip_data_uris="data_uris" in names,
+            data_uri_min_bytes=data_uri_min_bytes,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            self.strip_scripts
+            or self.strip_styles
+            or self.strip_svg_sprites
+            or self.strip_data_uris
+        )
+
+
+@dataclass(frozen=True)
+class SlimResult:
+    html: str
+    original_bytes: int
+    slimmed_bytes: int
+
+
+def _drop_script(m: re.Match) -> str:
+    return m.group(0) if _JSON_LD_RE.search(m.group(1)) else ""
+
+
+def _is_hidden(attrs: str) -> bool:
+    """
+    Whether attributes really hide the element: `hidden`, display:none,
+    visibility:hidden or a zero `width`/`height`. Class names like `hidden-sm`,
+    `overflow:hidden` and `aria-hidden` (decorative, still visible) do not count.
+    """
+    for m in _ATTR_RE.finditer(attrs):
+        name = m.group(1).lower()
+        value = (m.group(2) or "").strip("\"'")
+        if name == "hidden":
+            return True
+        if name == "style" and _HIDDEN_STYLE_RE.search(value):
+            return True
+        if name in ("width", "height") and value.strip() == "0":
+            return True
+    return False
+
+
+def _is_sprite_sheet(attrs: str, body: str) -> bool:
+    """An `aria-hidden` SVG that only defines symbols for `<use>` elsewhere."""
+    aria_hidden = any(
+        m.group(1).lower() == "aria-hidden" and (m.group(2) or "").strip("\"'") == "true"
+        for m in _ATTR_RE.finditer(attrs)
+    )
+    return aria_hidden and not _SVG_DEFINITION_RE.sub("", body).strip()
+
+
+def _strip_hidden_svgs(html: str) -> str:
+    """
+    Drop outermost `<svg>` elements whose root is hidden or a sprite sheet.
+    Nested `<svg>`s are matched by depth, so the whole element goes or stays.
+    """
+    parts = []
+    last = depth = 0
+    start = body_start = 0
+    root_attrs = ""
+    for m in _SVG_TAG_RE.finditer(html):
+        closing, attrs = m.group(1), m.group(2)
+        if not closing:
+            if attrs.rstrip().endswith("/"):
+                continue
+            if depth == 0:
+                start, body_start, root_attrs = m.start(), m.end(), attrs
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0 and (
+                _is_hidden(root_attrs)
+                or _is_sprite_sheet(root_attrs, html[body_start:m.start()])
+            ):
+                parts.append(html[last:start])
+                last = m.end()
+    if not parts:
+        return html
+    parts.append(html[last:])
+    return "".join(parts)
+
+
+def slim_html(html: str, policy: SlimPolicy) -> SlimResult:
+    """
+    CPU-bound; call through `run_in_threadpool` from request handlers.
+    """
+    original_bytes = len(html.encode("utf-8"))
+    out = html
+    if policy.strip_scripts:
+        out = _SCRIPT_RE.sub(_drop_script, out)
+    if policy.strip_styles:
+        out = _STYLE_RE.sub("", out)
+    if policy.strip_svg_sprites:
+        out = _strip_hidden_svgs(out)
+    if policy.strip_data_uris:
+        min_len = int(policy.data_uri_min_bytes)
+        out = _DATA_URI_RE.sub(
+            lambda m: _EMPTY_DATA_URI if len(m.group(0)) >= min_len else m.group(0),
+            out,
+        )
+
+    slimmed_bytes = original_bytes if out is html else len(out.encode("utf-8"))
+    return SlimResult(html=out, original_bytes=original_bytes, slimmed_bytes=slimmed_bytes)
@@ -0,0 +1,65 @@
+import asyncio
+import re
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+__all__ = ["IDEMPOTENCY_HEADER", "InFlightRequests", "valid_idempotency_key"]
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Visible ASCII only, like the IETF draft's examples (UUIDs, ULIDs, random tokens).
+_KEY_RE = re.compile(r"[\x21-\x7e]{1,255}")
+
+T = TypeVar("T")
+
+
+def valid_idempotency_key(key: str) -> bool:
+    return _KEY_RE.fullmatch(key) is not None
+
+
+@dataclass
+class InFlightRequests:
+    """
+    Coalesces concurrent requests that carry the same idempotency key.
+
+    Notes:
+    - Per-process. Duplicates that reach other processes are settled by the
+      `idempotency_keys` primary key instead.
+    - The first request runs; the others wait for its result. If it fails or is
+      cancelled (the client went away), the next waiter runs instead.
+    """
+
+    pending: dict[tuple[uuid.UUID, str], asyncio.Future] = field(default_factory=dict)
+
+    async def run(
+        self, *, user_id: uuid.UUID, key: str, call: Callable[[], Awaitable[T]]
+    ) -> T:
+        slot = (user_id, key)
+        while (leader := self.pending.get(slot)) is not None:
+            try:
+                return await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise  # this request was cancelled, not the leader
+            except Exception:
+                pass
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[slot] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved: there may be no waiters
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self.pending[slot]
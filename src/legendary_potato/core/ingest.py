@@ -0,0 +1,39 @@
+import hashlib
+from dataclasses import dataclass
+
+from .fingerprint import simhash, to_signed64
+from .html_slim import SlimPolicy, slim_html
+
+__all__ = ["PreparedHtml", "prepare_html"]
+
+
+@dataclass(frozen=True)
+class PreparedHtml:
+    html: str
+    original_bytes: int
+    html_bytes: int
+    simhash: int | None  # signed, as stored in Postgres
+    original_sha256: bytes  # of the captured page, for `POST /bookmarks/precheck`
+
+
+def prepare_html(html: str, *, policy: SlimPolicy, fingerprint: bool) -> PreparedHtml:
+    """
+    Every CPU-bound step between a captured page and the row we store.
+
+    Call through `run_in_threadpool`; one hop covers all stages.
+    """
+    original_sha256 = hashlib.sha256(html.encode("utf-8")).digest()
+    if policy.enabled:
+        slimmed = slim_html(html, policy)
+        html, original_bytes, html_bytes = slimmed.html, slimmed.original_bytes, slimmed.slimmed_bytes
+    else:
+        original_bytes = html_bytes = len(html.encode("utf-8"))
+
+    value = simhash(html) if fingerprint else None
+    return PreparedHtml(
+        html=html,
+        original_bytes=original_bytes,
+        html_bytes=html_bytes,
+        simhash=to_signed64(value) if value is not None else None,
+        original_sha256=original_sha256,
+    )
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from dc_logger import get_logger
+
+from .config import app_config
+from .db import create_db
+
+__all__ = ["run_periodically", "main"]
+
+
+logger = get_logger()
+
+
+async def run_periodically(
+    job: Callable[[], Awaitable[object]],
+    *,
+    interval_seconds: float,
+    name: str,
+) -> None:
+    """
+    Runs `job` every `interval_seconds` until cancelled; failures are logged
+    and retried on the next tick.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            result = await job()
+            await logger.info(f"{name} finished: {result}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await logger.warning(f"{name} failed: {e}")
+
+
+async def _run_command(args: argparse.Namespace) -> None:
+    if not app_config.database_url:
+        raise SystemExit("DATABASE_URL is not configured")
+    db = await create_db(app_config.database_url)
+    try:
+        if args.command == "ensure-partitions":
+            created = await db.ensure_bookmark_partitions(months_ahead=args.months_ahead)
+            print(f"created {created} bookmark partition(s)")
+        elif args.command == "reconcile-stats":
+            reconciled = await db.reconcile_bookmark_stats()
+            if reconciled is None:
+                raise SystemExit("another process is reconciling bookmark stats")
+            print(f"reconciled bookmark stats for {reconciled} user(s)")
+    finally:
+        await db.close()
+
+
+def main() -> None:
+    """
+    Out-of-band maintenance, e.g. from cron when app instances may be down:
+
+        python -m legendary_potato.core.maintenance ensure-partitions --months-ahead 6
+        python -m legendary_potato.core.maintenance reconcile-stats
+    """
+    parser = argparse.ArgumentParser(prog="python -m legendary_potato.core.maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    partitions = commands.add_parser("ensure-partitions", help="create upcoming bookmark partitions")
+    partitions.add_argument("--months-ahead", type=int, default=app_config.partition_months_ahead)
+    commands.add_parser("reconcile-stats", help="rebuild bookmark_stats aggregates")
+    asyncio.run(_run_command(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
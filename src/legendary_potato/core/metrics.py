@@ -0,0 +1,42 @@
+from dataclasses import dataclass, field
+
+__all__ = ["Metrics"]
+
+
+_Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@dataclass
+class Metrics:
+    """
+    In-memory counters, served in the Prometheus text format by `GET /metrics`.
+
+    Notes:
+    - Per-process, like `RateLimiter`; scrape every instance and sum.
+    - Counters only go up and reset when the process restarts.
+    """
+
+    counters: dict[str, dict[_Labels, float]] = field(default_factory=dict)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def value(self, name: str, **labels: str) -> float:
+        return self.counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> str:
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(series.items()):
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                suffix = f"{{{label_text}}}" if labels else ""
+                number = int(value) if value == int(value) else value
+                lines.append(f"{name}{suffix} {number}")
+        return "\n".join(lines) + "\n"
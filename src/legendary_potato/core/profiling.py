@@ -0,0 +1,225 @@
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from types import FrameType
+
+__all__ = ["PROFILE_HEADER", "PROFILE_ID_HEADER", "Profiler", "ProfilingMiddleware"]
+
+
+# A request carrying the admin token in this header is always profiled.
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Where a suspended request is waiting, by the files on its await chain.
+_WAIT_KINDS = (
+    ("asyncpg", f"{os.sep}asyncpg{os.sep}"),
+    ("threadpool", os.path.join("anyio", "to_thread.py")),
+)
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_qualname}".replace(";", ":")
+
+
+def _stack(coro, thread_frame: FrameType | None) -> tuple[str, ...] | None:
+    """
+    One sample of a request's coroutine: ("cpu", frames...) while it runs on the
+    event loop thread, or (wait kind, frames...) along its await chain while
+    it is suspended. None when it moved on between the two reads.
+    """
+    if coro.cr_running:
+        root = coro.cr_frame
+        frames = []
+        frame = thread_frame
+        while frame is not None:
+            frames.append(frame)
+            if frame is root:
+                return ("cpu", *(_label(f) for f in reversed(frames)))
+            frame = frame.f_back
+        return None
+
+    labels = []
+    kind = "await"
+    awaitable = coro
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            break  # a Future or a C awaitable: the end of the chain
+        labels.append(_label(frame))
+        for name, marker in _WAIT_KINDS:
+            if kind == "await" and marker in frame.f_code.co_filename:
+                kind = name
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return (kind, *labels) if labels else None
+
+
+@dataclass(eq=False)
+class _Session:
+    coro: object
+    thread_id: int
+    request_id: str | None
+    samples: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class Profiler:
+    """
+    Wall-clock sampling profiler for in-flight requests, aggregated per route.
+
+    Notes:
+    - A background thread samples only while a profiled request is in flight;
+      otherwise it sleeps, so an unsampled request costs a header lookup and a
+      `random()` call.
+    - Each sample is split by what the request was doing: `[cpu]` (running on
+      the event loop thread), `[asyncpg]` (awaiting a connection or a query),
+      `[threadpool]` (awaiting a sync dependency) or `[await]` (anything else,
+      including time queued behind other requests' CPU).
+    - Work a request hands to another task (a group-commit flush, a streaming
+      body) shows up as `[await]` at the hand-off.
+    - Per-process, like `Metrics`.
+    """
+
+    interval_seconds: float = 0.005
+    sample_rate: float = 0.0
+    admin_token: str | None = None
+    max_stacks_per_route: int = 5_000
+    max_flagged: int = 32
+    routes: dict[str, Counter] = field(default_factory=dict)
+    flagged: OrderedDict[str, Counter] = field(default_factory=OrderedDict)
+    _sessions: list[_Session] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _wake: threading.Event = field(default_factory=threading.Event, repr=False)
+    _thread: threading.Thread | None = field(default=None, repr=False)
+    _stopping: bool = False
+
+    def start(self) -> None:
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_admin(self, token: str | None) -> bool:
+        return bool(self.admin_token and token) and secrets.compare_digest(
+            token.encode(), self.admin_token.encode()
+        )
+
+    def begin(self, coro, *, flagged: bool) -> _Session:
+        session = _Session(
+            coro, threading.get_ident(), request_id=str(uuid.uuid4()) if flagged else None
+        )
+        with self._lock:
+            self._sessions.append(session)
+        self._wake.set()
+        return session
+
+    def end(self, session: _Session, *, route: str) -> None:
+        with self._lock:
+            self._sessions.remove(session)
+            stacks = self.routes.setdefault(route, Counter())
+            for stack, count in session.samples.items():
+                key = (route, *stack)
+                if key not in stacks and len(stacks) >= self.max_stacks_per_route:
+                    key = (route, stack[0], "[truncated]")
+                stacks[key] += count
+            if session.request_id is not None:
+                self.flagged[session.request_id] = Counter(
+                    {(route, *stack): n for stack, n in session.samples.items()}
+                )
+                while len(self.flagged) > self.max_flagged:
+                    self.flagged.popitem(last=False)
+
+    def collapsed(self, *, route: str | None = None, request_id: str | None = None) -> str:
+        """Samples in the collapsed-stack format read by flamegraph.pl and speedscope."""
+        with self._lock:
+            if request_id is not None:
+                stacks = Counter(self.flagged.get(request_id, {}))
+            else:
+                stacks = Counter()
+                for name, counts in self.routes.items():
+                    if route is None or name == route:
+                        stacks.update(counts)
+        lines = []
+        for stack, count in sorted(stacks.items()):
+            route_name, kind, *frames = stack
+            lines.append(";".join([route_name, f"[{kind}]", *frames]) + f" {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def reset(self) -> None:
+        with self._lock:
+            self.routes.clear()
+            self.flagged.clear()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            with self._lock:
+                sessions = list(self._sessions)
+            if not sessions:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            stacks = [(s, _stack(s.coro, frames.get(s.thread_id))) for s in sessions]
+            del frames
+            with self._lock:
+                live = set(map(id, self._sessions))
+                for session, stack in stacks:
+                    # `end` may have folded the session in while it was sampled.
+                    if stack is not None and id(session) in live:
+                        session.samples[stack] += 1
+            time.sleep(self.interval_seconds)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles sampled requests and requests flagged with
+    the admin token in `X-Profile-Token`.
+
+    Install it inside the other middleware so samples start at the routes. A
+    flagged request's response carries `X-Profile-Id` for `GET /debug/profile`.
+    """
+
+    def __init__(self, app, *, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profiler = self.profiler
+        token = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                token = value.decode("latin-1")
+                break
+        flagged = token is not None and profiler.is_admin(token)
+        if not flagged and not (profiler.sample_rate and random.random() < profiler.sample_rate):
+            return await self.app(scope, receive, send)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile_id = (b"x-profile-id", session.request_id.encode())
+                message = {**message, "headers": [*message.get("headers", []), profile_id]}
+            await send(message)
+
+        coro = self.app(scope, receive, send_with_id if flagged else send)
+        session = profiler.begin(coro, flagged=flagged)
+        try:
+            await coro
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            profiler.end(session, route=f"{scope['method']} {path}")
@@ -25,3 +25,9 @@ class RateLimiter:
         self.buckets[key] = (count, reset_at)
         return count <= limit
 
+    def refund(self, *, key: str) -> None:
+        """Gives back one allowed call that turned out not to need the limit."""
+        count, reset_at = self.buckets.get(key, (0, 0.0))
+        if count > 0 and time.time() < reset_at:
+            self.buckets[key] = (count - 1, reset_at)
+
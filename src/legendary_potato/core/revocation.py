@@ -0,0 +1,44 @@
+import json
+import uuid
+from dataclasses import dataclass, field
+
+__all__ = ["REVOCATION_CHANNEL", "TokenRevocations"]
+
+
+REVOCATION_CHANNEL = "token_revocations"
+
+
+@dataclass
+class TokenRevocations:
+    """
+    Per-process map of user id -> current access-token generation.
+
+    Notes:
+    - Only users that have revoked at least once are held; everyone else is at 0.
+    - Filled from `Db.load_token_generations` at startup and after the LISTEN
+      connection reconnects, and kept current by `token_revocations` NOTIFYs.
+    - Generations only move forward, so a late or repeated NOTIFY is harmless.
+    """
+
+    generations: dict[uuid.UUID, int] = field(default_factory=dict)
+
+    def generation(self, user_id: uuid.UUID) -> int:
+        return self.generations.get(user_id, 0)
+
+    def is_revoked(self, user_id: uuid.UUID, generation: int) -> bool:
+        return generation < self.generations.get(user_id, 0)
+
+    def apply(self, user_id: uuid.UUID, generation: int) -> None:
+        if generation > self.generations.get(user_id, 0):
+            self.generations[user_id] = generation
+
+    def load(self, generations: dict[uuid.UUID, int]) -> None:
+        for user_id, generation in generations.items():
+            self.apply(user_id, generation)
+
+    def on_notify(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+            self.apply(uuid.UUID(event["user_id"]), int(event["generation"]))
+        except (KeyError, TypeError, ValueError):
+            return
@@ -1,15 +1,31 @@
 import time
 import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
 
 import jwt
 from jwt import InvalidTokenError
 
 from .config import app_config
 
-__all__ = ["create_access_token", "verify_access_token"]
+__all__ = [
+    "AccessClaims",
+    "VerifiedTokenCache",
+    "create_access_token",
+    "decode_access_token",
+    "verify_access_token",
+]
 
 
-def create_access_token(*, user_id: uuid.UUID) -> str:
+@dataclass(frozen=True)
+class AccessClaims:
+    user_id: uuid.UUID
+    # Tokens issued before generations existed have no `gen` claim and count as 0.
+    generation: int
+    expires_at: int
+
+
+def create_access_token(*, user_id: uuid.UUID, generation: int = 0) -> str:
     if not app_config.api_jwt_secret:
         raise RuntimeError("API_JWT_SECRET is not configured")
 
@@ -20,11 +36,12 @@ def create_access_token(*, user_id: uuid.UUID) -> str:
         "iat": now,
         "exp": now + int(app_config.api_jwt_ttl_seconds),
         "typ": "access",
+        "gen": int(generation),
     }
     return jwt.encode(payload, app_config.api_jwt_secret, algorithm="HS256")
 
 
-def verify_access_token(token: str) -> uuid.UUID:
+def decode_access_token(token: str) -> AccessClaims:
     if not app_config.api_jwt_secret:
         raise RuntimeError("API_JWT_SECRET is not configured")
 
@@ -37,5 +54,49 @@ def verify_access_token(token: str) -> uuid.UUID:
     )
     if payload.get("typ") != "access":
         raise InvalidTokenError("Invalid token type")
-    return uuid.UUID(str(payload["sub"]))
+    generation = payload.get("gen", 0)
+    if not isinstance(generation, int):
+        raise InvalidTokenError("Invalid token generation")
+    return AccessClaims(
+        user_id=uuid.UUID(str(payload["sub"])),
+        generation=generation,
+        expires_at=int(payload["exp"]),
+    )
+
+
+def verify_access_token(token: str) -> uuid.UUID:
+    return decode_access_token(token).user_id
+
+
+@dataclass
+class VerifiedTokenCache:
+    """
+    LRU map of access tokens that already passed `decode_access_token`.
+
+    Notes:
+    - Keyed by the complete token string, signature included, so a token only
+      hits when it is byte for byte one this process verified. A forged or
+      altered token always misses and goes through full verification.
+    - Entries are dropped once past their `exp`; revocation is not cached and
+      is still checked against the claims on every request.
+    - Per-process and not thread-safe; use from the event loop. `max_entries=0`
+      disables caching.
+    """
+
+    max_entries: int = 10_000
+    entries: OrderedDict[str, AccessClaims] = field(default_factory=OrderedDict, repr=False)
+
+    def decode(self, token: str) -> AccessClaims:
+        claims = self.entries.get(token)
+        if claims is not None:
+            if claims.expires_at > time.time():
+                self.entries.move_to_end(token)
+                return claims
+            del self.entries[token]
 
+        claims = decode_access_token(token)
+        if self.max_entries > 0:
+            self.entries[token] = claims
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return claims
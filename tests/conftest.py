@@ -0,0 +1,5 @@
+import os
+
+# core.config reads these at import time; any value will do for the tests.
+for _key in ("GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "STARLET_SECRET_KEY", "API_JWT_SECRET"):
+    os.environ.setdefault(_key, "test")
@@ -0,0 +1,203 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+
+from starlette.testclient import TestClient
+
+from tests.pg_plans import TEST_DATABASE_URL, requires_db
+
+from src.legendary_potato.app.main import app
+from src.legendary_potato.core.admission import (
+    AdmissionControl,
+    Budget,
+    CircuitBreaker,
+    Overloaded,
+)
+from src.legendary_potato.core.config import app_config
+from src.legendary_potato.core.db import Db, create_db
+from src.legendary_potato.core.tokens import create_access_token
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def execute(self, query, *args):
+        self.pool.executed.append(query)
+        if self.pool.fail_with is not None:
+            raise self.pool.fail_with
+        return "OK"
+
+
+class FakePool:
+    def __init__(self):
+        self.executed: list[str] = []
+        self.acquired = 0
+        self.fail_with: BaseException | None = None
+        self.exhausted = False
+
+    @asynccontextmanager
+    async def acquire(self, *, timeout=None):
+        if self.exhausted:
+            raise asyncio.TimeoutError()
+        self.acquired += 1
+        yield FakeConnection(self)
+
+
+def _admission(*, concurrency=1, max_queue=1, failures=2, reset_seconds=60.0):
+    return AdmissionControl(
+        budgets={
+            op: Budget(
+                op,
+                concurrency=concurrency,
+                max_queue=max_queue,
+                acquire_timeout=0.2,
+                statement_timeout_ms=1234,
+            )
+            for op in ("read", "write", "auth")
+        },
+        breaker=CircuitBreaker(failure_threshold=failures, reset_seconds=reset_seconds),
+    )
+
+
+def test_queue_full_is_shed_without_waiting():
+    async def main():
+        admission, pool = _admission(), FakePool()
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.connection(pool, "write"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(Overloaded, match="queue full"):
+            async with admission.connection(pool, "write"):
+                pass
+        # Other budgets are unaffected by a saturated write budget.
+        async with admission.connection(pool, "auth"):
+            pass
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        # The statement timeout is set when a budget's pool connects, not per use.
+        assert pool.executed == []
+
+    asyncio.run(main())
+
+
+def test_exports_are_capped_without_holding_read_slots():
+    async def main():
+        admission, pool = AdmissionControl(), FakePool()
+        release = asyncio.Event()
+
+        async def export():
+            async with admission.connection(pool, "export"):
+                await release.wait()
+
+        downloads = [asyncio.create_task(export()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        # No queue: a third export is refused up front rather than waiting.
+        with pytest.raises(Overloaded, match="export queue full"):
+            admission.check("export")
+        async with admission.connection(pool, "read"):
+            pass
+
+        release.set()
+        await asyncio.gather(*downloads)
+        admission.check("export")
+
+    asyncio.run(main())
+
+
+def test_breaker_opens_then_recovers_through_a_trial_call():
+    async def main():
+        admission, pool = _admission(failures=2, reset_seconds=60.0), FakePool()
+        pool.fail_with = ConnectionResetError()
+        for _ in range(2):
+            with pytest.raises(Overloaded):
+                async with admission.connection(pool, "read") as conn:
+                    await conn.execute("SELECT 1")
+        assert admission.breaker.state == "open"
+
+        acquired = pool.acquired
+        with pytest.raises(Overloaded, match="circuit open") as exc:
+            async with admission.connection(pool, "read"):
+                pass
+        assert pool.acquired == acquired
+        assert exc.value.retry_after > 1
+
+        admission.breaker.opened_at -= 60
+        pool.fail_with = None
+        async with admission.connection(pool, "read"):
+            pass
+        assert admission.breaker.state == "closed"
+
+    asyncio.run(main())
+
+
+def test_pool_contention_sheds_without_opening_the_breaker():
+    async def main():
+        admission, shared = _admission(failures=1), FakePool()
+        own = admission.budgets["read"].pool = FakePool()
+        async with admission.connection(shared, "read"):
+            pass
+        assert (own.acquired, shared.acquired) == (1, 0)
+
+        own.exhausted = True
+        with pytest.raises(Overloaded, match="read pool timeout"):
+            async with admission.connection(shared, "read"):
+                pass
+        assert admission.breaker.state == "closed" and admission.breaker.failures == 0
+
+    asyncio.run(main())
+
+
+async def _statement_timeouts() -> dict[str, str]:
+    db = await create_db(TEST_DATABASE_URL)
+    try:
+        timeouts = {}
+        for op in ("read", "write"):
+            async with db._connection(op) as conn:
+                timeouts[op] = await conn.fetchval("SHOW statement_timeout")
+        async with db.pool.acquire() as conn:
+            timeouts["maintenance"] = await conn.fetchval("SHOW statement_timeout")
+    finally:
+        await db.close()
+    return timeouts
+
+
+@requires_db
+def test_each_budget_pool_connects_with_its_statement_timeout(monkeypatch):
+    monkeypatch.setattr(app_config, "db_statement_timeout_ms", 4_000)
+    monkeypatch.setattr(app_config, "db_write_statement_timeout_ms", 12_000)
+    assert asyncio.run(_statement_timeouts()) == {
+        "read": "4s", "write": "12s", "maintenance": "0",
+    }
+
+
+def test_api_answers_503_with_retry_after():
+    admission = _admission(failures=1)
+    admission.breaker.record_failure()
+    app.state.db = Db(pool=FakePool(), admission=admission)
+    try:
+        client = TestClient(app)
+        token = create_access_token(user_id=uuid.uuid4())
+        res = client.get("/bookmarks", headers={"Authorization": f"Bearer {token}"})
+        assert res.status_code == 503
+        assert int(res.headers["Retry-After"]) >= 1
+
+        # Saves are shed before their body is read, inside CORS so the
+        # extension can still see the 503.
+        origin = "chrome-extension://abc"
+        for path in ("/bookmarks", "/bookmarks/precheck"):
+            res = client.post(path, content=b"not json", headers={"Origin": origin})
+            assert res.status_code == 503
+            assert res.headers["Access-Control-Allow-Origin"] == origin
+    finally:
+        del app.state.db
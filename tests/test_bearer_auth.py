@@ -0,0 +1,102 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from jwt import InvalidTokenError
+
+from fastapi import Depends, FastAPI
+from starlette.testclient import TestClient
+
+from tests.pg_plans import TEST_DATABASE_URL, migrated_db, requires_db
+
+from src.legendary_potato.api.dependencies import get_bearer_user_id
+from src.legendary_potato.core.events import EventHub
+from src.legendary_potato.core.revocation import REVOCATION_CHANNEL, TokenRevocations
+from src.legendary_potato.core.tokens import (
+    AccessClaims,
+    VerifiedTokenCache,
+    create_access_token,
+)
+
+
+def test_older_generations_are_rejected_without_db():
+    app = FastAPI()
+
+    @app.get("/whoami")
+    def whoami(user_id=Depends(get_bearer_user_id)):
+        return {"user_id": str(user_id)}
+
+    app.state.revocations = TokenRevocations()
+    client = TestClient(app)
+    user_id = uuid.uuid4()
+    old = create_access_token(user_id=user_id)
+
+    def call(token: str) -> int:
+        return client.get("/whoami", headers={"Authorization": f"Bearer {token}"}).status_code
+
+    assert call(old) == 200
+    app.state.revocations.on_notify(f'{{"user_id": "{user_id}", "generation": 1}}')
+    assert call(old) == 401
+    assert call(create_access_token(user_id=user_id, generation=1)) == 200
+    # Other users and late, out-of-order notifications are unaffected.
+    assert call(create_access_token(user_id=uuid.uuid4())) == 200
+    app.state.revocations.apply(user_id, 0)
+    assert call(old) == 401
+
+
+async def _revoke_round_trip() -> tuple[int, int, TokenRevocations, TokenRevocations]:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="revoke", email=None, name=None, avatar_url=None
+        )
+        await db.issue_refresh_token(user_id=user_id)
+        # Another process: listens, then loads.
+        other = TokenRevocations()
+        hub = EventHub(TEST_DATABASE_URL)
+        hub.listen(REVOCATION_CHANNEL, other.on_notify)
+        await hub.start()
+        try:
+            count, generation = await db.revoke_tokens_for_user(user_id=user_id)
+            for _ in range(100):
+                if other.generation(user_id):
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await hub.stop()
+        restarted = TokenRevocations()
+        restarted.load(await db.load_token_generations())
+        # New tokens are stamped from the database, whatever this process has heard.
+        refresh_token, issued = await db.issue_refresh_token(user_id=user_id)
+        _, _, rotated = await db.rotate_refresh_token(refresh_token=refresh_token)
+    return count, generation, other, restarted, (issued, rotated)
+
+
+@requires_db
+def test_revoke_reaches_other_processes():
+    count, generation, other, restarted, stamped = asyncio.run(_revoke_round_trip())
+    assert count == 1 and generation == 1
+    assert stamped == (1, 1)
+    assert list(other.generations.values()) == [1]
+    assert restarted.generations == other.generations
+
+
+def test_token_cache_only_hits_on_the_exact_verified_token():
+    cache = VerifiedTokenCache(max_entries=2)
+    user_id = uuid.uuid4()
+    token = create_access_token(user_id=user_id)
+    assert cache.decode(token).user_id == user_id
+
+    header, payload, signature = token.split(".")
+    forged = f"{header}.{payload}.{signature[:-4]}AAAA"
+    with pytest.raises(InvalidTokenError):
+        cache.decode(forged)
+    assert list(cache.entries) == [token]
+
+    # An entry past its `exp` is not served; the token is verified again.
+    cache.entries[token] = AccessClaims(uuid.uuid4(), 0, int(time.time()) - 1)
+    assert cache.decode(token).user_id == user_id
+
+    for _ in range(2):
+        cache.decode(create_access_token(user_id=uuid.uuid4()))
+    assert token not in cache.entries and len(cache.entries) == 2
@@ -0,0 +1,67 @@
+import asyncio
+import dataclasses
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.api.routes import bookmarks
+from src.legendary_potato.core.blobs import FilesystemBlobStore
+from src.legendary_potato.core.tokens import create_access_token
+
+
+def test_filesystem_blob_round_trip(tmp_path: Path):
+    async def main():
+        store = FilesystemBlobStore(root=tmp_path)
+        key = await store.put(b"<p>hello</p>")
+        assert await store.put(b"<p>hello</p>") == key  # content-addressed
+        assert store.path_for(key).is_relative_to(tmp_path)
+        assert await store.get(key) == b"<p>hello</p>"
+        with pytest.raises(FileNotFoundError):
+            await store.get("fs:" + "0" * 64)
+        with pytest.raises(ValueError):
+            store.path_for("fs:../../etc/passwd")
+
+    asyncio.run(main())
+
+
+async def _html_responses() -> list[httpx.Response]:
+    async with migrated_db() as (db, _):
+        with tempfile.TemporaryDirectory() as root:
+            store = FilesystemBlobStore(root=Path(root))
+            db = dataclasses.replace(db, blobs=store)
+            user_id = await db.get_or_create_user_id_for_identity(
+                provider="test", provider_subject="blobs", email=None, name=None,
+                avatar_url=None,
+            )
+            ids = [
+                (
+                    await db.create_bookmark(
+                        user_id=user_id, url=f"https://{n}.example/", title="t", html=f"<p>{n}</p>"
+                    )
+                )[0]
+                for n in ("kept", "lost")
+            ]
+            store.path_for(await store.put(b"<p>lost</p>")).unlink()
+
+            app = FastAPI()
+            app.include_router(bookmarks.router)
+            app.state.db = db
+            auth = {"Authorization": f"Bearer {create_access_token(user_id=user_id)}"}
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return [
+                    await client.get(f"/bookmarks/{bookmark_id}/html", headers=auth)
+                    for bookmark_id in ids
+                ]
+
+
+@requires_db
+def test_missing_filesystem_blob_is_404():
+    kept, lost = asyncio.run(_html_responses())
+    assert kept.status_code == 200 and kept.text == "<p>kept</p>"
+    assert lost.status_code == 404
@@ -0,0 +1,48 @@
+import asyncio
+
+from tests.pg_plans import migrated_db, requires_db
+
+
+async def _sync_flow() -> None:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="changes", email=None, name=None, avatar_url=None
+        )
+        first = await db.list_bookmark_changes(user_id=user_id, since=0)
+        assert first == {"changed": [], "deleted": [], "seq": 0, "has_more": False}
+
+        ids = [
+            (
+                await db.create_bookmark(
+                    user_id=user_id, url=f"https://example.com/{i}", title=str(i), html=None
+                )
+            )[0]
+            for i in range(5)
+        ]
+
+        # Paging walks the sequence in order and ends at the newest change.
+        seen, since = [], 0
+        while True:
+            page = await db.list_bookmark_changes(user_id=user_id, since=since, limit=2)
+            seen += [r["id"] for r in page["changed"]]
+            since = page["seq"]
+            if not page["has_more"]:
+                break
+        assert seen == ids
+
+        # Only what happened after the cursor comes back, deletes as tombstones.
+        assert await db.delete_bookmark(user_id=user_id, bookmark_id=ids[1]) == [ids[1]]
+        async with db.pool.acquire() as conn:
+            await conn.execute("UPDATE bookmarks SET title = 'renamed' WHERE id = $1", ids[3])
+        page = await db.list_bookmark_changes(user_id=user_id, since=since)
+        assert [r["id"] for r in page["deleted"]] == [ids[1]]
+        assert [(r["id"], r["title"]) for r in page["changed"]] == [(ids[3], "renamed")]
+        assert page["seq"] == since + 2 and not page["has_more"]
+
+        # A cursor from the future (another account, restored backup) is rejected.
+        assert await db.list_bookmark_changes(user_id=user_id, since=page["seq"] + 1) is None
+
+
+@requires_db
+def test_changes_since_cursor():
+    asyncio.run(_sync_flow())
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import date
+
+from tests.pg_plans import migrated_db, requires_db
+
+
+async def _stats_through_changes() -> list:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="stats", email=None, name=None, avatar_url=None
+        )
+        async with db.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO bookmarks (id, user_id, url, title, created_at, html_bytes)
+                VALUES (gen_random_uuid(), $1, 'https://a.example/1', 't', now(), 100),
+                       (gen_random_uuid(), $1, 'https://A.example:8443/2', 't', now(), 200),
+                       (gen_random_uuid(), $1, 'https://b.example/', 't', now() - interval '1 day', 50)
+                """,
+                user_id,
+            )
+        seen = [await db.get_bookmark_stats(user_id=user_id)]
+
+        b = [r for r in await db.list_bookmarks(user_id=user_id) if "b.example" in r["url"]]
+        await db.delete_bookmark(user_id=user_id, bookmark_id=b[0]["id"])
+        seen.append(await db.get_bookmark_stats(user_id=user_id))
+
+        # Drift: the aggregates no longer match the rows until reconciled.
+        async with db.pool.acquire() as conn:
+            await conn.execute("UPDATE bookmark_stats SET total_count = 99, total_bytes = 0")
+            await conn.execute("DELETE FROM bookmark_domain_stats")
+            await conn.execute("UPDATE bookmark_daily_stats SET count = 7")
+            seen.append(await db.reconcile_bookmark_stats())
+            seen.append(await db.get_bookmark_stats(user_id=user_id))
+
+            # Another process holds the leader lock: skip without scanning.
+            await conn.execute(
+                "SELECT pg_advisory_lock(hashtextextended('bookmark_stats:reconcile', 0))"
+            )
+            seen.append(await db.reconcile_bookmark_stats())
+            await conn.execute(
+                "SELECT pg_advisory_unlock(hashtextextended('bookmark_stats:reconcile', 0))"
+            )
+        # Just finished: a scheduled run with a minimum interval skips too.
+        seen.append(await db.reconcile_bookmark_stats(min_interval_seconds=3600))
+        seen.append(await db.reconcile_bookmark_stats())
+    return seen
+
+
+def _day(stats: dict) -> dict[date, int]:
+    return {r["day"]: r["count"] for r in stats["per_day"]}
+
+
+@requires_db
+def test_triggers_and_reconcile_keep_stats_in_step():
+    inserted, deleted, reconciled, repaired, locked, fresh, forced = asyncio.run(
+        _stats_through_changes()
+    )
+    assert (inserted["total_count"], inserted["total_bytes"]) == (3, 350)
+    assert {d["domain"]: d["count"] for d in inserted["domains"]} == {"a.example": 2, "b.example": 1}
+    assert sorted(_day(inserted).values()) == [1, 2]
+
+    assert (deleted["total_count"], deleted["total_bytes"]) == (2, 300)
+    assert deleted["domains"] == [{"domain": "a.example", "count": 2}]
+    assert list(_day(deleted).values()) == [2]  # the emptied day is removed
+
+    assert reconciled == 1
+    assert repaired == deleted
+    assert locked is None and fresh is None and forced == 1
@@ -0,0 +1,34 @@
+from src.legendary_potato.core.delta import MAX_DELTA_TOKENS, apply_delta, make_delta
+
+
+BASE = (
+    "<html><body><div id='sidebar'><a href='/a'>Trending A</a></div>"
+    "<article><h1>Title</h1>\n<p>First paragraph.</p>\n<p>Second paragraph.</p>\n"
+    "</article></body></html>"
+)
+
+
+def test_delta_round_trip():
+    target = BASE.replace("Trending A", "Trending B").replace("Second", "Updated second")
+    delta = make_delta(BASE, target)
+    assert apply_delta(BASE, delta) == target
+
+
+def test_delta_handles_empty_documents():
+    assert apply_delta("", make_delta("", BASE)) == BASE
+    assert apply_delta(BASE, make_delta(BASE, "")) == ""
+
+
+def test_delta_is_small_for_small_edits():
+    article = BASE + "".join(f"<p>Paragraph {i} with some body text.</p>" for i in range(2000))
+    target = article.replace("Paragraph 1000 ", "Paragraph one thousand ")
+    delta = make_delta(article, target)
+    assert apply_delta(article, delta) == target
+    assert len(delta) < len(target) // 50
+
+
+def test_delta_gives_up_on_very_large_documents():
+    large = "<br>" * (MAX_DELTA_TOKENS + 1)
+    assert make_delta(BASE, large) is None
+    assert make_delta(large, BASE) is None
+    assert make_delta(large[4:], large[4:]) is not None
@@ -0,0 +1,60 @@
+import asyncio
+import uuid
+
+from tests.pg_plans import TEST_DATABASE_URL, migrated_db, requires_db
+
+from src.legendary_potato.core.events import EventHub, bookmark_event_payload
+
+
+def test_fan_out_is_per_user_and_bounded():
+    async def main():
+        hub = EventHub("postgresql://unused", buffer_size=2)
+        alice, bob = uuid.uuid4(), uuid.uuid4()
+        a1, a2, b = hub.subscribe(alice), hub.subscribe(alice), hub.subscribe(bob)
+
+        hub.publish({"user_id": str(alice), "id": "1"})
+        assert (await a1.next(0.1))["id"] == "1"
+        assert (await a2.next(0.1))["id"] == "1"
+        assert await b.next(0.01) is None
+
+        # a2 never reads: the third pending event closes it instead of queueing.
+        for i in range(2, 5):
+            hub.publish({"user_id": str(alice), "id": str(i)})
+            assert (await a1.next(0.1))["id"] == str(i)
+        assert a2.overflowed and not a1.overflowed
+
+        for sub in (a1, a2, b, a2):
+            hub.unsubscribe(sub)
+        assert hub.count == 0 and not hub.subscribers
+
+    asyncio.run(main())
+
+
+def test_oversized_payload_drops_free_text():
+    payload = bookmark_event_payload({"user_id": "u", "id": "1", "url": "x" * 10_000})
+    assert len(payload) < 8000 and '"truncated":true' in payload
+
+
+async def _notify_round_trip() -> dict:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="events", email=None, name=None, avatar_url=None
+        )
+        hub = EventHub(TEST_DATABASE_URL)
+        await hub.start()
+        try:
+            sub = hub.subscribe(user_id)
+            bookmark_id, _ = await db.create_bookmark(
+                user_id=user_id, url="https://example.com/", title="t", html=None
+            )
+            event = await sub.next(5)
+        finally:
+            await hub.stop()
+    assert event["id"] == str(bookmark_id)
+    return event
+
+
+@requires_db
+def test_create_bookmark_notifies_listeners():
+    event = asyncio.run(_notify_round_trip())
+    assert event["url"] == "https://example.com/" and event["change_seq"] == 1
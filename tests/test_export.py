@@ -0,0 +1,99 @@
+import asyncio
+import gzip
+import io
+import json
+import tarfile
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.core.config import app_config
+from src.legendary_potato.core.export import export_stream, zstandard
+
+
+def _rows(n: int, *, html: bool) -> list[dict]:
+    created = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        row = {
+            "id": uuid.uuid4(),
+            "url": f"https://example.com/{i}",
+            "title": f"page {i}",
+            "version": 1,
+            "created_at": created,
+            "html_bytes": 100,
+        }
+        if html:
+            row["html"] = f"<p>{i}</p>" * 20_000
+        rows.append(row)
+    return rows
+
+
+def _export(rows: list[dict], fmt: str, compression: str) -> bytes:
+    async def source():
+        for r in rows:
+            yield r
+
+    async def main():
+        stream = export_stream(source(), user_id=uuid.uuid4(), fmt=fmt, compression=compression)
+        return b"".join([chunk async for chunk in stream])
+
+    return asyncio.run(main())
+
+
+def test_ndjson_and_warc_round_trip_through_gzip():
+    rows = _rows(50, html=True)
+    lines = gzip.decompress(_export(rows, "ndjson", "gzip")).splitlines()
+    assert [json.loads(line)["html"] for line in lines] == [r["html"] for r in rows]
+
+    data = _export(rows, "warc", "gzip")
+    # One gzip member per record: warcinfo + (resource, metadata) per bookmark.
+    assert data.count(b"\x1f\x8b\x08") >= 1 + 2 * len(rows)
+    warc = gzip.decompress(data)
+    assert warc.count(b"WARC-Type: resource") == len(rows)
+    assert warc.startswith(b"WARC/1.1\r\nWARC-Type: warcinfo")
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+def test_tar_zst_is_a_valid_archive():
+    rows = _rows(20, html=True)
+    raw = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(_export(rows, "tar", "zstd")))
+    with tarfile.open(fileobj=raw, mode="r|") as tar:
+        names = []
+        for member in tar:
+            names.append(member.name)
+            if member.name.endswith(".html"):
+                assert tar.extractfile(member).read().startswith(b"<p>")
+    assert len(names) == 2 * len(rows)
+
+
+async def _export_chain() -> list[dict]:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="export", email=None, name=None, avatar_url=None
+        )
+        html = "<html><body>" + "<p>paragraph</p>\n" * 200 + "</body></html>"
+        for i in range(4):
+            await db.create_bookmark(
+                user_id=user_id,
+                url="https://chain.example/",
+                title=f"v{i}",
+                html=html.replace("paragraph", f"edit {i}", 1),
+            )
+        await db.create_bookmark(user_id=user_id, url="https://plain.example/", title="p", html=None)
+        return [r async for r in db.iter_bookmark_export(user_id=user_id, include_html=True)]
+
+
+@requires_db
+def test_export_rebuilds_delta_chains(monkeypatch):
+    monkeypatch.setattr(app_config, "snapshot_keyframe_interval", 3)
+    rows = asyncio.run(_export_chain())
+    assert [(r["url"], r["version"]) for r in rows] == [("https://plain.example/", 1)] + [
+        ("https://chain.example/", v) for v in range(1, 5)
+    ]
+    assert rows[0]["html"] is None
+    for r in rows[1:]:
+        assert f"edit {r['version'] - 1}" in r["html"]
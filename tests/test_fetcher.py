@@ -0,0 +1,138 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.core.fetcher import FetchJob, PageFetcher
+
+PAGE = b"<html><body><p>Hello from the stand-in server</p></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits: list[tuple[str, str | None]] = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b"", **headers) -> None:
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k.replace("_", "-"), v)
+        if "Content_Length" not in headers and body:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        type(self).hits.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/robots.txt":
+            self._send(200, b"User-agent: *\nDisallow: /private\n", Content_Type="text/plain")
+        elif self.path == "/page":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304)
+            else:
+                self._send(200, PAGE, Content_Type="text/html; charset=utf-8", ETag='"v1"')
+        elif self.path == "/moved":
+            self._send(302, Location="/page")
+        elif self.path == "/big":
+            # No Content-Length: the cap has to trip while streaming.
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(b"<p>" + b"x" * 100_000)
+        elif self.path == "/image":
+            self._send(200, b"\x89PNG", Content_Type="image/png")
+        else:
+            self._send(404, b"missing")
+
+
+@contextmanager
+def _server():
+    _Handler.hits = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_port}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_fetch_honors_robots_size_type_and_validators():
+    async def main(base: str):
+        fetcher = PageFetcher(allow_private=True, max_bytes=10_000, timeout_seconds=5)
+        await fetcher.start()
+        try:
+            page = await fetcher.fetch(f"{base}/page")
+            assert page.status == "fetched" and page.html == PAGE.decode()
+            assert page.etag == '"v1"'
+            again = await fetcher.fetch(f"{base}/page", etag=page.etag)
+            assert again.status == "not_modified"
+            moved = await fetcher.fetch(f"{base}/moved")
+            assert moved.status == "fetched" and moved.url == f"{base}/page"
+            assert (await fetcher.fetch(f"{base}/private/x")).status == "robots_disallowed"
+            assert (await fetcher.fetch(f"{base}/big")).status == "too_large"
+            assert (await fetcher.fetch(f"{base}/image")).status == "not_html"
+            assert (await fetcher.fetch(f"{base}/nope")).http_status == 404
+        finally:
+            await fetcher.stop()
+
+    with _server() as base:
+        asyncio.run(main(base))
+    # robots.txt once per origin; the disallowed path never reaches the server.
+    paths = [p for p, _ in _Handler.hits]
+    assert paths.count("/robots.txt") == 1 and "/private/x" not in paths
+
+
+def test_private_addresses_are_refused():
+    async def main(base: str):
+        fetcher = PageFetcher()
+        await fetcher.start()
+        try:
+            return await fetcher.fetch(f"{base}/page")
+        finally:
+            await fetcher.stop()
+
+    with _server() as base:
+        result = asyncio.run(main(base))
+    assert result.status == "blocked" and not _Handler.hits
+
+
+async def _fetch_for_url_only_bookmarks(base: str) -> list[str | None]:
+    async with migrated_db() as (db, _):
+        users = [
+            await db.get_or_create_user_id_for_identity(
+                provider="test", provider_subject=f"fetch-{i}", email=None, name=None,
+                avatar_url=None,
+            )
+            for i in range(2)
+        ]
+        fetcher = PageFetcher(allow_private=True)
+        await fetcher.start(db)
+        try:
+            html = []
+            for user_id in users:
+                bookmark_id, _ = await db.create_bookmark(
+                    user_id=user_id, url=f"{base}/page", title=None, html=None
+                )
+                job = FetchJob(user_id=user_id, bookmark_id=bookmark_id, url=f"{base}/page")
+                assert fetcher.enqueue(job)
+                await fetcher.join()
+                source = await db.open_bookmark_html(user_id=user_id, bookmark_id=bookmark_id)
+                html.append(b"".join([c async for c in source.chunks]).decode())
+        finally:
+            await fetcher.stop()
+    return html
+
+
+@requires_db
+def test_url_only_bookmarks_get_a_snapshot():
+    with _server() as base:
+        html = asyncio.run(_fetch_for_url_only_bookmarks(base))
+    assert all("Hello from the stand-in server" in h for h in html)
+    # The second save revalidated with the stored ETag and reused the copy.
+    assert [inm for p, inm in _Handler.hits if p == "/page"] == [None, '"v1"']
@@ -0,0 +1,93 @@
+import asyncio
+import random
+import zlib
+
+import pytest
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.core import fingerprint
+from src.legendary_potato.core.fingerprint import (
+    MAX_DISTANCE,
+    hamming,
+    simhash,
+    simhash_bands,
+    to_signed64,
+)
+
+
+def _article(seed: int, words: int = 1500) -> str:
+    rng = random.Random(seed)
+    vocab = [f"word{i}" for i in range(5000)]
+    body = " ".join(rng.choices(vocab, k=words))
+    return f"<html><body><script>var x = 1;</script><article>{body}</article></body></html>"
+
+
+def test_mirrored_copy_is_near_duplicate():
+    page = _article(1)
+    mirror = page.replace("<body>", "<body><nav>Home | About | Subscribe</nav>")
+    assert hamming(simhash(page), simhash(mirror)) <= MAX_DISTANCE
+
+
+def test_unrelated_pages_are_far_apart():
+    assert hamming(simhash(_article(1)), simhash(_article(2))) > 10
+
+
+def test_short_pages_have_no_fingerprint():
+    assert simhash("<p>too short</p>") is None
+
+
+def test_near_duplicates_share_a_band():
+    rng = random.Random(3)
+    for _ in range(200):
+        a = rng.getrandbits(64)
+        b = a
+        for bit in rng.sample(range(64), MAX_DISTANCE):
+            b ^= 1 << bit
+        assert set(enumerate(simhash_bands(a))) & set(enumerate(simhash_bands(b)))
+
+
+def test_bands_match_postgres_signed_arithmetic():
+    rng = random.Random(4)
+    for _ in range(200):
+        value = rng.getrandbits(64)
+        signed = to_signed64(value)
+        # Postgres: ((simhash >> (16 * b)) & 65535) on a signed bigint
+        assert [(signed >> (16 * b)) & 65535 for b in range(4)] == simhash_bands(value)
+
+
+def test_numpy_and_python_paths_agree():
+    pytest.importorskip("numpy")
+    words = fingerprint._WORD_RE.findall(fingerprint.page_text(_article(5)))
+    token_ids = [zlib.crc32(w.encode("utf-8")) for w in words]
+    assert fingerprint._simhash_numpy(token_ids) == fingerprint._simhash_python(token_ids)
+
+
+async def _similar_past_the_cap() -> list[dict]:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="similar", email=None, name=None, avatar_url=None
+        )
+        target = 0x0123_4567_89AB_CDEF
+
+        async def save(url: str, value: int):
+            bookmark_id, _ = await db.create_bookmark(
+                user_id=user_id, url=url, title=None, html=None, simhash=to_signed64(value)
+            )
+            return bookmark_id
+
+        source = await save("https://source.example/", target)
+        rng = random.Random(7)
+        for i in range(20):
+            # Same low band, random elsewhere: a candidate, but far away.
+            await save(f"https://far.example/{i}", (rng.getrandbits(48) << 16) | (target & 0xFFFF))
+        await save("https://near.example/", target ^ (1 << 40))
+        return await db.find_similar_bookmarks(
+            user_id=user_id, bookmark_id=source, max_distance=MAX_DISTANCE, max_candidates=5
+        )
+
+
+@requires_db
+def test_nearest_candidates_survive_the_cap():
+    similar = asyncio.run(_similar_past_the_cap())
+    assert [(r["url"], r["distance"]) for r in similar] == [("https://near.example/", 1)]
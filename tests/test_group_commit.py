@@ -0,0 +1,142 @@
+import asyncio
+import dataclasses
+import uuid
+
+import asyncpg
+import pytest
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.core.group_commit import GroupCommit
+
+
+class FakeFlush:
+    """Records each batch; items ending in "!" fail on their own."""
+
+    def __init__(self, *, delay: float = 0.0):
+        self.batches: list[list[str]] = []
+        self.delay = delay
+
+    async def __call__(self, items: list[str]) -> list:
+        self.batches.append(list(items))
+        await asyncio.sleep(self.delay)
+        return [ValueError(item) if item.endswith("!") else item.upper() for item in items]
+
+
+def _submit(group_commit: GroupCommit, flush: FakeFlush, item: str) -> asyncio.Task:
+    async def direct() -> str:
+        return f"direct {item}"
+
+    return asyncio.create_task(group_commit.submit(item, flush=flush, direct=direct))
+
+
+def test_writes_within_the_window_share_one_flush():
+    async def main():
+        flush = FakeFlush()
+        group_commit = GroupCommit(window_seconds=0.05, max_batch=8, direct_when_idle=False)
+        tasks = [_submit(group_commit, flush, item) for item in ("a", "b!", "c")]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert flush.batches == [["a", "b!", "c"]]
+        assert results[0] == "A" and results[2] == "C"
+        assert isinstance(results[1], ValueError)
+        assert group_commit.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_a_full_batch_flushes_without_waiting_for_the_window():
+    async def main():
+        flush = FakeFlush()
+        group_commit = GroupCommit(window_seconds=60, max_batch=2, direct_when_idle=False)
+        tasks = [_submit(group_commit, flush, item) for item in "abcd"]
+        assert await asyncio.wait_for(asyncio.gather(*tasks), 1) == ["A", "B", "C", "D"]
+        assert flush.batches == [["a", "b"], ["c", "d"]]
+
+    asyncio.run(main())
+
+
+def test_an_idle_write_runs_directly_and_a_busy_one_is_batched():
+    async def main():
+        flush = FakeFlush()
+        group_commit = GroupCommit(window_seconds=0.01, direct_when_idle=True)
+        assert await _submit(group_commit, flush, "a") == "direct a"
+        assert flush.batches == []
+
+        release = asyncio.Event()
+
+        async def slow_direct() -> str:
+            await release.wait()
+            return "direct b"
+
+        busy = asyncio.create_task(group_commit.submit("b", flush=flush, direct=slow_direct))
+        await asyncio.sleep(0)
+        batched = _submit(group_commit, flush, "c")
+        assert await batched == "C"
+        release.set()
+        assert await busy == "direct b"
+        assert flush.batches == [["c"]]
+
+    asyncio.run(main())
+
+
+def test_drain_flushes_the_open_batch_and_waits_for_it():
+    async def main():
+        flush = FakeFlush(delay=0.05)
+        group_commit = GroupCommit(window_seconds=60, direct_when_idle=False)
+        tasks = [_submit(group_commit, flush, item) for item in "ab"]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(group_commit.drain(), 1)
+        assert flush.batches == [["a", "b"]]
+        assert group_commit.in_flight == 0
+        assert [t.result() for t in tasks] == ["A", "B"]
+
+    asyncio.run(main())
+
+
+def test_a_cancelled_caller_does_not_take_the_batch_with_it():
+    async def main():
+        flush = FakeFlush()
+        group_commit = GroupCommit(window_seconds=0.05, direct_when_idle=False)
+        gone, failed, kept = (_submit(group_commit, flush, item) for item in ("a", "b!", "c"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        failed.cancel()
+        assert await kept == "C"
+        assert flush.batches == [["a", "b!", "c"]]
+        for task in (gone, failed):
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(main())
+
+
+async def _grouped_saves() -> tuple[list, list[str], int]:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="group-commit", email=None, name=None,
+            avatar_url=None,
+        )
+        group_commit = GroupCommit(window_seconds=0.05, max_batch=8, direct_when_idle=False)
+        grouped = dataclasses.replace(db, group_commit=group_commit)
+        owners = [user_id, user_id, uuid.uuid4(), user_id]  # the third user does not exist
+        results = await asyncio.gather(
+            *(
+                grouped.create_bookmark(
+                    user_id=owner, url=f"https://g.example/{i}", title="t", html="<p>g</p>"
+                )
+                for i, owner in enumerate(owners)
+            ),
+            return_exceptions=True,
+        )
+        rows = await db.list_bookmarks(user_id=user_id)
+        stats = await db.get_bookmark_stats(user_id=user_id)
+    return results, sorted(r["url"] for r in rows), stats["total_count"]
+
+
+@requires_db
+def test_a_bad_row_fails_only_its_own_caller():
+    results, urls, total = asyncio.run(_grouped_saves())
+    assert isinstance(results[2], asyncpg.ForeignKeyViolationError)
+    assert all(r[1] and isinstance(r[0], uuid.UUID) for i, r in enumerate(results) if i != 2)
+    assert urls == ["https://g.example/0", "https://g.example/1", "https://g.example/3"]
+    assert total == 3
@@ -0,0 +1,85 @@
+import pytest
+
+from src.legendary_potato.core.html_slim import SlimPolicy, slim_html
+
+
+PAGE = (
+    "<html><head>"
+    "<style>body { color: red; }</style>"
+    "<script>window.tracker = 1;</script>"
+    '<script type="application/ld+json">{"@type": "Article"}</script>'
+    "</head><body>"
+    '<svg style="display:none"><symbol id="i"><path d="M0 0"/></symbol></svg>'
+    '<svg width="10"><circle r="5"/></svg>'
+    '<img src="data:image/png;base64,' + "A" * 4096 + '">'
+    '<img src="data:image/gif;base64,R0lG">'
+    "<p>Hello</p>"
+    "</body></html>"
+)
+
+
+def test_slim_strips_configured_blocks():
+    result = slim_html(PAGE, SlimPolicy())
+
+    assert "tracker" not in result.html
+    assert "color: red" not in result.html
+    assert "<symbol" not in result.html
+    assert "A" * 4096 not in result.html
+
+    assert "application/ld+json" in result.html
+    assert '<svg width="10">' in result.html
+    assert "data:image/gif;base64,R0lG" in result.html
+    assert '<img src="data:,">' in result.html
+    assert "<p>Hello</p>" in result.html
+
+    assert result.original_bytes == len(PAGE.encode("utf-8"))
+    assert result.slimmed_bytes == len(result.html.encode("utf-8"))
+    assert result.slimmed_bytes < result.original_bytes
+
+
+def test_slim_policy_from_names():
+    policy = SlimPolicy.from_names(["scripts"])
+    assert policy.strip_scripts and not policy.strip_styles
+    assert not SlimPolicy.from_names([]).enabled
+
+    result = slim_html(PAGE, policy)
+    assert "tracker" not in result.html
+    assert "color: red" in result.html
+
+
+def test_slim_keeps_visible_svgs():
+    visible = [
+        '<svg style="overflow:hidden"><circle r="5"/></svg>',
+        '<svg class="visually-hidden hidden-sm"><circle r="5"/></svg>',
+        '<svg width="0.5"><circle r="5"/></svg>',
+        '<svg aria-hidden="true" stroke-width="0"><circle r="5"/></svg>',
+    ]
+    hidden = [
+        '<svg hidden><circle r="5"/></svg>',
+        '<svg style="visibility: hidden"><circle r="5"/></svg>',
+        '<svg width="0" height="0"><circle r="5"/></svg>',
+    ]
+    result = slim_html("".join(visible + hidden), SlimPolicy())
+    assert result.html == "".join(visible)
+
+
+def test_slim_judges_svgs_by_their_root():
+    visible = [
+        # A hidden nested <svg> stays with its visible root, and so does the
+        # text after it.
+        '<svg width="20"><svg hidden><rect/></svg><circle r="5"/></svg>',
+        # Defines a symbol and draws it.
+        '<svg><symbol id="a"><path d="M0 0"/></symbol><use href="#a"/></svg>',
+    ]
+    hidden = [
+        '<svg style="display:none"><svg width="20"><circle r="5"/></svg>tail</svg>',
+        '<svg height="0"><defs><linearGradient id="g"/></defs></svg>',
+        '<svg aria-hidden="true">\n  <symbol id="b"><path d="M0 0"/></symbol>\n</svg>',
+    ]
+    html = "".join(hidden[:1] + visible[:1] + hidden[1:] + visible[1:])
+    assert slim_html(html, SlimPolicy()).html == "".join(visible)
+
+
+def test_slim_policy_rejects_unknown_names():
+    with pytest.raises(ValueError, match="fonts"):
+        SlimPolicy.from_names(["scripts", "fonts"])
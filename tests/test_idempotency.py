@@ -0,0 +1,138 @@
+import asyncio
+import dataclasses
+import uuid
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.api.routes import bookmarks
+from src.legendary_potato.core.blobs import FilesystemBlobStore
+from src.legendary_potato.core.db import Db
+from src.legendary_potato.core.idempotency import InFlightRequests
+from src.legendary_potato.core.tokens import create_access_token
+
+
+def test_a_cancelled_leader_hands_over_to_a_waiter():
+    async def main() -> list[str]:
+        in_flight = InFlightRequests()
+        calls = []
+
+        async def call(name: str) -> str:
+            calls.append(name)
+            await asyncio.sleep(0.05)
+            return name
+
+        user_id = uuid.uuid4()
+        leader = asyncio.create_task(in_flight.run(user_id=user_id, key="k", call=lambda: call("a")))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(in_flight.run(user_id=user_id, key="k", call=lambda: call("b")))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        assert not in_flight.pending
+        return calls + results
+
+    # One waiter took over after the cancel; the other two got its result.
+    assert asyncio.run(main()) == ["a", "b", "b", "b", "b"]
+
+
+async def _save_with_retries() -> tuple[list[httpx.Response], int]:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="idempotency", email=None, name=None,
+            avatar_url=None,
+        )
+        app = FastAPI()
+        app.include_router(bookmarks.router)
+        app.state.db = db
+        headers = {
+            "Authorization": f"Bearer {create_access_token(user_id=user_id)}",
+            "Idempotency-Key": str(uuid.uuid4()),
+        }
+        body = {"url": "https://example.com/", "title": "t", "html": "<p>page</p>"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Concurrent duplicates, then a replay whose body would not even validate.
+            responses = await asyncio.gather(
+                *[client.post("/bookmarks", json=body, headers=headers) for _ in range(5)]
+            )
+            responses.append(await client.post("/bookmarks", json={}, headers=headers))
+            responses.append(await client.post("/bookmarks", json={}, headers={
+                "Authorization": headers["Authorization"], "Idempotency-Key": "bad key",
+            }))
+        rows = len(await db.list_bookmarks(user_id=user_id))
+    return responses, rows
+
+
+@requires_db
+def test_retries_with_the_same_key_save_once():
+    responses, rows = asyncio.run(_save_with_retries())
+    *saves, invalid = responses
+    assert rows == 1
+    assert [r.status_code for r in saves] == [200] * 6
+    assert len({r.json()["id"] for r in saves}) == 1
+    assert [r.headers.get("Idempotent-Replayed") for r in saves].count(None) == 1
+    assert invalid.status_code == 400
+
+
+class _LateCheckDb(Db):
+    """The key is claimed by another process just after this one looked it up."""
+
+    async def get_idempotent_bookmark(self, *, user_id, key):
+        return None
+
+
+class _RecordingFetcher:
+    def __init__(self):
+        self.jobs = []
+
+    def enqueue(self, job) -> bool:
+        self.jobs.append(job)
+        return True
+
+
+async def _lose_the_race(blob_root: Path) -> tuple[uuid.UUID, list[httpx.Response], list, list]:
+    async with migrated_db() as (db, _):
+        db = dataclasses.replace(db, blobs=FilesystemBlobStore(root=blob_root))
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="idempotency-race", email=None, name=None,
+            avatar_url=None,
+        )
+        key = str(uuid.uuid4())
+        winner, _ = await db.create_bookmark(
+            user_id=user_id, url="https://example.com/", title="t", html=None,
+            idempotency_key=key,
+        )
+        app = FastAPI()
+        app.include_router(bookmarks.router)
+        app.state.db = _LateCheckDb(**{f.name: getattr(db, f.name) for f in dataclasses.fields(db)})
+        app.state.fetcher = fetcher = _RecordingFetcher()
+        headers = {
+            "Authorization": f"Bearer {create_access_token(user_id=user_id)}",
+            "Idempotency-Key": key,
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = [
+                await client.post("/bookmarks", json=body, headers=headers)
+                for body in (
+                    {"url": "https://example.com/"},
+                    {"url": "https://example.com/", "html": "<p>retry</p>"},
+                )
+            ]
+    return winner, responses, fetcher.jobs, [p for p in blob_root.rglob("*") if p.is_file()]
+
+
+@requires_db
+def test_a_save_that_loses_the_key_to_another_process_is_a_replay(tmp_path):
+    winner, responses, jobs, blobs = asyncio.run(_lose_the_race(tmp_path))
+    assert [r.json()["id"] for r in responses] == [str(winner)] * 2
+    assert [r.headers.get("Idempotent-Replayed") for r in responses] == ["true"] * 2
+    # Nothing is fetched for, or written by, a save that did not happen.
+    assert jobs == [] and blobs == []
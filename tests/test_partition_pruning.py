@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from tests.pg_plans import migrated_db, plan_nodes, requires_db
+
+from src.legendary_potato.core.config import app_config
+
+
+def _partition(ts: datetime) -> str:
+    return f"bookmarks_{ts:%Y_%m}"
+
+
+def _touched(plan: dict) -> set[str]:
+    return {
+        node["Relation Name"]
+        for node in plan_nodes(plan)
+        if node.get("Relation Name", "").startswith("bookmarks_")
+        and node.get("Actual Loops", 0) > 0
+    }
+
+
+async def _listing_plan() -> tuple[set[str], set[str], set[str]]:
+    async with migrated_db() as (db, recorder):
+        now = datetime.now(timezone.utc)
+        await db.ensure_bookmark_partitions(months_ahead=1, since=now - timedelta(days=400))
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="partitions", email=None, name=None, avatar_url=None
+        )
+        async with db.pool.acquire() as conn:
+            # ~2 saves a day for the past year.
+            await conn.execute(
+                """
+                INSERT INTO bookmarks (id, user_id, url, created_at)
+                SELECT gen_random_uuid(), $1, 'https://example.com/' || i,
+                       now() - i * interval '12 hours'
+                FROM generate_series(1, 730) AS i
+                """,
+                user_id,
+            )
+            await conn.execute("ANALYZE bookmarks")
+
+        recorder.enabled = True
+        rows = await db.list_bookmarks(user_id=user_id, limit=50)
+        assert len(rows) == 50
+
+    (plan,) = [
+        plan
+        for caller, (_, plan) in zip(recorder.callers, recorder.plans)
+        if caller == "list_bookmarks"
+    ]
+    planned, touched = set(), set()
+    for node in plan_nodes(plan):
+        name = node.get("Relation Name")
+        if name and name.startswith("bookmarks_"):
+            planned.add(name)
+            if node.get("Actual Loops", 0) > 0:
+                touched.add(name)
+    # Calendar arithmetic: "now - 32 days" skips the previous month on e.g. Mar 1.
+    recent = {_partition(now), _partition(now.replace(day=1) - timedelta(days=1))}
+    return planned, touched, recent
+
+
+@requires_db
+def test_default_listing_only_touches_recent_partitions():
+    planned, touched, recent = asyncio.run(_listing_plan())
+
+    # The 50 newest rows span ~25 days: at most this month and the previous one.
+    assert touched and touched <= recent
+    assert len(planned) > len(touched)
+
+
+async def _id_lookup_plans() -> tuple[list[tuple[str, set[str]]], set[str]]:
+    async with migrated_db() as (db, recorder):
+        now = datetime.now(timezone.utc)
+        await db.ensure_bookmark_partitions(months_ahead=1, since=now - timedelta(days=400))
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="ids", email=None, name=None, avatar_url=None
+        )
+        async with db.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO bookmarks (id, user_id, url, created_at)
+                SELECT gen_random_uuid(), $1, 'https://example.com/' || i,
+                       now() - i * interval '12 hours'
+                FROM generate_series(1, 730) AS i
+                """,
+                user_id,
+            )
+            # A page saved 200 days ago, and a near-duplicate and a fetch-less
+            # save from 100 days ago.
+            old, near, bare = await conn.fetch(
+                """
+                INSERT INTO bookmarks (id, user_id, url, html, simhash, created_at)
+                VALUES (gen_random_uuid(), $1, 'https://old.example/', '<p>old</p>', 7,
+                        now() - interval '200 days'),
+                       (gen_random_uuid(), $1, 'https://near.example/', NULL, 5,
+                        now() - interval '100 days'),
+                       (gen_random_uuid(), $1, 'https://bare.example/', NULL, NULL,
+                        now() - interval '100 days')
+                RETURNING id, created_at
+                """,
+                user_id,
+            )
+            await conn.execute("ANALYZE bookmarks")
+        # A delta saved today against the 200-day-old keyframe.
+        app_config.snapshot_keyframe_interval = 10
+        try:
+            latest, _ = await db.create_bookmark(
+                user_id=user_id, url="https://old.example/", title=None, html="<p>new</p>"
+            )
+        finally:
+            app_config.snapshot_keyframe_interval = 0
+
+        recorder.enabled = True
+        source = await db.open_bookmark_html(user_id=user_id, bookmark_id=old["id"])
+        assert b"".join([c async for c in source.chunks]) == b"<p>old</p>"
+        assert len(await db.list_bookmark_versions(user_id=user_id, bookmark_id=latest)) == 2
+        version = await db.get_bookmark_version(user_id=user_id, bookmark_id=latest, version=2)
+        assert version["html"] == "<p>new</p>"
+        similar = await db.find_similar_bookmarks(
+            user_id=user_id, bookmark_id=old["id"], max_distance=3
+        )
+        assert [r["id"] for r in similar] == [near["id"]]
+        assert await db.attach_fetched_html(user_id=user_id, bookmark_id=bare["id"], html="x")
+        assert await db.delete_bookmark(user_id=user_id, bookmark_id=near["id"]) == [near["id"]]
+
+    plans = []
+    for caller, (query, plan) in zip(recorder.callers, recorder.plans):
+        if "bookmark_ids" not in query:
+            continue
+        # The versions queries then read the URL's versions from every month;
+        # only their URL lookup (an InitPlan) is by id.
+        lookups = [
+            node
+            for node in plan_nodes(plan)
+            if node.get("Parent Relationship") == "InitPlan" and _touched({"Plan": node})
+        ]
+        plans.append(
+            (caller, set().union(*(_touched({"Plan": n}) for n in lookups or [plan["Plan"]])))
+        )
+    saved = {_partition(old["created_at"]), _partition(near["created_at"]), _partition(now)}
+    return plans, saved
+
+
+@requires_db
+def test_lookups_by_id_only_touch_the_rows_partitions():
+    plans, saved = asyncio.run(_id_lookup_plans())
+
+    assert {caller for caller, _ in plans} == {
+        "open_bookmark_html",
+        "list_bookmark_versions",
+        "get_bookmark_version",
+        "_load_html",
+        "find_similar_bookmarks",
+        "attach_fetched_html",
+        "delete_bookmark",
+    }
+    for caller, touched in plans:
+        # Each lookup reads one row; `_load_html` and the similar pages read two.
+        assert touched and touched <= saved and len(touched) <= 2, (caller, touched)
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.api.routes import bookmarks, public
+from src.legendary_potato.core.tokens import create_access_token
+
+PAGE = "<html><head><script>track()</script></head><body><p>Café menu</p></body></html>"
+
+
+def _precheck(url: str, html: str) -> dict:
+    data = html.encode("utf-8")
+    return {
+        "url": url,
+        "title": "t",
+        "html_sha256": hashlib.sha256(data).hexdigest(),
+        "html_size": len(data),
+    }
+
+
+async def _two_phase_saves() -> tuple[list[dict], list[str], str, int]:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="precheck", email=None, name=None,
+            avatar_url=None,
+        )
+        app = FastAPI()
+        app.include_router(bookmarks.router)
+        app.include_router(public.router)
+        app.state.db = db
+        auth = {"Authorization": f"Bearer {create_access_token(user_id=user_id)}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+            async def post(path: str, body: dict, **headers) -> dict:
+                res = await client.post(path, json=body, headers={**auth, **headers})
+                res.raise_for_status()
+                return res.json()
+
+            results = [await post("/bookmarks/precheck", _precheck("https://a.example/", PAGE))]
+            results.append(await post("/bookmarks", {"url": "https://a.example/", "html": PAGE}))
+            # Same page under another URL: saved without the upload.
+            key = str(uuid.uuid4())
+            for _ in range(2):
+                results.append(
+                    await post(
+                        "/bookmarks/precheck",
+                        _precheck("https://b.example/", PAGE),
+                        **{"Idempotency-Key": key},
+                    )
+                )
+            results.append(
+                await post("/bookmarks/precheck", _precheck("https://c.example/", PAGE + " "))
+            )
+            metrics = (await client.get("/metrics")).text
+        creates, _ = app.state.rate_limiter.buckets[f"bookmark:create:{user_id}"]
+
+        html = []
+        for r in await db.list_bookmarks(user_id=user_id):
+            source = await db.open_bookmark_html(user_id=user_id, bookmark_id=r["id"])
+            html.append(b"".join([c async for c in source.chunks]).decode())
+    return results, html, metrics, creates
+
+
+@requires_db
+def test_precheck_saves_known_pages_without_upload():
+    results, html, metrics, creates = asyncio.run(_two_phase_saves())
+    miss, uploaded, hit, replay, changed = results
+    assert miss == {"status": "upload"} and changed == {"status": "upload"}
+    assert hit["status"] == "saved" and hit["id"] != uploaded["id"]
+    assert replay == hit
+    # Both bookmarks serve the stored (slimmed) copy.
+    assert len(html) == 2 and html[0] == html[1] and "track()" not in html[0]
+    size = len(PAGE.encode("utf-8"))
+    assert f'bookmark_upload_bytes_saved_total{{reason="precheck"}} {size}' in metrics
+    assert 'bookmark_precheck_total{result="miss"} 2' in metrics
+    # The upload, the hit and its replay count as saves; the misses do not.
+    assert creates == 3
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.api.routes import public
+from src.legendary_potato.core.profiling import Profiler, ProfilingMiddleware
+
+ADMIN = {"X-Profile-Token": "secret"}
+
+
+def _spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _profiled_app(wait) -> tuple[FastAPI, Profiler]:
+    app = FastAPI()
+    app.include_router(public.router)
+    profiler = app.state.profiler = Profiler(interval_seconds=0.002, admin_token="secret")
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+    @app.get("/slow/{n}")
+    async def slow(n: int):
+        _spin(0.2)
+        await wait()
+        return {"n": n}
+
+    return app, profiler
+
+
+def _samples(collapsed: str) -> dict[str, int]:
+    """Sample counts by kind; `spin` is the [cpu] time spent in `_spin`."""
+    samples = {}
+    for line in collapsed.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        route, kind, *frames = stack.split(";")
+        assert route == "GET /slow/{n}"
+        if kind == "[cpu]" and frames[-1] == "test_profiling:_spin":
+            kind = "spin"
+        if kind in ("[await]", "[asyncpg]"):
+            assert "test_profiling:_profiled_app.<locals>.slow" in frames
+        samples[kind] = samples.get(kind, 0) + int(count)
+    return samples
+
+
+async def _flagged_profile(app: FastAPI, profiler: Profiler) -> tuple[list[httpx.Response], str]:
+    profiler.start()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = [
+                await client.get("/slow/1"),
+                await client.get("/slow/2", headers=ADMIN),
+                await client.get("/debug/profile", headers={"X-Profile-Token": "wrong"}),
+            ]
+            profile_id = responses[1].headers["X-Profile-Id"]
+            flagged = await client.get(
+                "/debug/profile", params={"request_id": profile_id}, headers=ADMIN
+            )
+            by_route = await client.get(
+                "/debug/profile", params={"route": "GET /slow/{n}"}, headers=ADMIN
+            )
+    finally:
+        profiler.stop()
+    assert flagged.text == by_route.text
+    return responses, flagged.text
+
+
+async def _profile_endpoint_without_profiler() -> int:
+    app = FastAPI()
+    app.include_router(public.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return (await client.get("/debug/profile", headers=ADMIN)).status_code
+
+
+def test_a_flagged_request_is_profiled_by_cpu_and_wait():
+    app, profiler = _profiled_app(lambda: asyncio.sleep(0.1))
+    responses, flagged = asyncio.run(_flagged_profile(app, profiler))
+    unflagged, profiled, forbidden = responses
+    assert "X-Profile-Id" not in unflagged.headers
+    assert profiled.status_code == 200 and profiled.headers["X-Profile-Id"]
+    assert forbidden.status_code == 403
+    assert asyncio.run(_profile_endpoint_without_profiler()) == 404
+
+    samples = _samples(flagged)
+    # While it spins the sampler competes for the GIL (5ms switch interval), so
+    # expect ~40 samples of the 200ms spin and ~50 of the 100ms wait at best.
+    assert samples.get("spin", 0) >= 10 and samples.get("[await]", 0) >= 10, samples
+
+
+async def _asyncpg_profile() -> str:
+    async with migrated_db() as (db, _):
+
+        async def query():
+            async with db.pool.acquire() as conn:
+                await conn.fetchval("SELECT pg_sleep(0.1)")
+
+        _, flagged = await _flagged_profile(*_profiled_app(query))
+    return flagged
+
+
+@requires_db
+def test_time_waiting_on_postgres_is_attributed_to_asyncpg():
+    samples = _samples(asyncio.run(_asyncpg_profile()))
+    assert samples.get("[asyncpg]", 0) >= 10, samples
@@ -0,0 +1,319 @@
+"""
+Query plan regression suite.
+
+Loads a synthetic dataset (PLAN_TEST_BOOKMARKS rows, default 2M, spread over
+PLAN_TEST_USERS users with a heavy per-user skew) into a throwaway schema,
+drives every `Db` method for a typical user and for the heaviest user, and
+checks `EXPLAIN (ANALYZE, BUFFERS)` of every statement `core/db.py` runs:
+
+- no Seq Scan that reads more than SEQ_SCAN_MAX_ROWS rows (an empty future
+  partition is cheaper to seq-scan than to probe, so the planner does)
+- shared buffers touched and execution time within budget
+
+Run with TEST_DATABASE_URL set; skipped otherwise.
+"""
+
+import ast
+import asyncio
+import dataclasses
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from tests.pg_plans import migrated_db, normalize_sql, plan_nodes, requires_db
+
+from src.legendary_potato.core.config import app_config
+from src.legendary_potato.core.group_commit import GroupCommit
+
+DB_PY = Path(__file__).resolve().parent.parent / "src" / "legendary_potato" / "core" / "db.py"
+
+BOOKMARKS = int(os.environ.get("PLAN_TEST_BOOKMARKS", 2_000_000))
+USERS = int(os.environ.get("PLAN_TEST_USERS", 20_000))
+
+DEFAULT_BUFFERS = int(os.environ.get("PLAN_TEST_MAX_BUFFERS", 2_000))
+DEFAULT_MS = float(os.environ.get("PLAN_TEST_MAX_MS", 50))
+
+SEQ_SCAN_MAX_ROWS = 100
+
+# Per-method overrides: (max shared buffers, max execution ms).
+BUDGETS = {
+    # Rebuilds one user's aggregates from their rows by design.
+    "reconcile_bookmark_stats": (50_000, 2_000),
+    # DDL on first run; a catalog lookup per month afterwards.
+    "ensure_bookmark_partitions": (20_000, 1_000),
+    # Streams a user's whole archive by design.
+    "iter_bookmark_export": (50_000, 2_000),
+}
+
+_SQL_METHODS = {"execute", "executemany", "fetch", "fetchrow", "fetchval", "cursor"}
+
+
+def _db_statements() -> set[str]:
+    """Every literal SQL string passed to a connection method in core/db.py."""
+    tree = ast.parse(DB_PY.read_text(encoding="utf-8"))
+    found = set()
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr in _SQL_METHODS
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, str)
+        ):
+            found.add(normalize_sql(node.args[0].value))
+    return found
+
+
+def _user(n: int) -> uuid.UUID:
+    # Matches md5('u' || n)::uuid in the loader.
+    return uuid.UUID(hashlib.md5(f"u{n}".encode()).hexdigest())
+
+
+async def _load(db) -> None:
+    async with db.pool.acquire() as conn:
+        await conn.fetchval(
+            "SELECT ensure_bookmark_partitions(now() - interval '740 days', 3)"
+        )
+        await conn.execute("ALTER TABLE bookmarks DISABLE TRIGGER USER")
+        await conn.execute(
+            "INSERT INTO users (id) SELECT md5('u' || n)::uuid FROM generate_series(0, $1 - 1) n",
+            USERS,
+        )
+        await conn.execute(
+            """
+            INSERT INTO user_identities (id, user_id, provider, provider_subject, email)
+            SELECT gen_random_uuid(), md5('u' || n)::uuid, 'google', 'sub-' || n,
+                   'u' || n || '@example.com'
+            FROM generate_series(0, $1 - 1) n
+            """,
+            USERS,
+        )
+        await conn.execute(
+            """
+            INSERT INTO refresh_tokens (id, user_id, token_hash, created_at, expires_at, revoked_at)
+            SELECT gen_random_uuid(), md5('u' || (n % $1))::uuid, md5('t' || n),
+                   now() - interval '1 day', now() + interval '29 days',
+                   CASE WHEN n % 3 = 0 THEN now() END
+            FROM generate_series(0, $1 * 3 - 1) n
+            """,
+            USERS,
+        )
+        # power(random(), 3) skews ownership: user 0 owns a few percent of all rows.
+        await conn.execute(
+            """
+            INSERT INTO bookmarks
+              (id, user_id, url, title, created_at, html_bytes, simhash, change_seq)
+            SELECT gen_random_uuid(),
+                   md5('u' || floor($2 * power(random(), 3))::int)::uuid,
+                   'https://site' || (random() * 5000)::int || '.example/' || i,
+                   'Page ' || i,
+                   now() - random() * interval '730 days',
+                   (random() * 200000)::int,
+                   ('x' || substr(md5(i::text), 1, 16))::bit(64)::bigint,
+                   i
+            FROM generate_series(1, $1) i
+            """,
+            BOOKMARKS,
+            USERS,
+        )
+        await conn.execute(
+            """
+            UPDATE users u SET bookmark_change_seq = s.seq
+            FROM (SELECT user_id, max(change_seq) AS seq FROM bookmarks GROUP BY user_id) s
+            WHERE u.id = s.user_id
+            """
+        )
+        await conn.execute(
+            """
+            INSERT INTO bookmark_fingerprint_bands (user_id, band, value, bookmark_id, simhash)
+            SELECT user_id, b, ((simhash >> (16 * b)) & 65535)::integer, id, simhash
+            FROM bookmarks, generate_series(0, 3) b
+            """
+        )
+        await conn.execute(
+            """
+            INSERT INTO bookmark_stats (user_id, total_count, total_bytes)
+            SELECT user_id, count(*), sum(html_bytes) FROM bookmarks GROUP BY user_id
+            """
+        )
+        await conn.execute(
+            """
+            INSERT INTO bookmark_domain_stats (user_id, domain, count)
+            SELECT user_id, bookmark_domain(url), count(*) FROM bookmarks GROUP BY 1, 2
+            """
+        )
+        await conn.execute(
+            """
+            INSERT INTO bookmark_daily_stats (user_id, day, count)
+            SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, count(*)
+            FROM bookmarks GROUP BY 1, 2
+            """
+        )
+        await conn.execute("ALTER TABLE bookmarks ENABLE TRIGGER USER")
+        await conn.execute("ANALYZE")
+
+
+async def _exercise(db, user_id: uuid.UUID, *, subject: str) -> None:
+    await db.get_or_create_user_id_for_identity(
+        provider="google", provider_subject=subject, email=None, name=None, avatar_url=None
+    )
+    await db.get_identities(user_id=user_id)
+    await db.list_bookmarks(user_id=user_id, limit=50)
+    await db.get_bookmark_stats(user_id=user_id)
+
+    plain_id, _ = await db.create_bookmark(
+        user_id=user_id, url="https://plain.example/", title="t", html="<p>inline</p>"
+    )
+    grouped = dataclasses.replace(db, group_commit=GroupCommit(direct_when_idle=False))
+    await asyncio.gather(
+        *(
+            grouped.create_bookmark(
+                user_id=user_id, url=f"https://grouped.example/{i}", title="t", html="<p>g</p>"
+            )
+            for i in range(4)
+        )
+    )
+    previous = app_config.snapshot_keyframe_interval
+    app_config.snapshot_keyframe_interval = 3
+    try:
+        html = "<html><body>" + "<p>paragraph</p>\n" * 500 + "</body></html>"
+        chain = []
+        for i in range(3):
+            bookmark_id, _ = await db.create_bookmark(
+                user_id=user_id,
+                url="https://chain.example/",
+                title="t",
+                html=html.replace("paragraph", f"paragraph {i}", 1),
+                simhash=0x0123_4567_89AB_CDEF,
+            )
+            chain.append(bookmark_id)
+    finally:
+        app_config.snapshot_keyframe_interval = previous
+
+    await db.list_bookmark_versions(user_id=user_id, bookmark_id=bookmark_id)
+    await db.get_bookmark_version(user_id=user_id, bookmark_id=bookmark_id, version=1)
+    source = await db.open_bookmark_html(user_id=user_id, bookmark_id=bookmark_id)
+    assert source.html is not None
+
+    source = await db.open_bookmark_html(user_id=user_id, bookmark_id=plain_id)
+    async for _ in source.chunks:
+        pass
+    await db.find_similar_bookmarks(user_id=user_id, bookmark_id=bookmark_id, max_distance=3)
+    url_only, _ = await db.create_bookmark(
+        user_id=user_id, url="https://fetch.example/", title=None, html=None
+    )
+    sha = hashlib.sha256(b"<p>inline</p>").digest()
+    await db.create_bookmark(
+        user_id=user_id, url="https://hashed.example/", title="t", html="<p>inline</p>",
+        html_original_bytes=13, html_bytes=13, html_sha256=sha,
+    )
+    assert await db.create_bookmark_from_hash(
+        user_id=user_id, url="https://hashed.example/b", title="t", html_sha256=sha, html_size=13
+    )
+    assert not await db.create_bookmark_from_hash(
+        user_id=user_id, url="https://hashed.example/c", title="t", html_sha256=sha, html_size=14
+    )
+    for _ in range(2):
+        keyed_id, _ = await db.create_bookmark(
+            user_id=user_id, url="https://keyed.example/", title=None, html=None,
+            idempotency_key="plan-key",
+        )
+    assert await db.get_idempotent_bookmark(user_id=user_id, key="plan-key") == keyed_id
+    await db.purge_idempotency_keys()
+    await db.get_page_fetch(url="https://fetch.example/")
+    await db.attach_fetched_html(user_id=user_id, bookmark_id=url_only, html="<p>fetched</p>")
+    await db.record_page_fetch(
+        url="https://fetch.example/",
+        status="fetched",
+        http_status=200,
+        etag='"e"',
+        last_modified=None,
+        bookmark_id=url_only,
+    )
+    assert await db.load_page_fetch_html(url="https://fetch.example/") == "<p>fetched</p>"
+    async for row in db.iter_bookmark_export(user_id=user_id, include_html=True):
+        if row["url"] == "https://chain.example/":
+            assert row["html"] is not None
+
+    await db.list_bookmark_changes(user_id=user_id, since=0)
+    changes = await db.list_bookmark_changes(user_id=user_id, since=0, limit=1)
+    await db.delete_bookmark(user_id=user_id, bookmark_id=plain_id)
+    # The last version is a delta against this one: it is rebased first.
+    await db.delete_bookmark(user_id=user_id, bookmark_id=chain[1])
+    await db.list_bookmark_changes(user_id=user_id, since=changes["seq"])
+
+    token, _ = await db.issue_refresh_token(user_id=user_id)
+    await db.rotate_refresh_token(refresh_token=token)
+    await db.revoke_tokens_for_user(user_id=user_id)
+    await db.load_token_generations()
+
+
+async def _collect() -> list[tuple[str, str, dict]]:
+    async with migrated_db(max_per_statement=4) as (db, recorder):
+        await _load(db)
+        recorder.enabled = True
+        await _exercise(db, _user(USERS // 2), subject="plan-typical")
+        await _exercise(db, _user(0), subject="plan-heaviest")
+        await db.ensure_bookmark_partitions(
+            months_ahead=3, since=datetime.now(timezone.utc) - timedelta(days=60)
+        )
+        await db.reconcile_bookmark_stats()
+        assert await db.reconcile_bookmark_stats(min_interval_seconds=3600) is None
+        return [
+            (caller, normalize_sql(query), plan)
+            for caller, (query, plan) in zip(recorder.callers, recorder.plans)
+        ]
+
+
+@pytest.fixture(scope="module")
+def plans():
+    return asyncio.run(_collect())
+
+
+def _describe(caller: str, query: str) -> str:
+    return f"{caller}: {query[:120]}"
+
+
+@requires_db
+def test_every_db_statement_is_explained(plans):
+    explained = {query for _, query, _ in plans}
+    missing = _db_statements() - explained
+    assert not missing, "statements in core/db.py not exercised:\n" + "\n".join(sorted(missing))
+
+
+def _rows_scanned(node: dict) -> int:
+    rows = node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)
+    return rows * node.get("Actual Loops", 1)
+
+
+@requires_db
+def test_no_sequential_scans(plans):
+    failures = [
+        f"{_describe(caller, query)}\n    Seq Scan on {node.get('Relation Name')} "
+        f"({_rows_scanned(node)} rows)"
+        for caller, query, plan in plans
+        for node in plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan" and _rows_scanned(node) > SEQ_SCAN_MAX_ROWS
+    ]
+    assert not failures, "\n".join(failures)
+
+
+@requires_db
+def test_buffer_and_latency_budgets(plans):
+    failures = []
+    for caller, query, plan in plans:
+        max_buffers, max_ms = BUDGETS.get(caller, (DEFAULT_BUFFERS, DEFAULT_MS))
+        top = plan["Plan"]
+        buffers = top.get("Shared Hit Blocks", 0) + top.get("Shared Read Blocks", 0)
+        ms = plan["Execution Time"]
+        if buffers > max_buffers or ms > max_ms:
+            failures.append(
+                f"{_describe(caller, query)}\n    {buffers} buffers (max {max_buffers}), "
+                f"{ms:.1f}ms (max {max_ms}ms)"
+            )
+    assert not failures, "\n".join(failures)
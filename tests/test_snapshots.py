@@ -0,0 +1,99 @@
+import asyncio
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+from tests.pg_plans import migrated_db, requires_db
+
+from src.legendary_potato.api.routes import bookmarks
+from src.legendary_potato.core.config import app_config
+from src.legendary_potato.core.delta import MAX_DELTA_TOKENS
+from src.legendary_potato.core.tokens import create_access_token
+
+PAGE = "<html><body>" + "<p>paragraph</p>\n" * 200 + "</body></html>"
+# Three tokens per paragraph: past the point where saves stop diffing.
+LARGE_PAGE = PAGE.replace("<p>paragraph</p>\n" * 200, "<p>paragraph</p>\n" * MAX_DELTA_TOKENS)
+
+
+def _version(i: int) -> str:
+    return PAGE.replace("paragraph", f"edit {i}", 1)
+
+
+async def _render(db, *, user_id: uuid.UUID, bookmark_id: uuid.UUID) -> str:
+    source = await db.open_bookmark_html(user_id=user_id, bookmark_id=bookmark_id)
+    if source.html is not None:
+        return source.html
+    return b"".join([c async for c in source.chunks]).decode()
+
+
+async def _delete_a_middle_version() -> tuple[list, list, dict[int, str], list]:
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="snapshots", email=None, name=None,
+            avatar_url=None,
+        )
+        ids = []
+        for i in range(1, 5):
+            bookmark_id, _ = await db.create_bookmark(
+                user_id=user_id, url="https://chain.example/", title=f"v{i}", html=_version(i)
+            )
+            ids.append(bookmark_id)
+        deleted = await db.delete_bookmark(user_id=user_id, bookmark_id=ids[1])
+        rendered = {
+            i: await _render(db, user_id=user_id, bookmark_id=ids[i - 1]) for i in (1, 3, 4)
+        }
+        async with db.pool.acquire() as conn:
+            bases = await conn.fetch(
+                "SELECT version, delta_base_id FROM bookmarks ORDER BY version"
+            )
+    return ids, deleted, rendered, [(r["version"], r["delta_base_id"]) for r in bases]
+
+
+@requires_db
+def test_deleting_a_snapshot_keeps_later_deltas(monkeypatch):
+    monkeypatch.setattr(app_config, "snapshot_keyframe_interval", 10)
+    ids, deleted, rendered, bases = asyncio.run(_delete_a_middle_version())
+    assert deleted == [ids[1]]
+    assert rendered == {i: _version(i) for i in (1, 3, 4)}
+    # Version 3 became a keyframe; version 4 is still a delta against it.
+    assert bases == [(1, None), (3, None), (4, ids[2])]
+
+
+async def _browse_a_chain() -> tuple[list[dict], dict[int, str]]:
+    pages = [_version(i) for i in range(1, 5)] + [LARGE_PAGE, LARGE_PAGE.replace("<p>", "<p >", 1)]
+    async with migrated_db() as (db, _):
+        user_id = await db.get_or_create_user_id_for_identity(
+            provider="test", provider_subject="versions", email=None, name=None,
+            avatar_url=None,
+        )
+        for html in pages:
+            bookmark_id, _ = await db.create_bookmark(
+                user_id=user_id, url="https://chain.example/", title=None, html=html
+            )
+        app = FastAPI()
+        app.include_router(bookmarks.router)
+        app.state.db = db
+        auth = {"Authorization": f"Bearer {create_access_token(user_id=user_id)}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            res = await client.get(f"/bookmarks/{bookmark_id}/versions", headers=auth)
+            versions = res.json()["versions"]
+            rendered = {}
+            for v in versions:
+                res = await client.get(
+                    f"/bookmarks/{bookmark_id}/versions/{v['version']}", headers=auth
+                )
+                rendered[v["version"]] = res.json()["html"]
+    return versions, {v: html == pages[v - 1] for v, html in rendered.items()}
+
+
+@requires_db
+def test_versions_rebuild_through_a_delta_chain(monkeypatch):
+    monkeypatch.setattr(app_config, "snapshot_keyframe_interval", 10)
+    versions, matches = asyncio.run(_browse_a_chain())
+    # 2-4 are deltas; 5 and 6 are too large to diff and are stored in full.
+    assert [(v["version"], v["is_keyframe"]) for v in versions] == [
+        (6, True), (5, True), (4, False), (3, False), (2, False), (1, True),
+    ]
+    assert matches == {v: True for v in range(1, 7)}